@@ -0,0 +1,75 @@
+import fcntl
+import multiprocessing
+import os
+import tempfile
+
+# Configuração do gunicorn para produção: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# O app é pré-carregado no master (pandas, numpy, supabase importados uma vez e
+# compartilhados via copy-on-write); cada worker atende `threads` requisições
+# concorrentes (gthread), o que cobre bem as chamadas de I/O ao Supabase e à
+# Evolution API. Com preload, código novo exige reiniciar o master (USR2 +
+# WINCH, ou reiniciar o container): HUP só recicla os workers.
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get('GUNICORN_WORKERS', os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+preload_app = True
+
+# Keep-alive acima do idle timeout do proxy/balanceador evita conexões
+# fechadas pelo backend no meio de uma reutilização
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 75))
+
+# gthread: o timeout vale para o loop do worker, não por requisição (exports
+# e uploads longos não derrubam o worker)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Reciclagem gradual dos workers (limita crescimento de memória), com jitter
+# para que não reiniciem todos ao mesmo tempo
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+# Heartbeat dos workers em memória, não no disco do container
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+# Threads de segundo plano não sobrevivem ao fork e não devem abrir conexões
+# no master: a classificação de sentimentos é desligada no carregamento e
+# iniciada depois do fork, em um único worker por vez.
+sentimento_automatico = os.environ.get('SENTIMENTO_AUTOMATICO', 'true').lower() == 'true'
+os.environ['SENTIMENTO_AUTOMATICO'] = 'false'
+
+_trava_sentimentos = None
+
+
+def post_fork(server, worker):
+    global _trava_sentimentos
+    if not sentimento_automatico:
+        return
+
+    # Eleição por flock: o worker que obtém a trava processa os sentimentos;
+    # quando ele morre a trava é liberada e o substituto a assume
+    caminho = os.path.join(tempfile.gettempdir(), f'saas-pos-venda-sentimentos-{server.pid}.lock')
+    descritor = os.open(caminho, os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        fcntl.flock(descritor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(descritor)
+        return
+
+    _trava_sentimentos = descritor
+    from src.sentimento import get_processador_sentimentos
+    get_processador_sentimentos().iniciar()
+    server.log.info(f"Worker {worker.pid} processa a classificação de sentimentos")
+
+
+def worker_exit(server, worker):
+    # Filas em memória (webhooks, último login, auditoria) são gravadas antes de sair
+    from src.batch import parar_processadores
+    parar_processadores()
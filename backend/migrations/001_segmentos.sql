@@ -0,0 +1,55 @@
+-- =====================================================
+-- SEGMENTAÇÃO DE PÚBLICO
+-- Índices usados pelos filtros gerados em src/segmentos.py
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS segmentos (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    empresa_id UUID NOT NULL REFERENCES empresas(id) ON DELETE CASCADE,
+    nome VARCHAR(255) NOT NULL,
+    descricao TEXT,
+    definicao JSONB NOT NULL DEFAULT '{}'::jsonb,
+    total_contatos INTEGER,
+    contado_em TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_segmentos_empresa ON segmentos (empresa_id, created_at DESC);
+
+-- Recência de resposta por contato, mantida pelo trigger abaixo
+ALTER TABLE contatos ADD COLUMN IF NOT EXISTS ultima_resposta_em TIMESTAMP WITH TIME ZONE;
+
+UPDATE contatos c
+SET ultima_resposta_em = r.ultima
+FROM (
+    SELECT contato_id, MAX(created_at) AS ultima
+    FROM respostas
+    WHERE contato_id IS NOT NULL
+    GROUP BY contato_id
+) r
+WHERE r.contato_id = c.id;
+
+CREATE OR REPLACE FUNCTION atualizar_ultima_resposta_contato()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.contato_id IS NOT NULL THEN
+        UPDATE contatos
+        SET ultima_resposta_em = GREATEST(COALESCE(ultima_resposta_em, NEW.created_at), NEW.created_at)
+        WHERE id = NEW.contato_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_respostas_ultima_resposta ON respostas;
+CREATE TRIGGER trg_respostas_ultima_resposta
+    AFTER INSERT ON respostas
+    FOR EACH ROW EXECUTE FUNCTION atualizar_ultima_resposta_contato();
+
+-- Filtros de segmento sempre começam por empresa_id
+CREATE INDEX IF NOT EXISTS idx_contatos_empresa_status_id ON contatos (empresa_id, status, id);
+CREATE INDEX IF NOT EXISTS idx_contatos_empresa_created ON contatos (empresa_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_contatos_empresa_ultima_resposta ON contatos (empresa_id, ultima_resposta_em);
+CREATE INDEX IF NOT EXISTS idx_contatos_tags ON contatos USING GIN (tags);
+CREATE INDEX IF NOT EXISTS idx_contatos_campos_customizados ON contatos USING GIN (campos_customizados);
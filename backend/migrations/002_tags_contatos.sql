@@ -0,0 +1,59 @@
+-- =====================================================
+-- ÍNDICE DE TAGS E CONTAGEM POR TAG (FACETAS)
+-- O filtro por tags usa idx_contatos_tags (GIN, criado em 001_segmentos.sql).
+-- A contagem por tag é mantida incrementalmente a cada escrita em contatos.
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS contatos_tags_contagem (
+    empresa_id UUID NOT NULL REFERENCES empresas(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (empresa_id, tag)
+);
+
+CREATE OR REPLACE FUNCTION atualizar_contagem_tags()
+RETURNS TRIGGER AS $$
+DECLARE
+    empresa UUID;
+    antigas TEXT[] := '{}';
+    novas TEXT[] := '{}';
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        antigas := COALESCE(OLD.tags, '{}');
+        empresa := OLD.empresa_id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        novas := COALESCE(NEW.tags, '{}');
+        empresa := NEW.empresa_id;
+    END IF;
+
+    -- Tags removidas do contato
+    UPDATE contatos_tags_contagem
+    SET total = total - 1
+    WHERE empresa_id = empresa
+      AND tag IN (SELECT unnest(antigas) EXCEPT SELECT unnest(novas));
+
+    DELETE FROM contatos_tags_contagem
+    WHERE empresa_id = empresa AND total <= 0;
+
+    -- Tags adicionadas ao contato
+    INSERT INTO contatos_tags_contagem (empresa_id, tag, total)
+    SELECT empresa, a.tag, 1
+    FROM (SELECT unnest(novas) EXCEPT SELECT unnest(antigas)) AS a(tag)
+    ON CONFLICT (empresa_id, tag) DO UPDATE SET total = contatos_tags_contagem.total + 1;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_contatos_contagem_tags ON contatos;
+CREATE TRIGGER trg_contatos_contagem_tags
+    AFTER INSERT OR DELETE OR UPDATE OF tags ON contatos
+    FOR EACH ROW EXECUTE FUNCTION atualizar_contagem_tags();
+
+-- Carga inicial
+INSERT INTO contatos_tags_contagem (empresa_id, tag, total)
+SELECT empresa_id, tag, COUNT(*)
+FROM contatos, LATERAL (SELECT DISTINCT unnest(tags) AS tag) t
+GROUP BY empresa_id, tag
+ON CONFLICT (empresa_id, tag) DO UPDATE SET total = EXCLUDED.total;
@@ -0,0 +1,30 @@
+-- =====================================================
+-- ÍNDICE PARA ATRIBUIR RESPOSTAS A DISPAROS
+-- Respostas recebidas são associadas ao último disparo aberto para o
+-- telefone do contato; atualizações de status chegam pelo external_id.
+-- =====================================================
+
+-- Telefone normalizado (apenas dígitos, com DDI 55) no momento do disparo
+ALTER TABLE disparos ADD COLUMN IF NOT EXISTS telefone TEXT;
+
+UPDATE disparos d
+SET telefone = CASE
+        WHEN regexp_replace(c.telefone, '\D', '', 'g') LIKE '55%' THEN regexp_replace(c.telefone, '\D', '', 'g')
+        ELSE '55' || regexp_replace(c.telefone, '\D', '', 'g')
+    END
+FROM contatos c
+WHERE d.contato_id = c.id
+  AND d.telefone IS NULL
+  AND COALESCE(regexp_replace(c.telefone, '\D', '', 'g'), '') <> '';
+
+CREATE INDEX IF NOT EXISTS idx_disparos_telefone
+    ON disparos (telefone, created_at DESC)
+    WHERE status IN ('pendente', 'enviado', 'entregue', 'lido');
+
+CREATE INDEX IF NOT EXISTS idx_disparos_empresa_telefone
+    ON disparos (empresa_id, telefone, created_at DESC)
+    WHERE status IN ('pendente', 'enviado', 'entregue', 'lido');
+
+CREATE INDEX IF NOT EXISTS idx_disparos_external_id
+    ON disparos (external_id)
+    WHERE external_id IS NOT NULL;
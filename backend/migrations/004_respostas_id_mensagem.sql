@@ -0,0 +1,11 @@
+-- =====================================================
+-- IDEMPOTÊNCIA DE WEBHOOKS
+-- A Evolution API pode reenviar o mesmo MESSAGES_UPSERT. A janela em
+-- memória (src/cache.py JanelaDeduplicacao) descarta repetições recentes;
+-- esta restrição garante a unicidade entre processos e reinícios.
+-- =====================================================
+
+ALTER TABLE respostas ADD COLUMN IF NOT EXISTS id_mensagem TEXT;
+
+ALTER TABLE respostas DROP CONSTRAINT IF EXISTS respostas_id_mensagem_key;
+ALTER TABLE respostas ADD CONSTRAINT respostas_id_mensagem_key UNIQUE (id_mensagem);
@@ -0,0 +1,36 @@
+-- =====================================================
+-- CLASSIFICAÇÃO DE SENTIMENTO DAS RESPOSTAS
+-- Preenchida em lote por src/sentimento.py; alimenta vw_analise_sentimentos.
+-- =====================================================
+
+ALTER TABLE respostas ADD COLUMN IF NOT EXISTS sentimento VARCHAR(20);
+ALTER TABLE respostas ADD COLUMN IF NOT EXISTS score_sentimento NUMERIC(5, 4);
+
+-- Fila implícita: respostas ainda não classificadas, em ordem de chegada
+CREATE INDEX IF NOT EXISTS idx_respostas_sem_sentimento
+    ON respostas (created_at, id)
+    WHERE sentimento IS NULL;
+
+CREATE TABLE IF NOT EXISTS processamento_watermarks (
+    nome VARCHAR(100) PRIMARY KEY,
+    valor TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Atualização em lote: payload = [{"id": ..., "sentimento": ..., "score_sentimento": ...}, ...]
+CREATE OR REPLACE FUNCTION atualizar_sentimentos_respostas(payload JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    atualizadas INTEGER;
+BEGIN
+    UPDATE respostas r
+    SET sentimento = p.sentimento,
+        score_sentimento = p.score_sentimento
+    FROM jsonb_to_recordset(payload) AS p(id UUID, sentimento VARCHAR, score_sentimento NUMERIC)
+    WHERE r.id = p.id
+      AND r.sentimento IS NULL;
+
+    GET DIAGNOSTICS atualizadas = ROW_COUNT;
+    RETURN atualizadas;
+END;
+$$ LANGUAGE plpgsql;
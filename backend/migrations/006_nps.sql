@@ -0,0 +1,53 @@
+-- =====================================================
+-- NPS DE CAMPANHAS DE PESQUISA
+-- Notas extraídas das respostas (src/nps.py) e agregados mantidos
+-- incrementalmente por campanha e por empresa (campanha_id nulo).
+-- =====================================================
+
+ALTER TABLE respostas ADD COLUMN IF NOT EXISTS nota SMALLINT CHECK (nota BETWEEN 0 AND 10);
+
+CREATE TABLE IF NOT EXISTS nps_agregados (
+    empresa_id UUID NOT NULL REFERENCES empresas(id) ON DELETE CASCADE,
+    campanha_id UUID REFERENCES campanhas(id) ON DELETE CASCADE,
+    promotores INTEGER NOT NULL DEFAULT 0,
+    neutros INTEGER NOT NULL DEFAULT 0,
+    detratores INTEGER NOT NULL DEFAULT 0,
+    soma_notas INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_nps_agregados_escopo
+    ON nps_agregados (empresa_id, campanha_id) NULLS NOT DISTINCT;
+
+-- payload = [{"empresa_id", "campanha_id", "promotores", "neutros", "detratores", "soma_notas", "total"}, ...]
+CREATE OR REPLACE FUNCTION incrementar_nps(payload JSONB)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO nps_agregados AS a (empresa_id, campanha_id, promotores, neutros, detratores, soma_notas, total)
+    SELECT empresa_id, campanha_id, promotores, neutros, detratores, soma_notas, total
+    FROM jsonb_to_recordset(payload) AS p(
+        empresa_id UUID, campanha_id UUID, promotores INTEGER, neutros INTEGER,
+        detratores INTEGER, soma_notas INTEGER, total INTEGER
+    )
+    ON CONFLICT (empresa_id, campanha_id) DO UPDATE SET
+        promotores = a.promotores + EXCLUDED.promotores,
+        neutros = a.neutros + EXCLUDED.neutros,
+        detratores = a.detratores + EXCLUDED.detratores,
+        soma_notas = a.soma_notas + EXCLUDED.soma_notas,
+        total = a.total + EXCLUDED.total,
+        updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Carga inicial a partir das notas já gravadas
+INSERT INTO nps_agregados (empresa_id, campanha_id, promotores, neutros, detratores, soma_notas, total)
+SELECT empresa_id, campanha_id,
+       COUNT(*) FILTER (WHERE nota >= 9),
+       COUNT(*) FILTER (WHERE nota BETWEEN 7 AND 8),
+       COUNT(*) FILTER (WHERE nota <= 6),
+       SUM(nota), COUNT(*)
+FROM respostas
+WHERE nota IS NOT NULL AND empresa_id IS NOT NULL
+GROUP BY GROUPING SETS ((empresa_id, campanha_id), (empresa_id))
+ON CONFLICT (empresa_id, campanha_id) DO NOTHING;
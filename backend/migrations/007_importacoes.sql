@@ -0,0 +1,29 @@
+-- =====================================================
+-- IMPORTAÇÕES DE CONTATOS EM SEGUNDO PLANO
+-- Cada importação é um job: o arquivo é recebido em blocos num arquivo de
+-- spool e processado em chunks por src/importacao_jobs.py. ultimo_chunk marca
+-- o último chunk gravado, de onde uma importação interrompida é retomada.
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS importacoes (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    empresa_id UUID NOT NULL REFERENCES empresas(id) ON DELETE CASCADE,
+    usuario_id UUID REFERENCES usuarios(id) ON DELETE SET NULL,
+    nome_arquivo VARCHAR(255) NOT NULL,
+    formato VARCHAR(10) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'recebendo',  -- recebendo, pendente, processando, concluida, erro
+    tamanho_bytes BIGINT,
+    bytes_recebidos BIGINT NOT NULL DEFAULT 0,
+    tamanho_chunk INTEGER NOT NULL DEFAULT 5000,
+    ultimo_chunk INTEGER NOT NULL DEFAULT -1,
+    linhas_lidas INTEGER NOT NULL DEFAULT 0,
+    importados INTEGER NOT NULL DEFAULT 0,
+    rejeitados INTEGER NOT NULL DEFAULT 0,
+    falhas INTEGER NOT NULL DEFAULT 0,
+    erro TEXT,
+    concluida_em TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_importacoes_empresa ON importacoes (empresa_id, created_at DESC);
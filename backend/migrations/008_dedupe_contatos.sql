@@ -0,0 +1,105 @@
+-- =====================================================
+-- DEDUPLICAÇÃO DE CONTATOS POR TELEFONE/EMAIL
+-- chave_dedupe identifica o contato dentro da empresa: telefone normalizado
+-- (só dígitos, com DDI 55) ou, sem telefone válido, o email em minúsculas.
+-- A importação (src/importacao.py) calcula a mesma chave e faz upsert em
+-- (empresa_id, chave_dedupe), mesclando ou ignorando contatos existentes.
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION chave_dedupe_contato(p_telefone TEXT, p_email TEXT)
+RETURNS TEXT AS $$
+DECLARE
+    digitos TEXT;
+BEGIN
+    digitos := regexp_replace(COALESCE(p_telefone, ''), '\D', '', 'g');
+    IF length(digitos) BETWEEN 8 AND 13 THEN
+        IF left(digitos, 2) <> '55' THEN
+            digitos := '55' || digitos;
+        END IF;
+        RETURN 'tel:' || digitos;
+    END IF;
+
+    IF btrim(p_email) ~ '^[^@\s]+@[^@\s]+\.[^@\s]+$' THEN
+        RETURN 'email:' || lower(btrim(p_email));
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+ALTER TABLE contatos ADD COLUMN IF NOT EXISTS chave_dedupe VARCHAR(150);
+
+-- Contatos já existentes: só o mais antigo de cada grupo recebe a chave,
+-- para que o índice único possa ser criado sem apagar duplicados antigos
+WITH chaves AS (
+    SELECT id,
+           chave_dedupe_contato(telefone, email) AS chave,
+           ROW_NUMBER() OVER (
+               PARTITION BY empresa_id, chave_dedupe_contato(telefone, email)
+               ORDER BY created_at, id
+           ) AS ordem
+    FROM contatos
+)
+UPDATE contatos c
+SET chave_dedupe = chaves.chave
+FROM chaves
+WHERE c.id = chaves.id
+  AND chaves.ordem = 1
+  AND chaves.chave IS NOT NULL
+  AND c.chave_dedupe IS NULL;
+
+-- NULLs não conflitam entre si: contatos sem chave continuam permitidos
+CREATE UNIQUE INDEX IF NOT EXISTS idx_contatos_empresa_chave_dedupe
+    ON contatos (empresa_id, chave_dedupe);
+
+-- Escritas fora da importação (cadastro manual, edição) mantêm a chave em dia
+CREATE OR REPLACE FUNCTION atualizar_chave_dedupe_contato()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR NEW.telefone IS DISTINCT FROM OLD.telefone OR NEW.email IS DISTINCT FROM OLD.email THEN
+        NEW.chave_dedupe := chave_dedupe_contato(NEW.telefone, NEW.email);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_contatos_chave_dedupe ON contatos;
+CREATE TRIGGER trg_contatos_chave_dedupe
+    BEFORE INSERT OR UPDATE OF telefone, email ON contatos
+    FOR EACH ROW EXECUTE FUNCTION atualizar_chave_dedupe_contato();
+
+-- Upsert com mesclagem: valores vazios do arquivo não apagam os existentes.
+-- payload = [{"empresa_id", "nome", "telefone", "email", "documento", "endereco", "origem", "chave_dedupe"}, ...]
+CREATE OR REPLACE FUNCTION mesclar_contatos(payload JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    inseridos INTEGER;
+    atualizados INTEGER;
+BEGIN
+    WITH gravados AS (
+        INSERT INTO contatos (empresa_id, nome, telefone, email, documento, endereco, origem, chave_dedupe)
+        SELECT p.empresa_id, p.nome, p.telefone, p.email, p.documento, p.endereco, p.origem, p.chave_dedupe
+        FROM jsonb_to_recordset(payload) AS p(
+            empresa_id UUID, nome VARCHAR, telefone VARCHAR, email VARCHAR,
+            documento VARCHAR, endereco TEXT, origem VARCHAR, chave_dedupe VARCHAR
+        )
+        ON CONFLICT (empresa_id, chave_dedupe) DO UPDATE
+        SET nome = COALESCE(EXCLUDED.nome, contatos.nome),
+            telefone = COALESCE(EXCLUDED.telefone, contatos.telefone),
+            email = COALESCE(EXCLUDED.email, contatos.email),
+            documento = COALESCE(EXCLUDED.documento, contatos.documento),
+            endereco = COALESCE(EXCLUDED.endereco, contatos.endereco),
+            updated_at = NOW()
+        RETURNING (xmax = 0) AS inserido
+    )
+    SELECT COUNT(*) FILTER (WHERE inserido), COUNT(*) FILTER (WHERE NOT inserido)
+    INTO inseridos, atualizados
+    FROM gravados;
+
+    RETURN jsonb_build_object('inseridos', inseridos, 'atualizados', atualizados);
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE importacoes ADD COLUMN IF NOT EXISTS modo VARCHAR(10) NOT NULL DEFAULT 'ignorar';
+ALTER TABLE importacoes ADD COLUMN IF NOT EXISTS atualizados INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE importacoes ADD COLUMN IF NOT EXISTS duplicados INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,9 @@
+-- =====================================================
+-- PAGINAÇÃO POR KEYSET NAS EXPORTAÇÕES
+-- src/database.py:iter_registros percorre cada tabela por
+-- (empresa_id, id > último id) ORDER BY id.
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS idx_contatos_empresa_id ON contatos (empresa_id, id);
+CREATE INDEX IF NOT EXISTS idx_disparos_empresa_id ON disparos (empresa_id, id);
+CREATE INDEX IF NOT EXISTS idx_respostas_empresa_id ON respostas (empresa_id, id);
@@ -0,0 +1,231 @@
+-- =====================================================
+-- MÉTRICAS DIÁRIAS (ROLLUP) POR EMPRESA E CAMPANHA
+-- Mantidas incrementalmente por triggers de instrução (uma atualização por
+-- dia/campanha a cada INSERT/UPDATE em lote) e recalculadas para dias
+-- fechados por recalcular_metricas_diarias() (src/metricas.py). Os gráficos
+-- do dashboard leem só desta tabela.
+--
+-- Disparos contam no dia em que foram criados e pelo status mais avançado
+-- que atingiram (lido conta também como entregue e enviado); respostas e
+-- sentimentos contam no dia em que a resposta chegou. Dias no fuso de
+-- America/Sao_Paulo.
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS metricas_diarias (
+    empresa_id UUID NOT NULL REFERENCES empresas(id) ON DELETE CASCADE,
+    campanha_id UUID REFERENCES campanhas(id) ON DELETE CASCADE,
+    dia DATE NOT NULL,
+    disparos INTEGER NOT NULL DEFAULT 0,
+    enviados INTEGER NOT NULL DEFAULT 0,
+    entregues INTEGER NOT NULL DEFAULT 0,
+    lidos INTEGER NOT NULL DEFAULT 0,
+    erros INTEGER NOT NULL DEFAULT 0,
+    respondidos INTEGER NOT NULL DEFAULT 0,
+    positivas INTEGER NOT NULL DEFAULT 0,
+    neutras INTEGER NOT NULL DEFAULT 0,
+    negativas INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_metricas_diarias_escopo
+    ON metricas_diarias (empresa_id, campanha_id, dia) NULLS NOT DISTINCT;
+CREATE INDEX IF NOT EXISTS idx_metricas_diarias_empresa_dia
+    ON metricas_diarias (empresa_id, dia);
+
+CREATE OR REPLACE FUNCTION dia_local(ts TIMESTAMP WITH TIME ZONE)
+RETURNS DATE AS $$
+    SELECT (ts AT TIME ZONE 'America/Sao_Paulo')::date;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- -----------------------------------------------------
+-- Disparos
+-- -----------------------------------------------------
+
+CREATE OR REPLACE FUNCTION rollup_disparos_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO metricas_diarias AS m (empresa_id, campanha_id, dia, disparos, enviados, entregues, lidos, erros)
+    SELECT empresa_id, campanha_id, dia_local(created_at),
+           COUNT(*),
+           COUNT(*) FILTER (WHERE status IN ('enviado', 'entregue', 'lido')),
+           COUNT(*) FILTER (WHERE status IN ('entregue', 'lido')),
+           COUNT(*) FILTER (WHERE status = 'lido'),
+           COUNT(*) FILTER (WHERE status = 'erro')
+    FROM novos
+    WHERE empresa_id IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (empresa_id, campanha_id, dia) DO UPDATE SET
+        disparos = m.disparos + EXCLUDED.disparos,
+        enviados = m.enviados + EXCLUDED.enviados,
+        entregues = m.entregues + EXCLUDED.entregues,
+        lidos = m.lidos + EXCLUDED.lidos,
+        erros = m.erros + EXCLUDED.erros,
+        updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Mudança de status: soma a diferença entre o que o disparo passou a contar e o que contava
+CREATE OR REPLACE FUNCTION rollup_disparos_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO metricas_diarias AS m (empresa_id, campanha_id, dia, enviados, entregues, lidos, erros)
+    SELECT n.empresa_id, n.campanha_id, dia_local(n.created_at),
+           SUM((COALESCE(n.status, '') IN ('enviado', 'entregue', 'lido'))::int - (COALESCE(o.status, '') IN ('enviado', 'entregue', 'lido'))::int),
+           SUM((COALESCE(n.status, '') IN ('entregue', 'lido'))::int - (COALESCE(o.status, '') IN ('entregue', 'lido'))::int),
+           SUM((COALESCE(n.status, '') = 'lido')::int - (COALESCE(o.status, '') = 'lido')::int),
+           SUM((COALESCE(n.status, '') = 'erro')::int - (COALESCE(o.status, '') = 'erro')::int)
+    FROM novos n
+    JOIN antigos o ON o.id = n.id
+    WHERE n.empresa_id IS NOT NULL
+      AND n.status IS DISTINCT FROM o.status
+    GROUP BY 1, 2, 3
+    ON CONFLICT (empresa_id, campanha_id, dia) DO UPDATE SET
+        enviados = m.enviados + EXCLUDED.enviados,
+        entregues = m.entregues + EXCLUDED.entregues,
+        lidos = m.lidos + EXCLUDED.lidos,
+        erros = m.erros + EXCLUDED.erros,
+        updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_disparos_rollup_insert ON disparos;
+CREATE TRIGGER trg_disparos_rollup_insert
+    AFTER INSERT ON disparos
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_disparos_insert();
+
+DROP TRIGGER IF EXISTS trg_disparos_rollup_update ON disparos;
+CREATE TRIGGER trg_disparos_rollup_update
+    AFTER UPDATE ON disparos
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_disparos_update();
+
+-- -----------------------------------------------------
+-- Respostas
+-- -----------------------------------------------------
+
+CREATE OR REPLACE FUNCTION rollup_respostas_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO metricas_diarias AS m (empresa_id, campanha_id, dia, respondidos, positivas, neutras, negativas)
+    SELECT empresa_id, campanha_id, dia_local(created_at),
+           COUNT(*),
+           COUNT(*) FILTER (WHERE sentimento = 'positivo'),
+           COUNT(*) FILTER (WHERE sentimento = 'neutro'),
+           COUNT(*) FILTER (WHERE sentimento = 'negativo')
+    FROM novos
+    WHERE empresa_id IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (empresa_id, campanha_id, dia) DO UPDATE SET
+        respondidos = m.respondidos + EXCLUDED.respondidos,
+        positivas = m.positivas + EXCLUDED.positivas,
+        neutras = m.neutras + EXCLUDED.neutras,
+        negativas = m.negativas + EXCLUDED.negativas,
+        updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Classificação de sentimento (src/sentimento.py) chega depois, em lote
+CREATE OR REPLACE FUNCTION rollup_respostas_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO metricas_diarias AS m (empresa_id, campanha_id, dia, positivas, neutras, negativas)
+    SELECT n.empresa_id, n.campanha_id, dia_local(n.created_at),
+           SUM((COALESCE(n.sentimento, '') = 'positivo')::int - (COALESCE(o.sentimento, '') = 'positivo')::int),
+           SUM((COALESCE(n.sentimento, '') = 'neutro')::int - (COALESCE(o.sentimento, '') = 'neutro')::int),
+           SUM((COALESCE(n.sentimento, '') = 'negativo')::int - (COALESCE(o.sentimento, '') = 'negativo')::int)
+    FROM novos n
+    JOIN antigos o ON o.id = n.id
+    WHERE n.empresa_id IS NOT NULL
+      AND n.sentimento IS DISTINCT FROM o.sentimento
+    GROUP BY 1, 2, 3
+    ON CONFLICT (empresa_id, campanha_id, dia) DO UPDATE SET
+        positivas = m.positivas + EXCLUDED.positivas,
+        neutras = m.neutras + EXCLUDED.neutras,
+        negativas = m.negativas + EXCLUDED.negativas,
+        updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_respostas_rollup_insert ON respostas;
+CREATE TRIGGER trg_respostas_rollup_insert
+    AFTER INSERT ON respostas
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_respostas_insert();
+
+DROP TRIGGER IF EXISTS trg_respostas_rollup_update ON respostas;
+CREATE TRIGGER trg_respostas_rollup_update
+    AFTER UPDATE ON respostas
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_respostas_update();
+
+-- -----------------------------------------------------
+-- Reconciliação: recalcula os dias [p_de, p_ate] a partir das tabelas brutas
+-- (NULL = sem limite; p_empresa_id NULL = todas as empresas)
+-- -----------------------------------------------------
+
+CREATE OR REPLACE FUNCTION recalcular_metricas_diarias(p_de DATE, p_ate DATE, p_empresa_id UUID DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    gravadas INTEGER;
+BEGIN
+    -- Bloqueia os incrementos dos triggers enquanto os dias são refeitos
+    LOCK TABLE metricas_diarias IN SHARE ROW EXCLUSIVE MODE;
+
+    DELETE FROM metricas_diarias
+    WHERE (p_de IS NULL OR dia >= p_de)
+      AND (p_ate IS NULL OR dia <= p_ate)
+      AND (p_empresa_id IS NULL OR empresa_id = p_empresa_id);
+
+    INSERT INTO metricas_diarias (empresa_id, campanha_id, dia, disparos, enviados, entregues, lidos, erros,
+                                  respondidos, positivas, neutras, negativas)
+    SELECT empresa_id, campanha_id, dia,
+           SUM(disparos), SUM(enviados), SUM(entregues), SUM(lidos), SUM(erros),
+           SUM(respondidos), SUM(positivas), SUM(neutras), SUM(negativas)
+    FROM (
+        SELECT empresa_id, campanha_id, dia_local(created_at) AS dia,
+               COUNT(*) AS disparos,
+               COUNT(*) FILTER (WHERE status IN ('enviado', 'entregue', 'lido')) AS enviados,
+               COUNT(*) FILTER (WHERE status IN ('entregue', 'lido')) AS entregues,
+               COUNT(*) FILTER (WHERE status = 'lido') AS lidos,
+               COUNT(*) FILTER (WHERE status = 'erro') AS erros,
+               0 AS respondidos, 0 AS positivas, 0 AS neutras, 0 AS negativas
+        FROM disparos
+        WHERE empresa_id IS NOT NULL
+          AND (p_empresa_id IS NULL OR empresa_id = p_empresa_id)
+          AND (p_de IS NULL OR created_at >= (p_de::timestamp AT TIME ZONE 'America/Sao_Paulo'))
+          AND (p_ate IS NULL OR created_at < ((p_ate + 1)::timestamp AT TIME ZONE 'America/Sao_Paulo'))
+        GROUP BY 1, 2, 3
+
+        UNION ALL
+
+        SELECT empresa_id, campanha_id, dia_local(created_at),
+               0, 0, 0, 0, 0,
+               COUNT(*),
+               COUNT(*) FILTER (WHERE sentimento = 'positivo'),
+               COUNT(*) FILTER (WHERE sentimento = 'neutro'),
+               COUNT(*) FILTER (WHERE sentimento = 'negativo')
+        FROM respostas
+        WHERE empresa_id IS NOT NULL
+          AND (p_empresa_id IS NULL OR empresa_id = p_empresa_id)
+          AND (p_de IS NULL OR created_at >= (p_de::timestamp AT TIME ZONE 'America/Sao_Paulo'))
+          AND (p_ate IS NULL OR created_at < ((p_ate + 1)::timestamp AT TIME ZONE 'America/Sao_Paulo'))
+        GROUP BY 1, 2, 3
+    ) brutas
+    GROUP BY empresa_id, campanha_id, dia;
+
+    GET DIAGNOSTICS gravadas = ROW_COUNT;
+    RETURN gravadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Índices para a reconciliação por período
+CREATE INDEX IF NOT EXISTS idx_disparos_empresa_created ON disparos (empresa_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_respostas_empresa_created ON respostas (empresa_id, created_at);
+
+-- Carga inicial com todo o histórico
+SELECT recalcular_metricas_diarias(NULL, NULL);
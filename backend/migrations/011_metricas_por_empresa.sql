@@ -0,0 +1,67 @@
+-- =====================================================
+-- CONSULTAS DO DASHBOARD RESTRITAS À EMPRESA
+-- Substituem a leitura de vw_analise_sentimentos e vw_metricas_campanhas sem
+-- filtro (que varria as linhas de todas as empresas). Ambas somam o rollup
+-- metricas_diarias (migração 010) pelo índice (empresa_id, dia), então o custo
+-- acompanha o volume de uma empresa.
+-- =====================================================
+
+-- Totais de respostas por sentimento da empresa
+CREATE OR REPLACE FUNCTION get_sentimentos_empresa(p_empresa_id UUID)
+RETURNS TABLE (positivas BIGINT, neutras BIGINT, negativas BIGINT, respondidos BIGINT) AS $$
+    SELECT COALESCE(SUM(positivas), 0),
+           COALESCE(SUM(neutras), 0),
+           COALESCE(SUM(negativas), 0),
+           COALESCE(SUM(respondidos), 0)
+    FROM metricas_diarias
+    WHERE empresa_id = p_empresa_id;
+$$ LANGUAGE sql STABLE;
+
+-- Desempenho por campanha da empresa (p_campanha_id NULL = todas)
+CREATE OR REPLACE FUNCTION get_metricas_campanhas_empresa(p_empresa_id UUID, p_campanha_id UUID DEFAULT NULL)
+RETURNS TABLE (
+    id UUID,
+    nome VARCHAR,
+    status VARCHAR,
+    total_disparos BIGINT,
+    total_enviados BIGINT,
+    total_entregues BIGINT,
+    total_lidos BIGINT,
+    total_erros BIGINT,
+    total_respostas BIGINT,
+    taxa_entrega NUMERIC,
+    taxa_leitura NUMERIC,
+    taxa_resposta NUMERIC
+) AS $$
+    WITH totais AS (
+        SELECT m.campanha_id,
+               SUM(m.disparos) AS disparos,
+               SUM(m.enviados) AS enviados,
+               SUM(m.entregues) AS entregues,
+               SUM(m.lidos) AS lidos,
+               SUM(m.erros) AS erros,
+               SUM(m.respondidos) AS respondidos
+        FROM metricas_diarias m
+        WHERE m.empresa_id = p_empresa_id
+          AND m.campanha_id IS NOT NULL
+          AND (p_campanha_id IS NULL OR m.campanha_id = p_campanha_id)
+        GROUP BY m.campanha_id
+    )
+    SELECT c.id, c.nome::varchar, c.status::varchar,
+           COALESCE(t.disparos, 0),
+           COALESCE(t.enviados, 0),
+           COALESCE(t.entregues, 0),
+           COALESCE(t.lidos, 0),
+           COALESCE(t.erros, 0),
+           COALESCE(t.respondidos, 0),
+           COALESCE(ROUND(t.entregues * 100.0 / NULLIF(t.enviados, 0), 2), 0),
+           COALESCE(ROUND(t.lidos * 100.0 / NULLIF(t.enviados, 0), 2), 0),
+           COALESCE(ROUND(t.respondidos * 100.0 / NULLIF(t.enviados, 0), 2), 0)
+    FROM campanhas c
+    LEFT JOIN totais t ON t.campanha_id = c.id
+    WHERE c.empresa_id = p_empresa_id
+      AND (p_campanha_id IS NULL OR c.id = p_campanha_id)
+    ORDER BY c.created_at DESC;
+$$ LANGUAGE sql STABLE;
+
+CREATE INDEX IF NOT EXISTS idx_campanhas_empresa_created ON campanhas (empresa_id, created_at DESC);
@@ -0,0 +1,56 @@
+-- =====================================================
+-- VERSÃO DOS DADOS POR EMPRESA (ETag / GET CONDICIONAL)
+-- Um contador por empresa e tabela, incrementado por triggers de instrução a
+-- cada escrita. src/versoes.py monta o ETag e o Last-Modified das respostas
+-- a partir desses contadores e responde 304 sem executar as consultas quando
+-- nada mudou desde o último GET.
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS versoes_empresa (
+    empresa_id UUID NOT NULL REFERENCES empresas(id) ON DELETE CASCADE,
+    escopo VARCHAR(50) NOT NULL,
+    versao BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (empresa_id, escopo)
+);
+
+-- TG_ARGV[0] = escopo (nome da tabela); uma atualização por empresa afetada na instrução
+CREATE OR REPLACE FUNCTION incrementar_versao_empresa()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO versoes_empresa AS v (empresa_id, escopo, versao)
+        SELECT DISTINCT empresa_id, TG_ARGV[0], 1 FROM antigos WHERE empresa_id IS NOT NULL
+        ON CONFLICT (empresa_id, escopo) DO UPDATE SET versao = v.versao + 1, updated_at = NOW();
+    ELSE
+        INSERT INTO versoes_empresa AS v (empresa_id, escopo, versao)
+        SELECT DISTINCT empresa_id, TG_ARGV[0], 1 FROM novos WHERE empresa_id IS NOT NULL
+        ON CONFLICT (empresa_id, escopo) DO UPDATE SET versao = v.versao + 1, updated_at = NOW();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers com tabelas de transição aceitam um único evento: três por tabela
+DO $$
+DECLARE
+    tabela TEXT;
+BEGIN
+    FOREACH tabela IN ARRAY ARRAY['contatos', 'campanhas', 'disparos', 'respostas', 'logs_sistema'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%1$s_versao_insert ON %1$I', tabela);
+        EXECUTE format('CREATE TRIGGER trg_%1$s_versao_insert AFTER INSERT ON %1$I
+                        REFERENCING NEW TABLE AS novos
+                        FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_empresa(%1$L)', tabela);
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%1$s_versao_update ON %1$I', tabela);
+        EXECUTE format('CREATE TRIGGER trg_%1$s_versao_update AFTER UPDATE ON %1$I
+                        REFERENCING NEW TABLE AS novos
+                        FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_empresa(%1$L)', tabela);
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%1$s_versao_delete ON %1$I', tabela);
+        EXECUTE format('CREATE TRIGGER trg_%1$s_versao_delete AFTER DELETE ON %1$I
+                        REFERENCING OLD TABLE AS antigos
+                        FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_empresa(%1$L)', tabela);
+    END LOOP;
+END;
+$$;
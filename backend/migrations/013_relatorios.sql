@@ -0,0 +1,25 @@
+-- =====================================================
+-- RELATÓRIOS GERADOS EM SEGUNDO PLANO
+-- Cada pedido de relatório é um job (src/relatorios.py) que grava o artefato
+-- (JSON, CSV ou XLSX) em disco. chave identifica empresa + período + formato +
+-- versões dos dados (versoes_empresa): um pedido igual enquanto nada mudou
+-- reaproveita o artefato já gerado.
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS relatorios (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    empresa_id UUID NOT NULL REFERENCES empresas(id) ON DELETE CASCADE,
+    usuario_id UUID REFERENCES usuarios(id) ON DELETE SET NULL,
+    formato VARCHAR(10) NOT NULL,
+    de DATE NOT NULL,
+    ate DATE NOT NULL,
+    chave VARCHAR(64) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pendente',  -- pendente, processando, concluido, erro
+    tamanho_bytes BIGINT,
+    erro TEXT,
+    concluido_em TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_relatorios_empresa_chave ON relatorios (empresa_id, chave, created_at DESC);
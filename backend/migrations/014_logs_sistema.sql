@@ -0,0 +1,22 @@
+-- =====================================================
+-- LOG DE ATIVIDADES (logs_sistema)
+-- Gravado em lote por src/auditoria.py a partir das rotas de contatos,
+-- campanhas, WhatsApp e autenticação. O índice (empresa_id, created_at, id)
+-- atende a paginação por cursor de /api/dashboard/recent-activity.
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS logs_sistema (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    empresa_id UUID REFERENCES empresas(id) ON DELETE CASCADE,
+    usuario_id UUID REFERENCES usuarios(id) ON DELETE SET NULL,
+    acao VARCHAR(100) NOT NULL,
+    entidade VARCHAR(100) NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE logs_sistema ADD COLUMN IF NOT EXISTS entidade_id VARCHAR(100);
+ALTER TABLE logs_sistema ADD COLUMN IF NOT EXISTS detalhes JSONB NOT NULL DEFAULT '{}';
+ALTER TABLE logs_sistema ADD COLUMN IF NOT EXISTS ip VARCHAR(45);
+
+CREATE INDEX IF NOT EXISTS idx_logs_sistema_empresa_cursor
+    ON logs_sistema (empresa_id, created_at DESC, id DESC);
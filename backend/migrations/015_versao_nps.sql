@@ -0,0 +1,22 @@
+-- =====================================================
+-- VERSÃO DO NPS POR EMPRESA (ETag / GET CONDICIONAL)
+-- incrementar_nps() roda depois do insert das respostas, numa chamada
+-- separada: o NPS tem escopo próprio em versoes_empresa, incrementado pelos
+-- agregados, para que um ETag gravado entre as duas escritas não fique
+-- valendo com o NPS antigo.
+-- =====================================================
+
+DROP TRIGGER IF EXISTS trg_nps_agregados_versao_insert ON nps_agregados;
+CREATE TRIGGER trg_nps_agregados_versao_insert AFTER INSERT ON nps_agregados
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_empresa('nps');
+
+DROP TRIGGER IF EXISTS trg_nps_agregados_versao_update ON nps_agregados;
+CREATE TRIGGER trg_nps_agregados_versao_update AFTER UPDATE ON nps_agregados
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_empresa('nps');
+
+DROP TRIGGER IF EXISTS trg_nps_agregados_versao_delete ON nps_agregados;
+CREATE TRIGGER trg_nps_agregados_versao_delete AFTER DELETE ON nps_agregados
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_empresa('nps');
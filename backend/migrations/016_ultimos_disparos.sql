@@ -0,0 +1,22 @@
+-- =====================================================
+-- ATRIBUIÇÃO DE RESPOSTAS EM LOTE
+-- Último disparo aberto de cada telefone de um lote de webhooks numa única
+-- chamada: uma busca por telefone em idx_disparos_telefone (ou em
+-- idx_disparos_empresa_telefone, com a empresa), sem cache por processo que
+-- possa divergir entre workers.
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION ultimos_disparos_por_telefone(p_telefones TEXT[], p_empresa_id UUID DEFAULT NULL)
+RETURNS SETOF disparos AS $$
+    SELECT d.*
+    FROM unnest(p_telefones) AS t(telefone)
+    CROSS JOIN LATERAL (
+        SELECT *
+        FROM disparos d
+        WHERE d.telefone = t.telefone
+          AND d.status IN ('pendente', 'enviado', 'entregue', 'lido')
+          AND (p_empresa_id IS NULL OR d.empresa_id = p_empresa_id)
+        ORDER BY d.created_at DESC
+        LIMIT 1
+    ) d;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,8 @@
+-- =====================================================
+-- PLANO DA EMPRESA
+-- Define as cotas de requisições aplicadas por src/rate_limit.py
+-- (LIMITES_PADRAO, ou RATE_LIMIT_PLANOS para planos personalizados).
+-- get_empresa_by_id lê a empresa com select('*'), que já inclui a coluna.
+-- =====================================================
+
+ALTER TABLE empresas ADD COLUMN IF NOT EXISTS plano VARCHAR(50) NOT NULL DEFAULT 'basico';
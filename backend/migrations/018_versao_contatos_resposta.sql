@@ -0,0 +1,31 @@
+-- =====================================================
+-- VERSÃO DE CONTATOS SEM A RECÊNCIA DE RESPOSTA
+-- Cada resposta recebida atualiza contatos.ultima_resposta_em (trigger de
+-- 001_segmentos.sql). Com o trigger genérico de 012_versoes_empresa.sql isso
+-- incrementava a versão de contatos a cada mensagem, invalidando o GET
+-- condicional das rotas de contatos e a chave dos relatórios. O UPDATE de
+-- contatos passa a contar só as linhas em que alguma coluna além das
+-- ignoradas mudou; a recência de resposta fica fora do versionamento.
+-- =====================================================
+
+-- TG_ARGV[0] = escopo; TG_ARGV[1..] = colunas cuja alteração não muda a versão
+CREATE OR REPLACE FUNCTION incrementar_versao_empresa_alterados()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO versoes_empresa AS v (empresa_id, escopo, versao)
+    SELECT DISTINCT n.empresa_id, TG_ARGV[0], 1
+    FROM novos n
+    JOIN antigos a ON a.id = n.id
+    WHERE n.empresa_id IS NOT NULL
+      AND (to_jsonb(n) - TG_ARGV[1:]) IS DISTINCT FROM (to_jsonb(a) - TG_ARGV[1:])
+    ON CONFLICT (empresa_id, escopo) DO UPDATE SET versao = v.versao + 1, updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers com tabelas de transição não aceitam lista de colunas (UPDATE OF):
+-- a comparação é feita entre as tabelas antigos e novos
+DROP TRIGGER IF EXISTS trg_contatos_versao_update ON contatos;
+CREATE TRIGGER trg_contatos_versao_update AFTER UPDATE ON contatos
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_empresa_alterados('contatos', 'ultima_resposta_em');
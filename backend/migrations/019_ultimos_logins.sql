@@ -0,0 +1,22 @@
+-- =====================================================
+-- ÚLTIMO LOGIN EM LOTE
+-- src/database.py acumula os logins de uma janela e grava todos numa única
+-- chamada, cada usuário com o próprio horário (o mais recente da janela).
+-- =====================================================
+
+-- payload = [{"id": ..., "ultimo_login": ...}, ...]; um lote atrasado não faz o horário recuar
+CREATE OR REPLACE FUNCTION registrar_ultimos_logins(payload JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    atualizados INTEGER;
+BEGIN
+    UPDATE usuarios u
+    SET ultimo_login = p.ultimo_login
+    FROM jsonb_to_recordset(payload) AS p(id UUID, ultimo_login TIMESTAMP WITH TIME ZONE)
+    WHERE u.id = p.id
+      AND (u.ultimo_login IS NULL OR u.ultimo_login < p.ultimo_login);
+
+    GET DIAGNOSTICS atualizados = ROW_COUNT;
+    RETURN atualizados;
+END;
+$$ LANGUAGE plpgsql;
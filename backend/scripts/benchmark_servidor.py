@@ -0,0 +1,118 @@
+"""Compara a vazão do servidor de desenvolvimento (python src/main.py) com o gunicorn.
+
+Uso (a partir de backend/):
+    python scripts/benchmark_servidor.py --conexoes 32 --duracao 10 --caminho /api/health
+
+Cada modo é iniciado numa porta livre com FLASK_ENV=production; clientes em
+threads fazem GETs com keep-alive durante `duracao` segundos e o script
+imprime requisições/s e latências p50/p99.
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODOS = {
+    'dev': lambda porta: [sys.executable, 'src/main.py'],
+    'gunicorn': lambda porta: [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{porta}', 'wsgi:app']
+}
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def aguardar(porta: int, caminho: str, limite: float = 60.0) -> None:
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        try:
+            conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=2)
+            conexao.request('GET', caminho)
+            conexao.getresponse().read()
+            conexao.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Servidor não respondeu na porta {porta}')
+
+
+def carga(porta: int, caminho: str, conexoes: int, duracao: float) -> dict:
+    latencias = [[] for _ in range(conexoes)]
+    erros = [0] * conexoes
+    fim = time.monotonic() + duracao
+
+    def cliente(i: int) -> None:
+        conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=10)
+        while time.monotonic() < fim:
+            inicio = time.perf_counter()
+            try:
+                conexao.request('GET', caminho)
+                resposta = conexao.getresponse()
+                resposta.read()
+                if resposta.status >= 500:
+                    erros[i] += 1
+                latencias[i].append(time.perf_counter() - inicio)
+                if resposta.getheader('Connection', '').lower() == 'close':
+                    conexao.close()
+                    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=10)
+            except OSError:
+                erros[i] += 1
+                conexao.close()
+                conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=10)
+        conexao.close()
+
+    threads = [threading.Thread(target=cliente, args=(i,)) for i in range(conexoes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    todas = sorted(l for lista in latencias for l in lista)
+    if not todas:
+        return {'req_s': 0, 'p50_ms': None, 'p99_ms': None, 'erros': sum(erros)}
+    return {
+        'req_s': round(len(todas) / duracao, 1),
+        'p50_ms': round(todas[len(todas) // 2] * 1000, 2),
+        'p99_ms': round(todas[int(len(todas) * 0.99) - 1] * 1000, 2),
+        'erros': sum(erros)
+    }
+
+
+def executar(modo: str, args) -> dict:
+    porta = porta_livre()
+    env = {**os.environ, 'FLASK_ENV': 'production', 'PORT': str(porta), 'SENTIMENTO_AUTOMATICO': 'false'}
+    if args.workers:
+        env['GUNICORN_WORKERS'] = str(args.workers)
+    processo = subprocess.Popen(MODOS[modo](porta), cwd=BACKEND, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        aguardar(porta, args.caminho)
+        carga(porta, args.caminho, args.conexoes, 1.0)  # aquecimento
+        return carga(porta, args.caminho, args.conexoes, args.duracao)
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modo', choices=['dev', 'gunicorn', 'ambos'], default='ambos')
+    parser.add_argument('--conexoes', type=int, default=32)
+    parser.add_argument('--duracao', type=float, default=10.0)
+    parser.add_argument('--caminho', default='/api/health')
+    parser.add_argument('--workers', type=int, help='GUNICORN_WORKERS (padrão: o de gunicorn.conf.py)')
+    args = parser.parse_args()
+
+    modos = ['dev', 'gunicorn'] if args.modo == 'ambos' else [args.modo]
+    for modo in modos:
+        resultado = executar(modo, args)
+        print(f"{modo:9s} {resultado['req_s']:>9} req/s  p50 {resultado['p50_ms']} ms  "
+              f"p99 {resultado['p99_ms']} ms  erros {resultado['erros']}")
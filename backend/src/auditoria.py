@@ -0,0 +1,96 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from flask import has_request_context, request
+from src.batch import ProcessadorLote
+from src.database import get_supabase
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RegistroAtividades:
+    """Log de atividades (logs_sistema) com escrita em segundo plano.
+
+    As entradas ficam numa fila limitada e são gravadas em INSERTs em lote ao
+    atingir `max_lote` itens ou `intervalo` segundos. Com a fila cheia, a
+    requisição espera até `espera` segundos por espaço antes de descartar a
+    entrada. O que estiver na fila é gravado no encerramento do processo
+    (atexit de src.batch).
+    """
+
+    def __init__(self, max_lote: int = 500, intervalo: float = 2.0, maxsize: int = 10000, espera: float = 0.05):
+        self.espera = espera
+        self.processador = ProcessadorLote(
+            'auditoria',
+            self._gravar,
+            max_lote=max_lote,
+            intervalo=intervalo,
+            maxsize=maxsize
+        )
+
+    def registrar(self, empresa_id: str, usuario_id: Optional[str], acao: str, entidade: str,
+                  entidade_id: Optional[str] = None, detalhes: Optional[Dict[str, Any]] = None,
+                  ip: Optional[str] = None) -> bool:
+        """Enfileira uma entrada; retorna False se descartada (fila cheia)"""
+        enfileirado = self.processador.enviar({
+            'empresa_id': empresa_id,
+            'usuario_id': usuario_id,
+            'acao': acao,
+            'entidade': entidade,
+            'entidade_id': entidade_id,
+            'detalhes': detalhes or {},
+            'ip': ip,
+            # Hora do evento, não a da gravação do lote
+            'created_at': datetime.now(timezone.utc).isoformat()
+        }, timeout=self.espera)
+
+        if not enfileirado:
+            logger.warning(f"Fila de auditoria cheia, atividade descartada: {acao} {entidade} {entidade_id}")
+        return enfileirado
+
+    def _gravar(self, registros: List[Dict[str, Any]]) -> None:
+        if not get_supabase().bulk_create_logs(registros):
+            raise RuntimeError(f'Falha ao gravar {len(registros)} registros de auditoria')
+
+    def stats(self) -> Dict[str, Any]:
+        return self.processador.stats()
+
+
+# Instância global do registro de atividades
+registro_atividades = None
+
+def init_auditoria(config) -> RegistroAtividades:
+    """Inicializa o registro de atividades em segundo plano"""
+    global registro_atividades
+    registro_atividades = RegistroAtividades(
+        max_lote=config.get('AUDITORIA_LOTE_MAX', 500),
+        intervalo=config.get('AUDITORIA_LOTE_INTERVALO', 2.0),
+        maxsize=config.get('AUDITORIA_FILA_MAX', 10000),
+        espera=config.get('AUDITORIA_ESPERA', 0.05)
+    )
+    return registro_atividades
+
+def get_registro_atividades() -> RegistroAtividades:
+    """Retorna a instância do registro de atividades"""
+    if registro_atividades is None:
+        raise RuntimeError("Auditoria não foi inicializada. Chame init_auditoria() primeiro.")
+    return registro_atividades
+
+def registrar_atividade(acao: str, entidade: str, entidade_id: Optional[str] = None,
+                        detalhes: Optional[Dict[str, Any]] = None, empresa_id: Optional[str] = None,
+                        usuario_id: Optional[str] = None) -> bool:
+    """Registra a atividade do usuário da requisição atual (ou dos ids informados, p.ex. no login)"""
+    usuario = getattr(request, 'current_user', None) if has_request_context() else None
+    empresa_id = empresa_id or (usuario or {}).get('empresa_id')
+    if not empresa_id or registro_atividades is None:
+        return False
+
+    return registro_atividades.registrar(
+        empresa_id,
+        usuario_id or (usuario or {}).get('id'),
+        acao,
+        entidade,
+        entidade_id=entidade_id,
+        detalhes=detalhes,
+        ip=request.remote_addr if has_request_context() else None
+    )
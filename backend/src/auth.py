@@ -1,24 +1,97 @@
 import bcrypt
 import jwt
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify, current_app
 from src.database import get_supabase
+from src.cache import TTLCache
+from src.rate_limit import classe_endpoint, get_limitador_taxa
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Payloads de tokens já verificados, por hash do token. A validade de cada
+# entrada nunca passa do `exp` do próprio token.
+JWT_CACHE_TTL_MAX = int(os.environ.get('JWT_CACHE_TTL_MAX', 300))
+tokens_verificados = TTLCache(maxsize=int(os.environ.get('JWT_CACHE_MAX', 10000)), ttl=JWT_CACHE_TTL_MAX)
+
+def _chave_token(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+# bcrypt roda num executor dedicado e limitado; logins/registros concorrentes
+# além de LOGIN_MAX_CONCORRENTES esperam até LOGIN_ESPERA_MAX segundos e depois
+# recebem 503, para não ocupar todos os workers da API.
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', os.cpu_count() or 2))
+LOGIN_MAX_CONCORRENTES = int(os.environ.get('LOGIN_MAX_CONCORRENTES', BCRYPT_WORKERS * 2))
+LOGIN_ESPERA_MAX = float(os.environ.get('LOGIN_ESPERA_MAX', 2.0))
+
+executor_senhas = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix='bcrypt')
+admissao_senhas = threading.BoundedSemaphore(LOGIN_MAX_CONCORRENTES)
+estatisticas_senhas = {'verificacoes': 0, 'rehashes': 0, 'rejeitados': 0}
+
+class SobrecargaAutenticacao(Exception):
+    """Limite de logins simultâneos atingido"""
+
+@contextmanager
+def admissao_autenticacao():
+    """Reserva uma vaga para operação com bcrypt ou levanta SobrecargaAutenticacao"""
+    if not admissao_senhas.acquire(timeout=LOGIN_ESPERA_MAX):
+        estatisticas_senhas['rejeitados'] += 1
+        raise SobrecargaAutenticacao('Muitas tentativas de login simultâneas. Tente novamente em instantes')
+    try:
+        yield
+    finally:
+        admissao_senhas.release()
+
+def _custo_hash(hashed: str) -> int:
+    # Formato: $2b$<custo>$<salt+hash>
+    try:
+        return int(hashed.split('$')[2])
+    except (IndexError, ValueError):
+        return 0
+
 class AuthService:
     @staticmethod
     def hash_password(password: str) -> str:
-        """Gera hash da senha"""
-        salt = bcrypt.gensalt()
-        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        """Gera hash da senha (no executor de bcrypt, com o custo configurado)"""
+        def gerar():
+            salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+            return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        
+        return executor_senhas.submit(gerar).result()
     
     @staticmethod
     def verify_password(password: str, hashed: str) -> bool:
-        """Verifica se a senha está correta"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        """Verifica se a senha está correta (no executor de bcrypt)"""
+        estatisticas_senhas['verificacoes'] += 1
+        return executor_senhas.submit(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8')).result()
+    
+    @staticmethod
+    def needs_rehash(hashed: str) -> bool:
+        """Indica se o hash foi gerado com custo diferente do configurado"""
+        return _custo_hash(hashed) != BCRYPT_ROUNDS
+    
+    @staticmethod
+    def rehash_password_async(user_id: str, password: str) -> None:
+        """Regrava o hash da senha com o custo atual, sem bloquear o login"""
+        def regravar():
+            try:
+                salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+                novo_hash = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+                if get_supabase().update_user_password_hash(user_id, novo_hash):
+                    estatisticas_senhas['rehashes'] += 1
+            except Exception as e:
+                logger.error(f"Erro ao regravar hash da senha do usuário {user_id}: {e}")
+        
+        executor_senhas.submit(regravar)
     
     @staticmethod
     def generate_tokens(user_data: dict) -> dict:
@@ -60,14 +133,29 @@ class AuthService:
     
     @staticmethod
     def verify_token(token: str) -> dict:
-        """Verifica e decodifica token JWT"""
+        """Verifica e decodifica token JWT (com cache dos tokens já verificados)"""
+        chave = _chave_token(token)
+        payload = tokens_verificados.get(chave)
+        if payload is not None:
+            if payload['exp'] > time.time():
+                return payload
+            tokens_verificados.delete(chave)
+            raise Exception('Token expirado')
+        
         try:
             payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            return payload
         except jwt.ExpiredSignatureError:
             raise Exception('Token expirado')
         except jwt.InvalidTokenError:
             raise Exception('Token inválido')
+        
+        tokens_verificados.set(chave, payload, ttl=min(payload['exp'] - time.time(), JWT_CACHE_TTL_MAX))
+        return payload
+    
+    @staticmethod
+    def invalidate_token(token: str) -> None:
+        """Remove o token do cache de verificação (logout/revogação)"""
+        tokens_verificados.delete(_chave_token(token))
     
     @staticmethod
     def login(email: str, password: str) -> dict:
@@ -75,23 +163,28 @@ class AuthService:
         try:
             db = get_supabase()
             
-            # Buscar usuário por email
-            user = db.get_user_by_email(email)
+            # Buscar usuário por email (com o hash da senha, direto do banco)
+            user = db.get_credenciais_by_email(email)
             if not user:
                 raise Exception('Email ou senha incorretos')
             
             # Verificar senha
-            if not AuthService.verify_password(password, user['senha_hash']):
-                raise Exception('Email ou senha incorretos')
+            with admissao_autenticacao():
+                if not AuthService.verify_password(password, user['senha_hash']):
+                    raise Exception('Email ou senha incorretos')
+            
+            # Custo do bcrypt mudou desde o cadastro: atualizar o hash em segundo plano
+            if AuthService.needs_rehash(user['senha_hash']):
+                AuthService.rehash_password_async(user['id'], password)
             
-            # Atualizar último login
+            # Atualizar último login (em segundo plano)
             db.update_user_last_login(user['id'])
             
             # Gerar tokens
             tokens = AuthService.generate_tokens(user)
             
             # Buscar dados da empresa
-            empresa = db.get_empresa_by_slug(user['empresa_id'])
+            empresa = db.get_empresa_by_id(user['empresa_id'])
             
             return {
                 'success': True,
@@ -105,6 +198,12 @@ class AuthService:
                 'tokens': tokens
             }
             
+        except SobrecargaAutenticacao as e:
+            return {
+                'success': False,
+                'message': str(e),
+                'sobrecarga': True
+            }
         except Exception as e:
             logger.error(f"Erro no login: {e}")
             return {
@@ -128,6 +227,9 @@ class AuthService:
             if existing_empresa:
                 raise Exception('Nome da empresa já está em uso')
             
+            with admissao_autenticacao():
+                senha_hash = AuthService.hash_password(password)
+            
             # Criar empresa
             empresa_data = {
                 'nome': empresa_nome,
@@ -145,7 +247,7 @@ class AuthService:
                 'empresa_id': empresa['id'],
                 'nome': nome,
                 'email': email,
-                'senha_hash': AuthService.hash_password(password),
+                'senha_hash': senha_hash,
                 'perfil': 'admin',
                 'ativo': True
             }
@@ -170,6 +272,12 @@ class AuthService:
                 'tokens': tokens
             }
             
+        except SobrecargaAutenticacao as e:
+            return {
+                'success': False,
+                'message': str(e),
+                'sobrecarga': True
+            }
         except Exception as e:
             logger.error(f"Erro no registro: {e}")
             return {
@@ -189,7 +297,7 @@ class AuthService:
             
             # Buscar usuário atualizado
             db = get_supabase()
-            user = db.get_user_by_email(payload['email'])
+            user = db.get_user_by_id(payload['user_id'])
             
             if not user or not user['ativo']:
                 raise Exception('Usuário inativo ou não encontrado')
@@ -244,6 +352,21 @@ def token_required(f):
         except Exception as e:
             return jsonify({'message': str(e)}), 401
         
+        # Cota por empresa e classe de endpoint
+        limitador = get_limitador_taxa()
+        if limitador is not None:
+            empresa_id = request.current_user['empresa_id']
+            empresa = get_supabase().get_empresa_by_id(empresa_id)
+            permitida, espera = limitador.permitir(
+                empresa_id,
+                classe_endpoint(request.method, request.path),
+                (empresa or {}).get('plano')
+            )
+            if not permitida:
+                response = jsonify({'message': 'Limite de requisições excedido. Tente novamente em instantes'})
+                response.headers['Retry-After'] = str(espera)
+                return response, 429
+        
         return f(*args, **kwargs)
     
     return decorated
@@ -262,3 +385,22 @@ def admin_required(f):
     
     return decorated
 
+def metricas_required(f):
+    """Decorator para métricas operacionais: exige o segredo METRICS_TOKEN no header X-Metrics-Token.
+
+    As métricas são do processo, não de uma empresa, por isso não usam o JWT
+    dos usuários; sem METRICS_TOKEN configurado a rota não existe (404).
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        segredo = current_app.config.get('METRICS_TOKEN')
+        if not segredo:
+            return jsonify({'message': 'Não encontrado'}), 404
+        
+        informado = request.headers.get('X-Metrics-Token', '')
+        if not hmac.compare_digest(informado.encode(), segredo.encode()):
+            return jsonify({'message': 'Token de métricas inválido'}), 401
+        
+        return f(*args, **kwargs)
+    
+    return decorated
@@ -0,0 +1,205 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Processadores criados no processo, para métricas e flush no encerramento
+_processadores: List['ProcessadorLote'] = []
+_processadores_lock = threading.Lock()
+
+
+class ProcessadorLote:
+    """Fila limitada em memória consumida por uma thread que processa itens em micro-lotes.
+
+    O lote é entregue a `flush_fn` quando atinge `max_lote` itens ou quando
+    `intervalo` segundos se passam desde o primeiro item pendente. A thread é
+    iniciada sob demanda e recriada após fork (workers do gunicorn com preload).
+
+    Um lote que falha é tentado de novo até `tentativas` vezes, com espera
+    exponencial a partir de `espera_base`; esgotadas as tentativas, os itens
+    são entregues a `ao_falhar` (se informado) e contados como erro.
+    """
+
+    def __init__(self, nome: str, flush_fn: Callable[[List[Any]], None], max_lote: int = 100,
+                 intervalo: float = 0.5, maxsize: int = 10000, tentativas: int = 1,
+                 espera_base: float = 0.5, ao_falhar: Optional[Callable[[List[Any]], None]] = None):
+        self.nome = nome
+        self.flush_fn = flush_fn
+        self.tentativas = max(1, tentativas)
+        self.espera_base = espera_base
+        self.ao_falhar = ao_falhar
+        self.max_lote = max_lote
+        self.intervalo = intervalo
+        self.maxsize = maxsize
+
+        self._fila: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._parar = threading.Event()
+
+        self.enfileirados = 0
+        self.processados = 0
+        self.descartados = 0
+        self.erros = 0
+        self.retentativas = 0
+        self.lotes = 0
+        self.atraso_ultimo_lote = 0.0
+        self.atraso_max = 0.0
+
+        with _processadores_lock:
+            _processadores.append(self)
+
+    def _garantir_thread(self) -> None:
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid != os.getpid():
+                # Processo filho herdou a fila do pai: começar limpo
+                self._fila = queue.Queue(maxsize=self.maxsize)
+                self._thread = None
+                self._parar = threading.Event()
+                self._pid = os.getpid()
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name=f'lote-{self.nome}', daemon=True)
+                self._thread.start()
+
+    def enviar(self, item: Any, timeout: float = 0) -> bool:
+        """Enfileira um item; retorna False se a fila continuar cheia após `timeout` segundos"""
+        self._garantir_thread()
+        try:
+            if timeout:
+                self._fila.put((time.time(), item), timeout=timeout)
+            else:
+                self._fila.put_nowait((time.time(), item))
+        except queue.Full:
+            self.descartados += 1
+            return False
+
+        self.enfileirados += 1
+        return True
+
+    def _coletar_lote(self) -> List[tuple]:
+        lote = []
+        try:
+            lote.append(self._fila.get(timeout=self.intervalo))
+        except queue.Empty:
+            return lote
+
+        limite = time.monotonic() + self.intervalo
+        while len(lote) < self.max_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _processar(self, lote: List[tuple]) -> None:
+        if not lote:
+            return
+
+        self.atraso_ultimo_lote = time.time() - lote[0][0]
+        self.atraso_max = max(self.atraso_max, self.atraso_ultimo_lote)
+
+        itens = [item for _, item in lote]
+        try:
+            for tentativa in range(self.tentativas):
+                try:
+                    self.flush_fn(itens)
+                    self.processados += len(itens)
+                    return
+                except Exception as e:
+                    erro = e
+                    if tentativa + 1 < self.tentativas:
+                        self.retentativas += 1
+                        espera = self.espera_base * 2 ** tentativa
+                        logger.warning(f"Falha no lote de {self.nome} ({len(itens)} itens), nova tentativa em {espera:.1f}s: {e}")
+                        # No encerramento (_parar ligado) as tentativas seguem sem esperar
+                        self._parar.wait(espera)
+
+            self.erros += len(itens)
+            logger.error(f"Erro ao processar lote de {self.nome} ({len(itens)} itens): {erro}")
+            if self.ao_falhar:
+                try:
+                    self.ao_falhar(itens)
+                except Exception as e:
+                    logger.error(f"Erro ao tratar lote descartado de {self.nome}: {e}")
+        finally:
+            self.lotes += 1
+
+    def _executar(self) -> None:
+        while not self._parar.is_set():
+            self._processar(self._coletar_lote())
+
+    def flush(self) -> None:
+        """Processa de forma síncrona tudo o que estiver na fila (usado no encerramento)"""
+        while True:
+            lote = []
+            while len(lote) < self.max_lote:
+                try:
+                    lote.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            if not lote:
+                return
+            self._processar(lote)
+
+    def parar(self) -> None:
+        """Interrompe a thread consumidora e esvazia a fila"""
+        self._parar.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.intervalo * 2 + 1)
+        self.flush()
+
+    def profundidade(self) -> int:
+        return self._fila.qsize()
+
+    def atraso_atual(self) -> float:
+        """Idade, em segundos, do item mais antigo ainda na fila"""
+        with self._fila.mutex:
+            if not self._fila.queue:
+                return 0.0
+            return time.time() - self._fila.queue[0][0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'profundidade': self.profundidade(),
+            'capacidade': self.maxsize,
+            'atraso_atual_s': round(self.atraso_atual(), 3),
+            'atraso_ultimo_lote_s': round(self.atraso_ultimo_lote, 3),
+            'atraso_max_s': round(self.atraso_max, 3),
+            'enfileirados': self.enfileirados,
+            'processados': self.processados,
+            'descartados': self.descartados,
+            'erros': self.erros,
+            'retentativas': self.retentativas,
+            'lotes': self.lotes
+        }
+
+
+def estatisticas_processadores() -> Dict[str, Dict[str, Any]]:
+    """Retorna as métricas de todos os processadores do processo"""
+    with _processadores_lock:
+        return {p.nome: p.stats() for p in _processadores}
+
+
+@atexit.register
+def parar_processadores() -> None:
+    """Para as threads e grava o que estiver nas filas (encerramento do processo/worker)"""
+    with _processadores_lock:
+        processadores = list(_processadores)
+    for processador in processadores:
+        try:
+            processador.parar()
+        except Exception as e:
+            logger.error(f"Erro ao encerrar processador {processador.nome}: {e}")
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """Cache LRU em memória com expiração por entrada (thread-safe)"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._dados: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chave: Hashable, default: Any = None) -> Any:
+        """Retorna o valor da chave se existir e não estiver expirado"""
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                self.misses += 1
+                return default
+
+            valor, expira_em = item
+            if expira_em <= time.monotonic():
+                del self._dados[chave]
+                self.misses += 1
+                return default
+
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return valor
+
+    def set(self, chave: Hashable, valor: Any, ttl: Optional[float] = None) -> None:
+        """Armazena valor, descartando a entrada menos usada se o cache estiver cheio"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._dados[chave] = (valor, time.monotonic() + ttl)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+
+    def get_or_set(self, chave: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Retorna do cache ou carrega com `loader` (valores None não são cacheados)"""
+        sentinela = object()
+        valor = self.get(chave, sentinela)
+        if valor is not sentinela:
+            return valor
+
+        valor = loader()
+        if valor is not None:
+            self.set(chave, valor, ttl)
+        return valor
+
+    def delete(self, chave: Hashable) -> None:
+        """Remove uma entrada do cache"""
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def delete_where(self, predicado: Callable[[Hashable], bool]) -> int:
+        """Remove todas as entradas cujas chaves satisfazem o predicado"""
+        with self._lock:
+            chaves = [c for c in self._dados if predicado(c)]
+            for chave in chaves:
+                del self._dados[chave]
+            return len(chaves)
+
+    def clear(self) -> None:
+        """Esvazia o cache"""
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def stats(self) -> dict:
+        """Retorna contadores de uso do cache"""
+        return {
+            'tamanho': len(self._dados),
+            'max': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+class JanelaDeduplicacao:
+    """Conjunto limitado de chaves vistas recentemente, com expiração por janela de tempo"""
+
+    def __init__(self, maxsize: int = 100000, janela: float = 600.0):
+        self.maxsize = maxsize
+        self.janela = janela
+        self._vistos: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.duplicados = 0
+
+    def _expirar(self, agora: float) -> None:
+        # Chaves são inseridas em ordem de tempo: basta olhar o início
+        while self._vistos:
+            chave, visto_em = next(iter(self._vistos.items()))
+            if agora - visto_em < self.janela and len(self._vistos) <= self.maxsize:
+                break
+            self._vistos.popitem(last=False)
+
+    def registrar(self, chave: Hashable) -> bool:
+        """Registra a chave; retorna False se ela já foi vista dentro da janela"""
+        agora = time.monotonic()
+        with self._lock:
+            self._expirar(agora)
+            if chave in self._vistos:
+                self.duplicados += 1
+                return False
+            self._vistos[chave] = agora
+            return True
+
+    def remover(self, chave: Hashable) -> None:
+        """Esquece a chave (ex.: o item não pôde ser processado e será reenviado)"""
+        with self._lock:
+            self._vistos.pop(chave, None)
+
+    def stats(self) -> dict:
+        return {
+            'tamanho': len(self._vistos),
+            'max': self.maxsize,
+            'janela_s': self.janela,
+            'duplicados': self.duplicados
+        }
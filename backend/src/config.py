@@ -18,9 +18,40 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
     
+    # Segredo para /api/metrics (header X-Metrics-Token); sem ele a rota responde 404
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
     # Configurações Evolution API
     EVOLUTION_API_URL = os.environ.get('EVOLUTION_API_URL') or 'http://localhost:8080'
     EVOLUTION_API_KEY = os.environ.get('EVOLUTION_API_KEY') or 'sua-chave-evolution-api'
+    EVOLUTION_INSTANCE_NAME = os.environ.get('EVOLUTION_INSTANCE_NAME') or 'cambara'
+    
+    # Ingestão assíncrona de webhooks
+    WEBHOOK_FILA_MAX = int(os.environ.get('WEBHOOK_FILA_MAX', 10000))
+    WEBHOOK_LOTE_MAX = int(os.environ.get('WEBHOOK_LOTE_MAX', 200))
+    WEBHOOK_LOTE_INTERVALO = float(os.environ.get('WEBHOOK_LOTE_INTERVALO', 0.5))  # segundos
+    WEBHOOK_LOTE_TENTATIVAS = int(os.environ.get('WEBHOOK_LOTE_TENTATIVAS', 5))  # com espera exponencial a partir de 0,5s
+    WEBHOOK_DEDUP_MAX = int(os.environ.get('WEBHOOK_DEDUP_MAX', 100000))
+    WEBHOOK_DEDUP_JANELA = int(os.environ.get('WEBHOOK_DEDUP_JANELA', 600))  # segundos
+    STATUS_LOTE_MAX = int(os.environ.get('STATUS_LOTE_MAX', 5000))
+    STATUS_LOTE_INTERVALO = float(os.environ.get('STATUS_LOTE_INTERVALO', 2.0))  # janela de agrupamento
+    
+    # Classificação de sentimento das respostas (em segundo plano)
+    SENTIMENTO_AUTOMATICO = os.environ.get('SENTIMENTO_AUTOMATICO', 'true').lower() == 'true'
+    SENTIMENTO_LOTE = int(os.environ.get('SENTIMENTO_LOTE', 2000))
+    SENTIMENTO_INTERVALO = float(os.environ.get('SENTIMENTO_INTERVALO', 5.0))  # segundos
+    SENTIMENTO_ATRASO = float(os.environ.get('SENTIMENTO_ATRASO', 120.0))  # segundos relidos atrás da marca d'água
+    
+    # Limite de requisições por empresa (janela deslizante, por processo)
+    RATE_LIMIT_ATIVO = os.environ.get('RATE_LIMIT_ATIVO', 'true').lower() == 'true'
+    RATE_LIMIT_MAX_CHAVES = int(os.environ.get('RATE_LIMIT_MAX_CHAVES', 50000))
+    RATE_LIMIT_PLANOS = os.environ.get('RATE_LIMIT_PLANOS')  # JSON: {"plano": {"classe": [limite, janela_s]}}
+    
+    # Log de atividades (logs_sistema) gravado em lote
+    AUDITORIA_FILA_MAX = int(os.environ.get('AUDITORIA_FILA_MAX', 10000))
+    AUDITORIA_LOTE_MAX = int(os.environ.get('AUDITORIA_LOTE_MAX', 500))
+    AUDITORIA_LOTE_INTERVALO = float(os.environ.get('AUDITORIA_LOTE_INTERVALO', 2.0))  # segundos
+    AUDITORIA_ESPERA = float(os.environ.get('AUDITORIA_ESPERA', 0.05))  # espera máxima com a fila cheia
     
     # Configurações n8n
     N8N_WEBHOOK_URL = os.environ.get('N8N_WEBHOOK_URL') or 'http://localhost:5678/webhook'
@@ -37,6 +68,22 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     UPLOAD_FOLDER = 'uploads'
     ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
+    
+    # Importações em segundo plano (spool em UPLOAD_FOLDER/importacoes)
+    IMPORTACAO_MAX_BYTES = int(os.environ.get('IMPORTACAO_MAX_BYTES', 512 * 1024 * 1024))  # upload em stream único
+    IMPORTACAO_SIMULTANEAS = int(os.environ.get('IMPORTACAO_SIMULTANEAS', 2))
+    IMPORTACAO_INATIVIDADE = int(os.environ.get('IMPORTACAO_INATIVIDADE', 120))  # segundos sem progresso para permitir retomar
+    IMPORTACAO_SPOOL_TTL = int(os.environ.get('IMPORTACAO_SPOOL_TTL', 3 * 24 * 3600))  # segundos sem atividade até o spool ser apagado
+    
+    # Relatórios em segundo plano (artefatos em UPLOAD_FOLDER/relatorios)
+    RELATORIO_SIMULTANEOS = int(os.environ.get('RELATORIO_SIMULTANEOS', 2))
+    RELATORIO_INATIVIDADE = int(os.environ.get('RELATORIO_INATIVIDADE', 600))  # segundos até um job parado ser refeito
+    RELATORIO_TTL = int(os.environ.get('RELATORIO_TTL', 7 * 24 * 3600))  # segundos até o relatório (linha e arquivo) ser apagado
+    
+    # Frontend estático (índice em memória montado na inicialização)
+    STATIC_COMPRIMIR = os.environ.get('STATIC_COMPRIMIR', 'true').lower() == 'true'  # gera .gz/.br ausentes no build
+    STATIC_MMAP = os.environ.get('STATIC_MMAP', 'false').lower() == 'true'
+    STATIC_MMAP_MIN_BYTES = int(os.environ.get('STATIC_MMAP_MIN_BYTES', 1024 * 1024))
 
 class DevelopmentConfig(Config):
     DEBUG = True
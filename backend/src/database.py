@@ -1,10 +1,28 @@
 import os
+import re
+from datetime import datetime, timezone
 from supabase import create_client, Client
-from typing import Optional, Dict, Any, List
+from postgrest.exceptions import APIError
+from typing import Optional, Dict, Any, List, Iterator, Callable
+from src.batch import ProcessadorLote
+from src.cache import TTLCache
+from src.segmentos import aplicar_segmento, chave_segmento
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Detalhe da violação do índice único idx_contatos_empresa_chave_dedupe
+_CHAVE_DUPLICADA_RE = re.compile(r'\(empresa_id, chave_dedupe\)=\(([^,]+), (.+)\) already exists')
+
+
+class ContatoDuplicado(Exception):
+    """Telefone/email já usado por outro contato da empresa (mesma chave_dedupe)"""
+
+    def __init__(self, contato_id: Optional[str]):
+        super().__init__('Já existe um contato com este telefone ou email')
+        self.contato_id = contato_id
+
+
 class SupabaseClient:
     def __init__(self, url: str = None, key: str = None):
         self.url = url or os.environ.get('SUPABASE_URL')
@@ -14,6 +32,32 @@ class SupabaseClient:
             raise ValueError("SUPABASE_URL e SUPABASE_KEY são obrigatórios")
         
         self.client: Client = create_client(self.url, self.key)
+        
+        # Contagens de segmentos por (empresa_id, hash da definição)
+        self.contagens_segmentos = TTLCache(
+            maxsize=int(os.environ.get('SEGMENTOS_CACHE_MAX', 4096)),
+            ttl=int(os.environ.get('SEGMENTOS_CACHE_TTL', 300))
+        )
+        
+        # Usuários por ('id', id) e ('email', email), sem senha_hash; empresas por id.
+        # TTL curto: escritas feitas por este processo invalidam na hora.
+        self.usuarios_cache = TTLCache(
+            maxsize=int(os.environ.get('USUARIOS_CACHE_MAX', 10000)),
+            ttl=int(os.environ.get('USUARIOS_CACHE_TTL', 60))
+        )
+        self.empresas_cache = TTLCache(
+            maxsize=int(os.environ.get('EMPRESAS_CACHE_MAX', 2000)),
+            ttl=int(os.environ.get('EMPRESAS_CACHE_TTL', 300))
+        )
+        
+        # ultimo_login é gravado fora do caminho do login, em lotes
+        self.ultimos_logins = ProcessadorLote(
+            'ultimo_login',
+            self._gravar_ultimos_logins,
+            max_lote=500,
+            intervalo=float(os.environ.get('ULTIMO_LOGIN_INTERVALO', 5.0)),
+            maxsize=10000
+        )
     
     def get_client(self) -> Client:
         """Retorna o cliente Supabase"""
@@ -26,70 +70,271 @@ class SupabaseClient:
     def get_empresa_by_slug(self, slug: str) -> Optional[Dict[str, Any]]:
         """Busca empresa por slug"""
         try:
-            response = self.client.table('empresas').select('*').eq('slug', slug).single().execute()
-            return response.data
+            response = self.client.table('empresas').select('*').eq('slug', slug).limit(1).execute()
+            return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Erro ao buscar empresa por slug {slug}: {e}")
             return None
     
+    def get_empresa_by_id(self, empresa_id: str) -> Optional[Dict[str, Any]]:
+        """Busca empresa por id (cacheada)"""
+        def carregar():
+            try:
+                response = self.client.table('empresas').select('*').eq('id', empresa_id).limit(1).execute()
+                return response.data[0] if response.data else None
+            except Exception as e:
+                logger.error(f"Erro ao buscar empresa {empresa_id}: {e}")
+                return None
+        
+        if not empresa_id:
+            return None
+        return self.empresas_cache.get_or_set(empresa_id, carregar)
+    
     def create_empresa(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Cria nova empresa"""
         try:
             response = self.client.table('empresas').insert(data).execute()
-            return response.data[0] if response.data else None
+            empresa = response.data[0] if response.data else None
+            if empresa:
+                self.empresas_cache.set(empresa['id'], empresa)
+            return empresa
         except Exception as e:
             logger.error(f"Erro ao criar empresa: {e}")
             return None
     
+    def invalidar_empresa(self, empresa_id: str) -> None:
+        """Descarta a empresa do cache (chamar após alterá-la)"""
+        self.empresas_cache.delete(empresa_id)
+    
     # =====================================================
     # MÉTODOS PARA USUÁRIOS
     # =====================================================
     
+    def _cachear_usuario(self, user: Dict[str, Any]) -> Dict[str, Any]:
+        # O hash fica fora do cache: o login o lê sempre do banco
+        # (get_credenciais_by_email), então uma troca de senha vale na hora
+        user = {chave: valor for chave, valor in user.items() if chave != 'senha_hash'}
+        self.usuarios_cache.set(('id', user['id']), user)
+        self.usuarios_cache.set(('email', user['email']), user)
+        return user
+    
+    def invalidar_usuario(self, user_id: str = None, email: str = None) -> None:
+        """Descarta o usuário do cache (por id e/ou email)"""
+        if user_id:
+            user = self.usuarios_cache.get(('id', user_id))
+            if user:
+                email = email or user.get('email')
+            self.usuarios_cache.delete(('id', user_id))
+        if email:
+            self.usuarios_cache.delete(('email', email))
+    
     def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
-        """Busca usuário por email"""
+        """Busca usuário ativo por email (cacheado)"""
+        user = self.usuarios_cache.get(('email', email))
+        if user is not None:
+            return user
+        
         try:
-            response = self.client.table('usuarios').select('*').eq('email', email).eq('ativo', True).single().execute()
-            return response.data
+            response = self.client.table('usuarios').select('*').eq('email', email).eq('ativo', True).limit(1).execute()
         except Exception as e:
             logger.error(f"Erro ao buscar usuário por email {email}: {e}")
             return None
+        
+        user = response.data[0] if response.data else None
+        if user:
+            user = self._cachear_usuario(user)
+        return user
+    
+    def get_credenciais_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """Busca usuário ativo por email com senha_hash, sempre no banco (login)"""
+        try:
+            response = self.client.table('usuarios').select('*').eq('email', email).eq('ativo', True).limit(1).execute()
+        except Exception as e:
+            logger.error(f"Erro ao buscar credenciais de {email}: {e}")
+            return None
+        
+        user = response.data[0] if response.data else None
+        if user:
+            self._cachear_usuario(user)
+        return user
+    
+    def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Busca usuário ativo por id (cacheado)"""
+        user = self.usuarios_cache.get(('id', user_id))
+        if user is not None:
+            return user
+        
+        try:
+            response = self.client.table('usuarios').select('*').eq('id', user_id).eq('ativo', True).limit(1).execute()
+        except Exception as e:
+            logger.error(f"Erro ao buscar usuário {user_id}: {e}")
+            return None
+        
+        user = response.data[0] if response.data else None
+        if user:
+            user = self._cachear_usuario(user)
+        return user
     
     def create_user(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Cria novo usuário"""
         try:
             response = self.client.table('usuarios').insert(data).execute()
-            return response.data[0] if response.data else None
+            user = response.data[0] if response.data else None
+            if user:
+                user = self._cachear_usuario(user)
+            return user
         except Exception as e:
             logger.error(f"Erro ao criar usuário: {e}")
             return None
     
     def update_user_last_login(self, user_id: str) -> bool:
-        """Atualiza último login do usuário"""
+        """Registra o último login do usuário (gravado em lote, em segundo plano)"""
+        agora = datetime.now(timezone.utc).isoformat()
+        
+        # Mantém o usuário cacheado coerente com o que será gravado
+        user = self.usuarios_cache.get(('id', user_id))
+        if user:
+            self._cachear_usuario({**user, 'ultimo_login': agora})
+        
+        if not self.ultimos_logins.enviar((user_id, agora)):
+            logger.warning(f"Fila de último login cheia, atualização descartada: {user_id}")
+            return False
+        return True
+    
+    def _gravar_ultimos_logins(self, logins: List[tuple]) -> None:
+        # Uma chamada por lote, com o login mais recente de cada usuário na janela
+        ultimos: Dict[str, str] = {}
+        for user_id, momento in logins:
+            if momento > ultimos.get(user_id, ''):
+                ultimos[user_id] = momento
+        payload = [{'id': user_id, 'ultimo_login': momento} for user_id, momento in ultimos.items()]
+        self.client.rpc('registrar_ultimos_logins', {'payload': payload}).execute()
+    
+    def update_user_password_hash(self, user_id: str, senha_hash: str) -> bool:
+        """Atualiza o hash da senha do usuário"""
         try:
-            self.client.table('usuarios').update({'ultimo_login': 'now()'}).eq('id', user_id).execute()
+            self.client.table('usuarios').update({'senha_hash': senha_hash}).eq('id', user_id).execute()
+            self.invalidar_usuario(user_id)
             return True
         except Exception as e:
-            logger.error(f"Erro ao atualizar último login: {e}")
+            logger.error(f"Erro ao atualizar hash da senha: {e}")
             return False
     
     # =====================================================
     # MÉTODOS PARA CONTATOS
     # =====================================================
     
-    def get_contatos(self, empresa_id: str, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
-        """Lista contatos da empresa"""
+    def get_contatos(self, empresa_id: str, limit: int = 100, offset: int = 0, definicao: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Lista contatos da empresa (opcionalmente filtrados por um segmento)"""
         try:
-            response = self.client.table('contatos').select('*').eq('empresa_id', empresa_id).range(offset, offset + limit - 1).execute()
+            query = self.client.table('contatos').select('*').eq('empresa_id', empresa_id)
+            if definicao:
+                query = aplicar_segmento(query, definicao)
+            response = query.range(offset, offset + limit - 1).execute()
             return response.data or []
         except Exception as e:
             logger.error(f"Erro ao buscar contatos: {e}")
             return []
     
+    def iter_contatos(self, empresa_id: str, definicao: Dict[str, Any] = None, colunas: str = '*',
+                      page_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """Percorre os contatos da empresa (opcionalmente de um segmento) em páginas, por keyset no id"""
+        filtro = (lambda query: aplicar_segmento(query, definicao)) if definicao else None
+        return self.iter_registros('contatos', empresa_id, colunas, filtro, page_size)
+    
+    def iter_registros(self, tabela: str, empresa_id: str, colunas: str = '*',
+                       filtro: Callable[[Any], Any] = None, page_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """Percorre registros da empresa numa tabela em páginas, por keyset no id.
+        
+        `filtro` recebe a query e devolve a query com filtros adicionais.
+        """
+        if 'id' not in colunas.split(',') and colunas != '*':
+            colunas = f'id,{colunas}'
+        
+        ultimo_id = None
+        while True:
+            query = self.client.table(tabela).select(colunas).eq('empresa_id', empresa_id)
+            if filtro:
+                query = filtro(query)
+            if ultimo_id is not None:
+                query = query.gt('id', ultimo_id)
+            
+            response = query.order('id').limit(page_size).execute()
+            pagina = response.data or []
+            if not pagina:
+                return
+            
+            yield pagina
+            
+            if len(pagina) < page_size:
+                return
+            ultimo_id = pagina[-1]['id']
+    
+    def count_contatos_segmento(self, empresa_id: str, definicao: Dict[str, Any], usar_cache: bool = True) -> Optional[int]:
+        """Conta os contatos de um segmento (resultado cacheado por empresa e definição)"""
+        chave = (empresa_id, chave_segmento(definicao))
+        if usar_cache:
+            total = self.contagens_segmentos.get(chave)
+            if total is not None:
+                return total
+        
+        try:
+            query = self.client.table('contatos').select('id', count='exact', head=True).eq('empresa_id', empresa_id)
+            response = aplicar_segmento(query, definicao).execute()
+            total = response.count or 0
+            self.contagens_segmentos.set(chave, total)
+            return total
+        except Exception as e:
+            logger.error(f"Erro ao contar contatos do segmento: {e}")
+            return None
+    
+    def invalidar_contagens_segmentos(self, empresa_id: str) -> None:
+        """Descarta as contagens de segmentos cacheadas da empresa (chamar após escrever contatos)"""
+        self.contagens_segmentos.delete_where(lambda chave: chave[0] == empresa_id)
+    
+    def get_contatos_by_ids(self, empresa_id: str, contatos_ids: List[str], colunas: str = '*') -> List[Dict[str, Any]]:
+        """Busca contatos da empresa pelos ids"""
+        try:
+            response = self.client.table('contatos').select(colunas).eq('empresa_id', empresa_id).in_('id', contatos_ids).execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Erro ao buscar contatos por ids: {e}")
+            return []
+    
+    def get_tags_contagem(self, empresa_id: str) -> List[Dict[str, Any]]:
+        """Retorna a contagem de contatos por tag da empresa"""
+        try:
+            response = self.client.table('contatos_tags_contagem').select('tag,total').eq('empresa_id', empresa_id).order('total', desc=True).execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Erro ao buscar contagem de tags: {e}")
+            return []
+    
+    def _contato_duplicado(self, erro: APIError) -> Optional[ContatoDuplicado]:
+        """Converte a violação de (empresa_id, chave_dedupe) em ContatoDuplicado com o id do existente"""
+        encontrado = _CHAVE_DUPLICADA_RE.search(erro.details or '') if erro.code == '23505' else None
+        if not encontrado:
+            return None
+        
+        empresa_id, chave = encontrado.groups()
+        try:
+            response = self.client.table('contatos').select('id').eq('empresa_id', empresa_id).eq('chave_dedupe', chave).limit(1).execute()
+            return ContatoDuplicado(response.data[0]['id'] if response.data else None)
+        except Exception as e:
+            logger.error(f"Erro ao buscar contato duplicado: {e}")
+            return ContatoDuplicado(None)
+    
     def create_contato(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Cria novo contato"""
+        """Cria novo contato; levanta ContatoDuplicado se o telefone/email já estiver em uso"""
         try:
             response = self.client.table('contatos').insert(data).execute()
             return response.data[0] if response.data else None
+        except APIError as e:
+            duplicado = self._contato_duplicado(e)
+            if duplicado:
+                raise duplicado
+            logger.error(f"Erro ao criar contato: {e}")
+            return None
         except Exception as e:
             logger.error(f"Erro ao criar contato: {e}")
             return None
@@ -103,11 +348,42 @@ class SupabaseClient:
             logger.error(f"Erro ao criar contatos em lote: {e}")
             return False
     
+    def upsert_contatos(self, contatos: List[Dict[str, Any]], modo: str = 'ignorar') -> Optional[Dict[str, int]]:
+        """Grava contatos deduplicando por (empresa_id, chave_dedupe).
+        
+        modo 'ignorar' mantém os existentes intactos; 'mesclar' preenche/atualiza
+        os existentes sem apagar dados com valores vazios (RPC mesclar_contatos).
+        Retorna {'inseridos', 'atualizados'} ou None em caso de erro.
+        """
+        try:
+            if modo == 'mesclar':
+                response = self.client.rpc('mesclar_contatos', {'payload': contatos}).execute()
+                return {
+                    'inseridos': response.data.get('inseridos', 0),
+                    'atualizados': response.data.get('atualizados', 0)
+                }
+            
+            response = self.client.table('contatos').upsert(
+                contatos,
+                on_conflict='empresa_id,chave_dedupe',
+                ignore_duplicates=True
+            ).execute()
+            return {'inseridos': len(response.data or []), 'atualizados': 0}
+        except Exception as e:
+            logger.error(f"Erro ao gravar contatos em lote ({modo}): {e}")
+            return None
+    
     def update_contato(self, contato_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Atualiza contato"""
+        """Atualiza contato; levanta ContatoDuplicado se o telefone/email já estiver em uso"""
         try:
             response = self.client.table('contatos').update(data).eq('id', contato_id).execute()
             return response.data[0] if response.data else None
+        except APIError as e:
+            duplicado = self._contato_duplicado(e)
+            if duplicado:
+                raise duplicado
+            logger.error(f"Erro ao atualizar contato: {e}")
+            return None
         except Exception as e:
             logger.error(f"Erro ao atualizar contato: {e}")
             return None
@@ -121,6 +397,206 @@ class SupabaseClient:
             logger.error(f"Erro ao deletar contato: {e}")
             return False
     
+    # =====================================================
+    # MÉTODOS PARA SEGMENTOS
+    # =====================================================
+    
+    def get_segmentos(self, empresa_id: str) -> List[Dict[str, Any]]:
+        """Lista segmentos da empresa"""
+        try:
+            response = self.client.table('segmentos').select('*').eq('empresa_id', empresa_id).order('created_at', desc=True).execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Erro ao buscar segmentos: {e}")
+            return []
+    
+    def get_segmento(self, empresa_id: str, segmento_id: str) -> Optional[Dict[str, Any]]:
+        """Busca segmento da empresa por id"""
+        try:
+            response = self.client.table('segmentos').select('*').eq('empresa_id', empresa_id).eq('id', segmento_id).limit(1).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao buscar segmento {segmento_id}: {e}")
+            return None
+    
+    def create_segmento(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Cria novo segmento"""
+        try:
+            response = self.client.table('segmentos').insert(data).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao criar segmento: {e}")
+            return None
+    
+    def update_segmento(self, empresa_id: str, segmento_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Atualiza segmento"""
+        try:
+            response = self.client.table('segmentos').update(data).eq('empresa_id', empresa_id).eq('id', segmento_id).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao atualizar segmento: {e}")
+            return None
+    
+    def delete_segmento(self, empresa_id: str, segmento_id: str) -> bool:
+        """Deleta segmento"""
+        try:
+            response = self.client.table('segmentos').delete().eq('empresa_id', empresa_id).eq('id', segmento_id).execute()
+            return bool(response.data)
+        except Exception as e:
+            logger.error(f"Erro ao deletar segmento: {e}")
+            return False
+    
+    # =====================================================
+    # MÉTODOS PARA IMPORTAÇÕES
+    # =====================================================
+    
+    def get_importacoes(self, empresa_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Lista as importações mais recentes da empresa"""
+        try:
+            response = self.client.table('importacoes').select('*').eq('empresa_id', empresa_id).order('created_at', desc=True).limit(limit).execute()
+            return response.data
+        except Exception as e:
+            logger.error(f"Erro ao buscar importações: {e}")
+            return []
+    
+    def get_importacao(self, empresa_id: str, importacao_id: str) -> Optional[Dict[str, Any]]:
+        """Busca importação da empresa por id"""
+        try:
+            response = self.client.table('importacoes').select('*').eq('empresa_id', empresa_id).eq('id', importacao_id).limit(1).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao buscar importação {importacao_id}: {e}")
+            return None
+    
+    def create_importacao(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Cria nova importação"""
+        try:
+            response = self.client.table('importacoes').insert(data).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao criar importação: {e}")
+            return None
+    
+    def update_importacao(self, importacao_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Atualiza progresso/status da importação"""
+        try:
+            response = self.client.table('importacoes').update({**data, 'updated_at': datetime.now(timezone.utc).isoformat()}).eq('id', importacao_id).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao atualizar importação {importacao_id}: {e}")
+            return None
+    
+    def iniciar_importacao(self, importacao_id: str, bytes_recebidos: int) -> Optional[Dict[str, Any]]:
+        """Passa a importação de recebendo para pendente; None se outra requisição já a iniciou (UPDATE condicional)"""
+        try:
+            response = self.client.table('importacoes').update({
+                'status': 'pendente',
+                'erro': None,
+                'bytes_recebidos': bytes_recebidos,
+                'updated_at': datetime.now(timezone.utc).isoformat()
+            }).eq('id', importacao_id).eq('status', 'recebendo').execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao iniciar importação {importacao_id}: {e}")
+            return None
+    
+    def get_importacoes_por_ids(self, importacao_ids: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """Status e última atualização de várias importações (limpeza do spool); None em caso de erro"""
+        try:
+            response = self.client.table('importacoes').select('id,status,updated_at').in_('id', importacao_ids).execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Erro ao buscar importações: {e}")
+            return None
+    
+    def reivindicar_importacao(self, importacao_id: str, parada_desde: str) -> Optional[Dict[str, Any]]:
+        """Marca a importação como pendente só se estiver com erro ou parada desde `parada_desde`.
+
+        O UPDATE condicional é atômico: entre workers concorrentes, apenas um
+        recebe a linha de volta e executa a importação.
+        """
+        try:
+            response = self.client.table('importacoes').update({
+                'status': 'pendente',
+                'erro': None,
+                'updated_at': datetime.now(timezone.utc).isoformat()
+            }).eq('id', importacao_id).or_(
+                f'status.eq.erro,and(status.in.(pendente,processando),updated_at.lt."{parada_desde}")'
+            ).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao reivindicar importação {importacao_id}: {e}")
+            return None
+
+    # =====================================================
+    # MÉTODOS PARA RELATÓRIOS
+    # =====================================================
+
+    def get_relatorio(self, empresa_id: str, relatorio_id: str) -> Optional[Dict[str, Any]]:
+        """Busca relatório da empresa por id"""
+        try:
+            response = self.client.table('relatorios').select('*').eq('empresa_id', empresa_id).eq('id', relatorio_id).limit(1).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao buscar relatório {relatorio_id}: {e}")
+            return None
+
+    def get_relatorio_por_chave(self, empresa_id: str, chave: str) -> Optional[Dict[str, Any]]:
+        """Relatório mais recente (sem erro) com a mesma chave de período, formato e versões"""
+        try:
+            response = self.client.table('relatorios').select('*').eq('empresa_id', empresa_id).eq('chave', chave).neq('status', 'erro').order('created_at', desc=True).limit(1).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao buscar relatório por chave: {e}")
+            return None
+
+    def create_relatorio(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Cria novo relatório"""
+        try:
+            response = self.client.table('relatorios').insert(data).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao criar relatório: {e}")
+            return None
+
+    def update_relatorio(self, relatorio_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Atualiza status do relatório"""
+        try:
+            response = self.client.table('relatorios').update({**data, 'updated_at': datetime.now(timezone.utc).isoformat()}).eq('id', relatorio_id).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao atualizar relatório {relatorio_id}: {e}")
+            return None
+
+    def remover_relatorios_anteriores(self, relatorio: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Apaga os relatórios finalizados mais antigos do mesmo período e formato; retorna os removidos"""
+        try:
+            response = self.client.table('relatorios').delete().eq('empresa_id', relatorio['empresa_id']).eq('de', relatorio['de']).eq('ate', relatorio['ate']).eq('formato', relatorio['formato']).neq('id', relatorio['id']).lt('created_at', relatorio['created_at']).in_('status', ['concluido', 'erro']).execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Erro ao remover relatórios anteriores a {relatorio['id']}: {e}")
+            return []
+
+    def remover_relatorios_expirados(self, criados_antes_de: str) -> List[Dict[str, Any]]:
+        """Apaga os relatórios criados antes de `criados_antes_de`; retorna os removidos"""
+        try:
+            response = self.client.table('relatorios').delete().lt('created_at', criados_antes_de).execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Erro ao remover relatórios expirados: {e}")
+            return []
+
+    def contar(self, tabela: str, empresa_id: str, filtros: Dict[str, Any] = None) -> Optional[int]:
+        """Conta as linhas da empresa no banco (sem transferir registros)"""
+        try:
+            query = self.client.table(tabela).select('id', count='exact', head=True).eq('empresa_id', empresa_id)
+            for coluna, valor in (filtros or {}).items():
+                query = query.eq(coluna, valor)
+            return query.execute().count or 0
+        except Exception as e:
+            logger.error(f"Erro ao contar {tabela}: {e}")
+            return None
+
     # =====================================================
     # MÉTODOS PARA CAMPANHAS
     # =====================================================
@@ -134,6 +610,15 @@ class SupabaseClient:
             logger.error(f"Erro ao buscar campanhas: {e}")
             return []
     
+    def get_campanha_by_id(self, campanha_id: str) -> Optional[Dict[str, Any]]:
+        """Busca campanha por id"""
+        try:
+            response = self.client.table('campanhas').select('*').eq('id', campanha_id).limit(1).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao buscar campanha {campanha_id}: {e}")
+            return None
+    
     def create_campanha(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Cria nova campanha"""
         try:
@@ -165,6 +650,15 @@ class SupabaseClient:
             logger.error(f"Erro ao criar disparo: {e}")
             return None
     
+    def bulk_create_disparos(self, disparos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Cria múltiplos disparos de uma vez e retorna os registros criados"""
+        try:
+            response = self.client.table('disparos').insert(disparos).execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Erro ao criar disparos em lote: {e}")
+            return []
+    
     def update_disparo_status(self, disparo_id: str, status: str, detalhes: Dict[str, Any] = None) -> bool:
         """Atualiza status do disparo"""
         try:
@@ -178,6 +672,29 @@ class SupabaseClient:
             logger.error(f"Erro ao atualizar status do disparo: {e}")
             return False
     
+    def update_disparos_status(self, external_ids: List[str], status: str, status_anteriores: List[str] = None,
+                               detalhes: Dict[str, Any] = None, lote: int = 200) -> List[Dict[str, Any]]:
+        """Atualiza em lote o status dos disparos pelo external_id.
+        
+        Com `status_anteriores`, só altera disparos que ainda estejam num desses
+        status (impede regressão, ex.: lido -> entregue). Retorna os registros alterados.
+        """
+        update_data = {'status': status}
+        if detalhes:
+            update_data.update(detalhes)
+        
+        atualizados = []
+        for inicio in range(0, len(external_ids), lote):
+            try:
+                query = self.client.table('disparos').update(update_data).in_('external_id', external_ids[inicio:inicio + lote])
+                if status_anteriores:
+                    query = query.in_('status', status_anteriores)
+                response = query.execute()
+                atualizados.extend(response.data or [])
+            except Exception as e:
+                logger.error(f"Erro ao atualizar status de disparos em lote: {e}")
+        return atualizados
+    
     # =====================================================
     # MÉTODOS PARA RESPOSTAS
     # =====================================================
@@ -191,6 +708,178 @@ class SupabaseClient:
             logger.error(f"Erro ao criar resposta: {e}")
             return None
     
+    def bulk_create_respostas(self, respostas: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """Cria múltiplas respostas de uma vez, ignorando id_mensagem já gravado.
+        
+        Retorna apenas as respostas inseridas, ou None em caso de erro.
+        """
+        try:
+            response = self.client.table('respostas').upsert(respostas, on_conflict='id_mensagem', ignore_duplicates=True).execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Erro ao criar respostas em lote: {e}")
+            return None
+    
+    def get_respostas_sem_sentimento(self, desde: Optional[str], limit: int = 1000) -> List[Dict[str, Any]]:
+        """Lista respostas ainda não classificadas a partir da marca d'água, em ordem de criação"""
+        try:
+            query = self.client.table('respostas').select('id,conteudo,created_at').is_('sentimento', 'null')
+            if desde:
+                query = query.gte('created_at', desde)
+            response = query.order('created_at').order('id').limit(limit).execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Erro ao buscar respostas sem sentimento: {e}")
+            return []
+    
+    def bulk_update_sentimentos(self, sentimentos: List[Dict[str, Any]]) -> bool:
+        """Grava sentimento e score de várias respostas numa única chamada"""
+        try:
+            self.client.rpc('atualizar_sentimentos_respostas', {'payload': sentimentos}).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao atualizar sentimentos em lote: {e}")
+            return False
+    
+    # =====================================================
+    # MÉTODOS PARA NPS
+    # =====================================================
+    
+    def incrementar_nps(self, incrementos: List[Dict[str, Any]]) -> bool:
+        """Soma incrementos aos agregados de NPS por campanha e por empresa"""
+        try:
+            self.client.rpc('incrementar_nps', {'payload': incrementos}).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao incrementar agregados de NPS: {e}")
+            return False
+    
+    def get_nps_agregado(self, empresa_id: str, campanha_id: str = None) -> Optional[Dict[str, Any]]:
+        """Retorna o agregado de NPS da campanha, ou da empresa se campanha_id for None"""
+        try:
+            query = self.client.table('nps_agregados').select('*').eq('empresa_id', empresa_id)
+            if campanha_id:
+                query = query.eq('campanha_id', campanha_id)
+            else:
+                query = query.is_('campanha_id', 'null')
+            response = query.limit(1).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao buscar agregado de NPS: {e}")
+            return None
+    
+    # =====================================================
+    # MÉTODOS PARA MÉTRICAS DIÁRIAS (ROLLUP)
+    # =====================================================
+
+    def get_metricas_diarias(self, empresa_id: str, de: str, ate: str, campanha_id: str = None) -> List[Dict[str, Any]]:
+        """Busca as linhas de metricas_diarias do período [de, ate] (uma por dia e campanha)"""
+        try:
+            query = self.client.table('metricas_diarias').select('*').eq('empresa_id', empresa_id).gte('dia', de).lte('dia', ate)
+            if campanha_id:
+                query = query.eq('campanha_id', campanha_id)
+            response = query.order('dia').execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Erro ao buscar métricas diárias: {e}")
+            return []
+
+    def get_sentimentos_empresa(self, empresa_id: str) -> Dict[str, int]:
+        """Totais de respostas por sentimento da empresa"""
+        try:
+            response = self.client.rpc('get_sentimentos_empresa', {'p_empresa_id': empresa_id}).execute()
+            if response.data:
+                return response.data[0]
+        except Exception as e:
+            logger.error(f"Erro ao buscar sentimentos da empresa: {e}")
+        return {'positivas': 0, 'neutras': 0, 'negativas': 0, 'respondidos': 0}
+
+    def get_metricas_campanhas(self, empresa_id: str, campanha_id: str = None) -> List[Dict[str, Any]]:
+        """Desempenho (entrega, leitura, resposta) das campanhas da empresa"""
+        try:
+            response = self.client.rpc('get_metricas_campanhas_empresa', {
+                'p_empresa_id': empresa_id,
+                'p_campanha_id': campanha_id
+            }).execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Erro ao buscar métricas das campanhas: {e}")
+            return []
+
+    def recalcular_metricas_diarias(self, de: Optional[str], ate: Optional[str], empresa_id: str = None) -> Optional[int]:
+        """Recalcula os dias [de, ate] de metricas_diarias a partir de disparos e respostas"""
+        try:
+            response = self.client.rpc('recalcular_metricas_diarias', {
+                'p_de': de,
+                'p_ate': ate,
+                'p_empresa_id': empresa_id
+            }).execute()
+            return response.data or 0
+        except Exception as e:
+            logger.error(f"Erro ao recalcular métricas diárias: {e}")
+            return None
+
+    # =====================================================
+    # MÉTODOS PARA LOG DE ATIVIDADES
+    # =====================================================
+
+    def bulk_create_logs(self, registros: List[Dict[str, Any]]) -> bool:
+        """Grava um lote de registros em logs_sistema"""
+        try:
+            self.client.table('logs_sistema').insert(registros, returning='minimal').execute()
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao gravar logs em lote: {e}")
+            return False
+
+    def get_logs_sistema(self, empresa_id: str, limit: int = 20, antes: tuple = None) -> List[Dict[str, Any]]:
+        """Logs da empresa do mais recente ao mais antigo; `antes` = (created_at, id) do último item da página anterior"""
+        try:
+            query = self.client.table('logs_sistema').select('*').eq('empresa_id', empresa_id)
+            if antes:
+                created_at, log_id = antes
+                query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{log_id})')
+            response = query.order('created_at', desc=True).order('id', desc=True).limit(limit).execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Erro ao buscar logs: {e}")
+            return []
+
+    # =====================================================
+    # MÉTODOS PARA VERSÕES DOS DADOS (ETag)
+    # =====================================================
+
+    def get_versoes_empresa(self, empresa_id: str, escopos: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Retorna {escopo: {'versao', 'updated_at'}} dos escopos da empresa (ausentes = nunca escritos)"""
+        try:
+            response = self.client.table('versoes_empresa').select('escopo,versao,updated_at').eq('empresa_id', empresa_id).in_('escopo', escopos).execute()
+            return {v['escopo']: v for v in response.data or []}
+        except Exception as e:
+            logger.error(f"Erro ao buscar versões da empresa: {e}")
+            return None
+
+    # =====================================================
+    # MÉTODOS PARA PROCESSAMENTO EM SEGUNDO PLANO
+    # =====================================================
+
+    def get_watermark(self, nome: str) -> Optional[str]:
+        """Retorna a marca d'água de um processamento incremental"""
+        try:
+            response = self.client.table('processamento_watermarks').select('valor').eq('nome', nome).limit(1).execute()
+            return response.data[0]['valor'] if response.data else None
+        except Exception as e:
+            logger.error(f"Erro ao buscar watermark {nome}: {e}")
+            return None
+    
+    def set_watermark(self, nome: str, valor: str) -> bool:
+        """Avança a marca d'água de um processamento incremental"""
+        try:
+            self.client.table('processamento_watermarks').upsert({'nome': nome, 'valor': valor}, on_conflict='nome').execute()
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao gravar watermark {nome}: {e}")
+            return False
+    
     # =====================================================
     # MÉTODOS PARA MÉTRICAS
     # =====================================================
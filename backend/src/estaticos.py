@@ -0,0 +1,169 @@
+import gzip
+import hashlib
+import mimetypes
+import mmap
+import os
+import re
+from typing import Dict, Iterator, Optional
+from flask import Response, request
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Frontend (build do Vite) servido a partir de um índice em memória montado na
+# inicialização: nenhuma consulta ao disco por requisição, variantes gzip/br
+# pré-comprimidas e cache imutável para os assets com hash no nome.
+
+# Assets do Vite: assets/nome-<hash>.ext
+ASSET_COM_HASH_RE = re.compile(r'(^|/)assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'no-cache'
+CACHE_PADRAO = 'public, max-age=3600'
+
+TIPOS_COMPRIMIVEIS = ('text/', 'application/javascript', 'application/json', 'image/svg+xml',
+                      'application/xml', 'application/manifest+json', 'image/x-icon', 'image/vnd.microsoft.icon')
+TAMANHO_MIN_COMPRESSAO = 1024
+
+# Codificações na ordem de preferência: (Content-Encoding, extensão do arquivo pré-comprimido)
+CODIFICACOES = (('br', '.br'), ('gzip', '.gz'))
+
+TAMANHO_BLOCO_MMAP = 256 * 1024
+
+
+def _comprimir(dados: bytes, codificacao: str) -> Optional[bytes]:
+    if codificacao == 'gzip':
+        return gzip.compress(dados, compresslevel=9, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(dados, quality=11)
+
+
+class ArquivoEstatico:
+    """Conteúdo (ou mapeamento) e metadados de um arquivo do build"""
+
+    def __init__(self, relativo: str, caminho: str, mmap_min_bytes: Optional[int]):
+        self.relativo = relativo
+        self.tipo = mimetypes.guess_type(relativo)[0] or 'application/octet-stream'
+        self.tamanho = os.path.getsize(caminho)
+        self.mapa = None
+        self.dados = None
+
+        with open(caminho, 'rb') as arquivo:
+            if mmap_min_bytes is not None and self.tamanho >= mmap_min_bytes:
+                # Arquivos grandes: páginas do cache do SO, compartilhadas entre workers
+                self.mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+                self.etag = hashlib.sha1(self.mapa).hexdigest()
+            else:
+                self.dados = arquivo.read()
+                self.etag = hashlib.sha1(self.dados).hexdigest()
+
+        if ASSET_COM_HASH_RE.search(relativo):
+            self.cache_control = CACHE_IMUTAVEL
+        elif relativo.endswith('.html'):
+            self.cache_control = CACHE_REVALIDAR
+        else:
+            self.cache_control = CACHE_PADRAO
+
+        self.variantes: Dict[str, bytes] = {}
+
+    @property
+    def comprimivel(self) -> bool:
+        return self.mapa is None and self.tamanho >= TAMANHO_MIN_COMPRESSAO and self.tipo.startswith(TIPOS_COMPRIMIVEIS)
+
+    def blocos(self) -> Iterator[bytes]:
+        for inicio in range(0, self.tamanho, TAMANHO_BLOCO_MMAP):
+            yield self.mapa[inicio:inicio + TAMANHO_BLOCO_MMAP]
+
+
+class IndiceEstaticos:
+    """Índice do diretório estático montado uma vez na inicialização.
+
+    Variantes .br/.gz geradas no build são usadas quando existem; as que
+    faltarem são comprimidas aqui (brotli só com o pacote instalado).
+    """
+
+    def __init__(self, pasta: Optional[str], comprimir: bool = True, mmap_min_bytes: Optional[int] = None):
+        self.pasta = pasta
+        self.arquivos: Dict[str, ArquivoEstatico] = {}
+        if pasta and os.path.isdir(pasta):
+            self._indexar(comprimir, mmap_min_bytes)
+
+    def _indexar(self, comprimir: bool, mmap_min_bytes: Optional[int]) -> None:
+        extensoes_variantes = tuple(ext for _, ext in CODIFICACOES)
+
+        for raiz, _, nomes in os.walk(self.pasta):
+            for nome in nomes:
+                if nome.endswith(extensoes_variantes):
+                    continue
+                caminho = os.path.join(raiz, nome)
+                relativo = os.path.relpath(caminho, self.pasta).replace(os.sep, '/')
+                arquivo = ArquivoEstatico(relativo, caminho, mmap_min_bytes)
+
+                for codificacao, extensao in CODIFICACOES:
+                    if os.path.exists(caminho + extensao):
+                        with open(caminho + extensao, 'rb') as variante:
+                            arquivo.variantes[codificacao] = variante.read()
+                    elif comprimir and arquivo.comprimivel:
+                        comprimido = _comprimir(arquivo.dados, codificacao)
+                        # Só vale a pena se ficar de fato menor
+                        if comprimido is not None and len(comprimido) < arquivo.tamanho:
+                            arquivo.variantes[codificacao] = comprimido
+
+                self.arquivos[relativo] = arquivo
+
+        logger.info(f"Índice de estáticos: {len(self.arquivos)} arquivos em {self.pasta}")
+
+    def buscar(self, caminho: str) -> Optional[ArquivoEstatico]:
+        """Arquivo do caminho pedido; rotas do SPA (sem arquivo) caem no index.html"""
+        return self.arquivos.get(caminho) or self.arquivos.get('index.html')
+
+    def responder(self, arquivo: ArquivoEstatico) -> Response:
+        """Resposta com a melhor codificação aceita pelo cliente, ETag e Cache-Control"""
+        codificacao = next(
+            (c for c, _ in CODIFICACOES if c in arquivo.variantes and request.accept_encodings[c]),
+            None
+        )
+        # ETag forte distinto por representação
+        etag = f'{arquivo.etag}-{codificacao}' if codificacao else arquivo.etag
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        elif codificacao:
+            response = Response(arquivo.variantes[codificacao], mimetype=arquivo.tipo)
+            response.headers['Content-Encoding'] = codificacao
+        elif arquivo.mapa is not None:
+            response = Response(arquivo.blocos(), mimetype=arquivo.tipo, direct_passthrough=True)
+            response.content_length = arquivo.tamanho
+        else:
+            response = Response(arquivo.dados, mimetype=arquivo.tipo)
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = arquivo.cache_control
+        if arquivo.variantes:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'arquivos': len(self.arquivos),
+            'bytes': sum(a.tamanho for a in self.arquivos.values()),
+            'variantes': sum(len(a.variantes) for a in self.arquivos.values()),
+            'mapeados': sum(1 for a in self.arquivos.values() if a.mapa is not None)
+        }
+
+
+_indice_estaticos: Optional[IndiceEstaticos] = None
+
+
+def init_estaticos(pasta: Optional[str], config) -> IndiceEstaticos:
+    global _indice_estaticos
+    mmap_min_bytes = config.get('STATIC_MMAP_MIN_BYTES') if config.get('STATIC_MMAP', False) else None
+    _indice_estaticos = IndiceEstaticos(pasta, comprimir=config.get('STATIC_COMPRIMIR', True), mmap_min_bytes=mmap_min_bytes)
+    return _indice_estaticos
+
+
+def get_indice_estaticos() -> Optional[IndiceEstaticos]:
+    return _indice_estaticos
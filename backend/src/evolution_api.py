@@ -3,6 +3,28 @@ import json
 from typing import Dict, List, Optional
 from datetime import datetime
 
+# Status de mensagem da Evolution API (texto na v2, número na v1) -> status do disparo
+STATUS_MENSAGEM = {
+    'ERROR': 'erro', 0: 'erro',
+    'SERVER_ACK': 'enviado', 2: 'enviado',
+    'DELIVERY_ACK': 'entregue', 3: 'entregue',
+    'READ': 'lido', 4: 'lido',
+    'PLAYED': 'lido', 5: 'lido'
+}
+
+def normalizar_telefone(numero: Optional[str]) -> Optional[str]:
+    """Normaliza número para o formato usado pela Evolution API (apenas dígitos, com DDI 55)"""
+    if not numero:
+        return None
+    
+    numero = str(numero).split('@')[0]
+    clean_number = ''.join(filter(str.isdigit, numero))
+    if not clean_number:
+        return None
+    if not clean_number.startswith('55'):
+        clean_number = '55' + clean_number
+    return clean_number
+
 class EvolutionAPI:
     def __init__(self, base_url: str, api_key: str, instance_name: str = "cambara"):
         self.base_url = base_url.rstrip('/')
@@ -26,9 +48,7 @@ class EvolutionAPI:
         """Envia mensagem de texto"""
         try:
             # Formatar número (remover caracteres especiais)
-            clean_number = ''.join(filter(str.isdigit, number))
-            if not clean_number.startswith('55'):
-                clean_number = '55' + clean_number
+            clean_number = normalizar_telefone(number) or ''
             
             url = f"{self.base_url}/message/sendText/{self.instance_name}"
             payload = {
@@ -116,22 +136,43 @@ class EvolutionAPI:
     def process_webhook_message(self, webhook_data: Dict) -> Dict:
         """Processa mensagem recebida via webhook"""
         try:
-            event = webhook_data.get('event')
+            # Evolution envia "messages.upsert" (v2) ou "MESSAGES_UPSERT" (v1)
+            event = (webhook_data.get('event') or '').upper().replace('.', '_')
             data = webhook_data.get('data', {})
             
             if event == 'MESSAGES_UPSERT':
-                message = data.get('message', {})
+                message = data if 'key' in data else data.get('message', {})
                 key = message.get('key', {})
+                conteudo = message.get('message') or {}
+                
+                if key.get('remoteJid', '').endswith('@g.us'):
+                    return {"tipo": "evento_ignorado", "event": event}
                 
                 return {
-                    "tipo": "mensagem_recebida",
-                    "de": key.get('remoteJid', '').replace('@s.whatsapp.net', ''),
-                    "mensagem": message.get('message', {}).get('conversation', ''),
+                    "tipo": "mensagem_enviada" if key.get('fromMe') else "mensagem_recebida",
+                    "de": normalizar_telefone(key.get('remoteJid')),
+                    "mensagem": conteudo.get('conversation') or conteudo.get('extendedTextMessage', {}).get('text', ''),
                     "timestamp": message.get('messageTimestamp'),
                     "id_mensagem": key.get('id'),
                     "instancia": self.instance_name
                 }
             
+            if event == 'MESSAGES_UPDATE':
+                itens = data if isinstance(data, list) else [data]
+                atualizacoes = []
+                
+                for item in itens:
+                    id_mensagem = item.get('keyId') or item.get('key', {}).get('id')
+                    status = STATUS_MENSAGEM.get(item.get('status', item.get('update', {}).get('status')))
+                    if id_mensagem and status:
+                        atualizacoes.append({"id_mensagem": id_mensagem, "status": status})
+                
+                return {
+                    "tipo": "status_atualizado",
+                    "atualizacoes": atualizacoes,
+                    "instancia": self.instance_name
+                }
+            
             return {"tipo": "evento_ignorado", "event": event}
         except Exception as e:
             return {"error": str(e)}
@@ -0,0 +1,305 @@
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+COLUNAS_CONTATOS = ['nome', 'telefone', 'email', 'documento', 'endereco', 'status', 'created_at']
+
+# Entidades exportáveis: colunas permitidas (com tipo) e colunas padrão.
+# Tipos: texto, data, inteiro, decimal, lista (de textos), json.
+ENTIDADES_EXPORTACAO = {
+    'contatos': {
+        'colunas': {
+            'id': 'texto', 'nome': 'texto', 'telefone': 'texto', 'email': 'texto',
+            'documento': 'texto', 'endereco': 'texto', 'status': 'texto', 'origem': 'texto',
+            'tags': 'lista', 'campos_customizados': 'json', 'ultima_resposta_em': 'data',
+            'created_at': 'data', 'updated_at': 'data'
+        },
+        'padrao': ['id'] + COLUNAS_CONTATOS
+    },
+    'disparos': {
+        'colunas': {
+            'id': 'texto', 'campanha_id': 'texto', 'contato_id': 'texto', 'canal': 'texto',
+            'telefone': 'texto', 'mensagem': 'texto', 'status': 'texto', 'external_id': 'texto',
+            'erro_mensagem': 'texto', 'created_at': 'data'
+        },
+        'padrao': ['id', 'campanha_id', 'contato_id', 'canal', 'telefone', 'status', 'external_id', 'erro_mensagem', 'created_at']
+    },
+    'respostas': {
+        'colunas': {
+            'id': 'texto', 'disparo_id': 'texto', 'contato_id': 'texto', 'campanha_id': 'texto',
+            'canal': 'texto', 'conteudo': 'texto', 'tipo_resposta': 'texto', 'id_mensagem': 'texto',
+            'sentimento': 'texto', 'score_sentimento': 'decimal', 'nota': 'inteiro', 'created_at': 'data'
+        },
+        'padrao': ['id', 'disparo_id', 'contato_id', 'campanha_id', 'canal', 'conteudo', 'tipo_resposta',
+                   'sentimento', 'score_sentimento', 'nota', 'created_at']
+    }
+}
+
+FORMATOS_EXPORTACAO = ('csv', 'parquet', 'xlsx')
+
+# Linhas acumuladas por row group do Parquet
+LINHAS_POR_GRUPO_PARQUET = 50000
+# Limite de linhas de uma aba do Excel (a exportação continua numa nova aba)
+LINHAS_POR_ABA_XLSX = 1048575
+
+
+class ExportacaoInvalida(ValueError):
+    """Parâmetros de exportação inválidos"""
+
+
+# Texto que planilhas interpretariam como fórmula ("=HYPERLINK(...)" vindo de
+# uma resposta do WhatsApp) recebe um apóstrofo na frente
+PREFIXOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+# Caracteres de controle que o XLSX não aceita (mesma regra de openpyxl.cell.cell.ILLEGAL_CHARACTERS_RE)
+_CARACTERES_ILEGAIS_RE = re.compile(r'[\000-\010]|[\013-\014]|[\016-\037]')
+
+
+def texto_seguro(valor: Any) -> Any:
+    """Neutraliza fórmulas em textos exportados para CSV/planilha; outros tipos passam intactos"""
+    if isinstance(valor, str) and valor.startswith(PREFIXOS_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def texto_xlsx(valor: Any) -> Any:
+    """texto_seguro() sem os caracteres de controle que fariam o openpyxl falhar"""
+    if isinstance(valor, str):
+        valor = _CARACTERES_ILEGAIS_RE.sub('', valor)
+    return texto_seguro(valor)
+
+
+def resolver_colunas(entidade: str, colunas: Optional[str]) -> List[str]:
+    """Valida a seleção de colunas (?colunas=a,b) contra as permitidas da entidade"""
+    if entidade not in ENTIDADES_EXPORTACAO:
+        raise ExportacaoInvalida(f'Entidade inválida: {entidade}. Use {", ".join(ENTIDADES_EXPORTACAO)}')
+
+    definicao = ENTIDADES_EXPORTACAO[entidade]
+    if not colunas:
+        return list(definicao['padrao'])
+
+    selecionadas = [c.strip() for c in colunas.split(',') if c.strip()]
+    invalidas = [c for c in selecionadas if c not in definicao['colunas']]
+    if invalidas:
+        raise ExportacaoInvalida(f'Colunas inválidas para {entidade}: {", ".join(invalidas)}')
+    if not selecionadas:
+        raise ExportacaoInvalida('Nenhuma coluna selecionada')
+    return list(dict.fromkeys(selecionadas))
+
+
+def filtro_periodo(de: Optional[str], ate: Optional[str]):
+    """Filtro de created_at para iter_registros (datas ISO; `ate` inclusivo no dia)"""
+    for valor in (de, ate):
+        if valor:
+            try:
+                datetime.fromisoformat(valor)
+            except ValueError:
+                raise ExportacaoInvalida(f'Data inválida: {valor}. Use o formato AAAA-MM-DD')
+
+    if not de and not ate:
+        return None
+
+    def aplicar(query):
+        if de:
+            query = query.gte('created_at', de)
+        if ate:
+            # Só a data: incluir o dia inteiro
+            query = query.lte('created_at', f'{ate}T23:59:59.999999' if len(ate) == 10 else ate)
+        return query
+
+    return aplicar
+
+# Blocos menores que isso são acumulados antes de sair do gzip
+TAMANHO_MIN_BLOCO_GZIP = 64 * 1024
+
+
+def gerar_csv(paginas: Iterable[List[Dict[str, Any]]], colunas: List[str]) -> Iterator[bytes]:
+    """Gera o CSV página a página: cabeçalho primeiro, depois um bloco por página"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    writer.writerow(colunas)
+    yield buffer.getvalue().encode('utf-8')
+
+    for pagina in paginas:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([texto_seguro(registro.get(coluna)) for coluna in colunas] for registro in pagina)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def comprimir_gzip(blocos: Iterable[bytes]) -> Iterator[bytes]:
+    """Comprime um fluxo de bytes em gzip à medida que é produzido"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: cabeçalho gzip
+    pendente = []
+    tamanho = 0
+
+    for bloco in blocos:
+        comprimido = compressor.compress(bloco)
+        if comprimido:
+            pendente.append(comprimido)
+            tamanho += len(comprimido)
+        if tamanho >= TAMANHO_MIN_BLOCO_GZIP:
+            yield b''.join(pendente)
+            pendente, tamanho = [], 0
+
+    pendente.append(compressor.flush())
+    yield b''.join(pendente)
+
+
+def _data(valor: Any) -> Optional[datetime]:
+    if not valor:
+        return None
+    return datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+
+
+# =====================================================
+# PARQUET
+# =====================================================
+
+class _SaidaIncremental:
+    """Destino de escrita que acumula bytes até serem drenados para a resposta.
+
+    Mantém a posição absoluta (tell), da qual o ParquetWriter depende para os
+    offsets do rodapé, mesmo depois que os bytes já saíram.
+    """
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+        self._posicao = 0
+        self.closed = False
+
+    def write(self, dados) -> int:
+        dados = bytes(dados)
+        self._partes.append(dados)
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self._posicao
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drenar(self) -> bytes:
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+
+def _schema_parquet(entidade: str, colunas: List[str]):
+    import pyarrow as pa
+
+    tipos = {
+        'texto': pa.string(),
+        'json': pa.string(),
+        'data': pa.timestamp('us', tz='UTC'),
+        'inteiro': pa.int32(),
+        'decimal': pa.float64(),
+        'lista': pa.list_(pa.string())
+    }
+    definicao = ENTIDADES_EXPORTACAO[entidade]['colunas']
+    return pa.schema([(coluna, tipos[definicao[coluna]]) for coluna in colunas])
+
+
+def _tabela_parquet(registros: List[Dict[str, Any]], entidade: str, colunas: List[str], schema):
+    import pyarrow as pa
+
+    definicao = ENTIDADES_EXPORTACAO[entidade]['colunas']
+    arrays = []
+    for coluna in colunas:
+        valores = [registro.get(coluna) for registro in registros]
+        tipo = definicao[coluna]
+        if tipo == 'data':
+            valores = [_data(v) for v in valores]
+        elif tipo == 'json':
+            valores = [json.dumps(v, ensure_ascii=False) if v is not None else None for v in valores]
+        arrays.append(pa.array(valores, type=schema.field(coluna).type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def gerar_parquet(paginas: Iterable[List[Dict[str, Any]]], entidade: str, colunas: List[str]) -> Iterator[bytes]:
+    """Gera o Parquet incrementalmente: um row group a cada LINHAS_POR_GRUPO_PARQUET linhas"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _schema_parquet(entidade, colunas)
+    saida = _SaidaIncremental()
+    writer = pq.ParquetWriter(pa.PythonFile(saida, mode='w'), schema, compression='zstd')
+
+    acumulados: List[Dict[str, Any]] = []
+    try:
+        for pagina in paginas:
+            acumulados.extend(pagina)
+            if len(acumulados) >= LINHAS_POR_GRUPO_PARQUET:
+                writer.write_table(_tabela_parquet(acumulados, entidade, colunas, schema))
+                acumulados = []
+                yield saida.drenar()
+
+        if acumulados:
+            writer.write_table(_tabela_parquet(acumulados, entidade, colunas, schema))
+    finally:
+        writer.close()
+
+    yield saida.drenar()
+
+
+# =====================================================
+# XLSX
+# =====================================================
+
+def _valor_xlsx(valor: Any, tipo: str) -> Any:
+    if valor is None:
+        return None
+    if tipo == 'data':
+        # Excel não guarda fuso: datas em UTC, sem tzinfo
+        return _data(valor).replace(tzinfo=None)
+    if tipo == 'lista':
+        return texto_xlsx(', '.join(str(v) for v in valor))
+    if tipo == 'json':
+        return texto_xlsx(json.dumps(valor, ensure_ascii=False))
+    return texto_xlsx(valor)
+
+
+def gerar_xlsx(paginas: Iterable[List[Dict[str, Any]]], entidade: str, colunas: List[str]) -> str:
+    """Grava o XLSX em modo write-only (linhas vão direto para disco); retorna o caminho do arquivo temporário"""
+    from openpyxl import Workbook
+
+    definicao = ENTIDADES_EXPORTACAO[entidade]['colunas']
+    tipos = [definicao[coluna] for coluna in colunas]
+
+    workbook = Workbook(write_only=True)
+    aba = None
+    linhas_na_aba = LINHAS_POR_ABA_XLSX
+
+    for pagina in paginas:
+        for registro in pagina:
+            if linhas_na_aba >= LINHAS_POR_ABA_XLSX:
+                aba = workbook.create_sheet(title=entidade if aba is None else f'{entidade}_{len(workbook.worksheets) + 1}')
+                aba.append(colunas)
+                linhas_na_aba = 0
+            aba.append([_valor_xlsx(registro.get(c), t) for c, t in zip(colunas, tipos)])
+            linhas_na_aba += 1
+
+    if aba is None:
+        workbook.create_sheet(title=entidade).append(colunas)
+
+    descritor, caminho = tempfile.mkstemp(suffix='.xlsx')
+    os.close(descritor)
+    try:
+        workbook.save(caminho)
+    except Exception:
+        os.remove(caminho)
+        raise
+    return caminho
@@ -0,0 +1,246 @@
+import csv
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Colunas aproveitadas do arquivo (as demais são ignoradas na leitura)
+COLUNAS_IMPORTACAO = ['nome', 'telefone', 'email', 'documento', 'endereco']
+COLUNAS_OBRIGATORIAS = ['nome']
+
+TAMANHO_CHUNK = 5000
+
+# Contatos já existentes (mesma chave_dedupe na empresa): mesclar ou ignorar
+MODOS_IMPORTACAO = ('ignorar', 'mesclar')
+MODO_PADRAO = 'ignorar'
+
+# Planilhas são convertidas para CSV em processos separados (parsing preso ao GIL)
+IMPORTACAO_PROCESSOS = int(os.environ.get('IMPORTACAO_PROCESSOS', 2))
+IMPORTACAO_TIMEOUT = int(os.environ.get('IMPORTACAO_TIMEOUT', 600))  # segundos
+
+# Telefone válido: 8 a 13 dígitos depois de remover a formatação
+TELEFONE_MIN_DIGITOS = 8
+TELEFONE_MAX_DIGITOS = 13
+_EMAIL_RE = r'[^@\s]+@[^@\s]+\.[^@\s]+'
+
+
+class ErroImportacao(ValueError):
+    """Arquivo de importação com estrutura inválida"""
+
+
+def _normalizar_coluna(coluna: Any) -> str:
+    return str(coluna).strip().lower()
+
+
+def ler_csv_em_chunks(arquivo: BinaryIO, tamanho_chunk: int = TAMANHO_CHUNK) -> Iterator[pd.DataFrame]:
+    """Lê o CSV em blocos de `tamanho_chunk` linhas, só com as colunas usadas, tudo como texto"""
+    leitor = pd.read_csv(
+        arquivo,
+        dtype=str,
+        keep_default_na=False,
+        encoding='utf-8-sig',
+        usecols=lambda coluna: _normalizar_coluna(coluna) in COLUNAS_IMPORTACAO,
+        chunksize=tamanho_chunk
+    )
+    for chunk in leitor:
+        chunk.columns = [_normalizar_coluna(c) for c in chunk.columns]
+        yield chunk
+
+
+def limpar_chunk(df: pd.DataFrame, empresa_id: str) -> List[Dict[str, Any]]:
+    """Limpa um bloco de linhas com operações vetorizadas e retorna os contatos válidos"""
+    faltando = [c for c in COLUNAS_OBRIGATORIAS if c not in df.columns]
+    if faltando:
+        raise ErroImportacao(f'Colunas obrigatórias não encontradas: {", ".join(faltando)}')
+
+    limpo = pd.DataFrame(index=df.index)
+    for coluna in COLUNAS_IMPORTACAO:
+        if coluna in df.columns:
+            valores = df[coluna].astype('string').str.strip()
+            limpo[coluna] = valores.mask(valores == '')
+        else:
+            limpo[coluna] = pd.Series(pd.NA, index=df.index, dtype='string')
+
+    # Telefone/email inválidos são descartados; a linha fica se restar um dos dois
+    digitos = limpo['telefone'].str.replace(r'\D', '', regex=True)
+    telefone_valido = digitos.str.len().between(TELEFONE_MIN_DIGITOS, TELEFONE_MAX_DIGITOS).fillna(False).astype(bool)
+    email_valido = limpo['email'].str.fullmatch(_EMAIL_RE).fillna(False).astype(bool)
+    limpo['telefone'] = limpo['telefone'].where(telefone_valido)
+    limpo['email'] = limpo['email'].where(email_valido)
+
+    # Chave de deduplicação: telefone normalizado (com DDI 55) ou, sem telefone, email
+    # minúsculo. Mesma regra de chave_dedupe_contato() (migrations/008_dedupe_contatos.sql).
+    telefone_normalizado = digitos.where(digitos.str.startswith('55'), '55' + digitos)
+    limpo['chave_dedupe'] = ('tel:' + telefone_normalizado).where(
+        telefone_valido,
+        ('email:' + limpo['email'].str.lower()).where(email_valido)
+    )
+
+    validas = limpo['nome'].notna() & (telefone_valido | email_valido)
+    limpo = limpo[validas]
+    if limpo.empty:
+        return []
+
+    limpo = limpo.astype(object).where(limpo.notna(), None)
+    limpo['empresa_id'] = empresa_id
+    limpo['origem'] = 'importacao'
+    return limpo.to_dict('records')
+
+
+def importar_chunks(chunks: Iterable[pd.DataFrame], empresa_id: str, db, resultado: Dict[str, int] = None,
+                    a_partir_de: int = 0, ao_gravar_chunk: Callable[[int, Dict[str, int]], None] = None,
+                    modo: str = MODO_PADRAO) -> Dict[str, int]:
+    """Limpa, deduplica e grava cada bloco assim que é lido; a memória fica limitada a um bloco.
+
+    Linhas repetidas no arquivo (mesma chave_dedupe) são descartadas por um
+    conjunto de chaves já vistas; contatos já existentes na empresa são
+    mesclados ou ignorados conforme `modo`, num único upsert por bloco.
+    Chunks com índice menor que `a_partir_de` já foram gravados (retomada) e são
+    pulados; `ao_gravar_chunk(indice, resultado)` é chamado após cada chunk gravado.
+    """
+    if modo not in MODOS_IMPORTACAO:
+        raise ErroImportacao(f'Modo de importação inválido: {modo}. Use {" ou ".join(MODOS_IMPORTACAO)}')
+
+    resultado = dict(resultado or {})
+    for contador in ('linhas', 'importados', 'atualizados', 'duplicados', 'ignorados', 'falhas', 'chunks'):
+        resultado.setdefault(contador, 0)
+
+    vistos = set()
+
+    for indice, chunk in enumerate(chunks):
+        if indice < a_partir_de:
+            continue
+
+        validos = limpar_chunk(chunk, empresa_id)
+        contatos = []
+        for contato in validos:
+            if contato['chave_dedupe'] in vistos:
+                continue
+            vistos.add(contato['chave_dedupe'])
+            contatos.append(contato)
+
+        resultado['chunks'] += 1
+        resultado['linhas'] += len(chunk)
+        resultado['ignorados'] += len(chunk) - len(validos)
+        resultado['duplicados'] += len(validos) - len(contatos)
+
+        if contatos:
+            gravados = db.upsert_contatos(contatos, modo)
+            if gravados is not None:
+                resultado['importados'] += gravados['inseridos']
+                resultado['atualizados'] += gravados['atualizados']
+                # No modo ignorar, os que já existiam não voltam do upsert
+                resultado['duplicados'] += len(contatos) - gravados['inseridos'] - gravados['atualizados']
+            else:
+                resultado['falhas'] += len(contatos)
+                logger.error(f"Falha ao gravar bloco {indice} da importação ({len(contatos)} contatos)")
+
+        if ao_gravar_chunk:
+            ao_gravar_chunk(indice, resultado)
+
+    return resultado
+
+
+def importar_csv(arquivo: BinaryIO, empresa_id: str, db, tamanho_chunk: int = TAMANHO_CHUNK,
+                 modo: str = MODO_PADRAO) -> Dict[str, int]:
+    """Importa contatos de um CSV em streaming"""
+    return importar_chunks(ler_csv_em_chunks(arquivo, tamanho_chunk), empresa_id, db, modo=modo)
+
+
+# =====================================================
+# PLANILHAS (XLSX/XLS)
+# =====================================================
+
+_executor_planilhas: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor_planilhas() -> ProcessPoolExecutor:
+    global _executor_planilhas
+    with _executor_lock:
+        if _executor_planilhas is None:
+            # spawn: o servidor tem threads, e fork copiaria locks em estado inconsistente
+            _executor_planilhas = ProcessPoolExecutor(
+                max_workers=IMPORTACAO_PROCESSOS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor_planilhas
+
+
+def _celula_para_texto(valor: Any) -> str:
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return ''
+    # Telefones/documentos digitados como número chegam como float (11999998888.0)
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _linhas_xlsx(caminho: str) -> Iterator[tuple]:
+    from openpyxl import load_workbook
+
+    # read_only: as linhas são lidas sob demanda, sem montar a planilha inteira
+    workbook = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _linhas_xls(caminho: str) -> Iterator[tuple]:
+    # Formato binário antigo: openpyxl não lê; usa o pandas (xlrd) no processo auxiliar
+    df = pd.read_excel(caminho, dtype=object, header=None)
+    yield from df.itertuples(index=False, name=None)
+
+
+def planilha_para_csv(caminho_planilha: str, caminho_csv: str, extensao: str) -> int:
+    """Converte a primeira aba da planilha em CSV (executado no pool de processos); retorna o nº de linhas"""
+    linhas = _linhas_xlsx(caminho_planilha) if extensao == 'xlsx' else _linhas_xls(caminho_planilha)
+    total = 0
+    with open(caminho_csv, 'w', newline='', encoding='utf-8') as saida:
+        writer = csv.writer(saida)
+        for linha in linhas:
+            valores = [_celula_para_texto(v) for v in linha or ()]
+            if not any(valores):
+                continue
+            writer.writerow(valores)
+            total += 1
+    return total
+
+
+def converter_planilha(caminho_planilha: str, caminho_csv: str, extensao: str) -> int:
+    """Converte a planilha em CSV no pool de processos, aguardando o resultado"""
+    return _get_executor_planilhas().submit(
+        planilha_para_csv, caminho_planilha, caminho_csv, extensao
+    ).result(timeout=IMPORTACAO_TIMEOUT)
+
+
+def importar_planilha(arquivo, extensao: str, empresa_id: str, db, tamanho_chunk: int = TAMANHO_CHUNK,
+                      modo: str = MODO_PADRAO) -> Dict[str, int]:
+    """Importa contatos de XLSX/XLS: converte para CSV num processo auxiliar e segue o fluxo do CSV"""
+    descritor, caminho_planilha = tempfile.mkstemp(suffix=f'.{extensao}')
+    os.close(descritor)
+    caminho_csv = f'{caminho_planilha}.csv'
+
+    try:
+        arquivo.save(caminho_planilha)
+        converter_planilha(caminho_planilha, caminho_csv, extensao)
+
+        with open(caminho_csv, 'rb') as convertido:
+            return importar_csv(convertido, empresa_id, db, tamanho_chunk, modo)
+    finally:
+        for caminho in (caminho_planilha, caminho_csv):
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
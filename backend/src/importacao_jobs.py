@@ -0,0 +1,332 @@
+import fcntl
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, BinaryIO, Dict, Optional
+from src.database import get_supabase
+from src.importacao import MODO_PADRAO, MODOS_IMPORTACAO, TAMANHO_CHUNK, ErroImportacao, converter_planilha, importar_chunks, ler_csv_em_chunks
+import logging
+
+logger = logging.getLogger(__name__)
+
+FORMATOS_IMPORTACAO = {'csv', 'xlsx', 'xls'}
+
+TAMANHO_LEITURA = 1024 * 1024
+
+
+class ConflitoUpload(ValueError):
+    """Bloco enviado fora de ordem: o cliente deve continuar de `bytes_recebidos`"""
+
+    def __init__(self, bytes_recebidos: int):
+        super().__init__(f'Offset inválido; continue a partir do byte {bytes_recebidos}')
+        self.bytes_recebidos = bytes_recebidos
+
+
+class GerenciadorImportacoes:
+    """Importações de contatos como jobs em segundo plano.
+
+    O arquivo é gravado num spool em disco (em blocos ou num único stream) e
+    processado por um pool de threads em chunks de `tamanho_chunk` linhas. O
+    progresso é gravado na tabela importacoes após cada chunk, e uma importação
+    interrompida é retomada a partir do chunk seguinte ao último gravado.
+    """
+
+    def __init__(self, pasta: str, max_simultaneas: int = 2, inatividade: int = 120,
+                 spool_ttl: int = 3 * 24 * 3600, intervalo_varredura: int = 3600):
+        self.pasta = os.path.abspath(pasta)
+        self.inatividade = inatividade
+        self.spool_ttl = spool_ttl
+        self.intervalo_varredura = intervalo_varredura
+        self._proxima_varredura = 0.0
+        self.spools_removidos = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_simultaneas, thread_name_prefix='importacao')
+        self._ativas = set()
+        self._lock = threading.Lock()
+        self.concluidas = 0
+        self.com_erro = 0
+        os.makedirs(self.pasta, exist_ok=True)
+
+    def caminho_spool(self, importacao: Dict[str, Any]) -> str:
+        return os.path.join(self.pasta, f"{importacao['id']}.{importacao['formato']}")
+
+    def caminho_csv(self, importacao: Dict[str, Any]) -> str:
+        # Planilhas são convertidas uma vez; o CSV fica no spool para retomadas
+        if importacao['formato'] == 'csv':
+            return self.caminho_spool(importacao)
+        return f"{self.caminho_spool(importacao)}.csv"
+
+    def criar(self, empresa_id: str, usuario_id: str, nome_arquivo: str, tamanho_bytes: int = None,
+              modo: str = MODO_PADRAO) -> Optional[Dict[str, Any]]:
+        """Registra uma nova importação aguardando o arquivo"""
+        formato = nome_arquivo.rsplit('.', 1)[-1].lower() if '.' in nome_arquivo else ''
+        if formato not in FORMATOS_IMPORTACAO:
+            raise ErroImportacao('Formato de arquivo não suportado. Use CSV ou Excel')
+        if modo not in MODOS_IMPORTACAO:
+            raise ErroImportacao(f'Modo de importação inválido: {modo}. Use {" ou ".join(MODOS_IMPORTACAO)}')
+
+        importacao = get_supabase().create_importacao({
+            'empresa_id': empresa_id,
+            'usuario_id': usuario_id,
+            'nome_arquivo': nome_arquivo,
+            'formato': formato,
+            'status': 'recebendo',
+            'tamanho_bytes': tamanho_bytes,
+            'tamanho_chunk': TAMANHO_CHUNK,
+            'modo': modo
+        })
+        if importacao:
+            # Arquivo vazio desde já, para que os blocos sejam anexados por offset
+            open(self.caminho_spool(importacao), 'wb').close()
+        self._agendar_varredura()
+        return importacao
+
+    def anexar_bloco(self, importacao: Dict[str, Any], offset: int, stream: BinaryIO) -> int:
+        """Anexa um bloco do arquivo no offset informado; retorna o total de bytes recebidos"""
+        if importacao['status'] != 'recebendo':
+            raise ErroImportacao('Importação não está recebendo arquivo')
+
+        # flock serializa PUTs concorrentes e o início do processamento
+        # (inclusive entre workers): o status e o tamanho são conferidos com a
+        # trava, e um offset que deixou de valer dá 409
+        with open(self.caminho_spool(importacao), 'ab') as spool:
+            fcntl.flock(spool.fileno(), fcntl.LOCK_EX)
+            try:
+                atual = get_supabase().get_importacao(importacao['empresa_id'], importacao['id'])
+                if not atual or atual['status'] != 'recebendo':
+                    raise ErroImportacao('Importação não está recebendo arquivo')
+
+                recebidos = os.fstat(spool.fileno()).st_size
+                if offset != recebidos:
+                    raise ConflitoUpload(recebidos)
+
+                while True:
+                    dados = stream.read(TAMANHO_LEITURA)
+                    if not dados:
+                        break
+                    spool.write(dados)
+                spool.flush()
+                recebidos = os.fstat(spool.fileno()).st_size
+            finally:
+                fcntl.flock(spool.fileno(), fcntl.LOCK_UN)
+
+        get_supabase().update_importacao(importacao['id'], {'bytes_recebidos': recebidos})
+        return recebidos
+
+    def iniciar(self, importacao: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Encerra o recebimento e envia a importação para processamento.
+
+        A passagem de recebendo para pendente é um UPDATE condicional, feito com
+        a trava do spool: retorna None se outra requisição já a iniciou.
+        """
+        with open(self.caminho_spool(importacao), 'ab') as spool:
+            fcntl.flock(spool.fileno(), fcntl.LOCK_EX)
+            try:
+                iniciada = get_supabase().iniciar_importacao(importacao['id'], os.fstat(spool.fileno()).st_size)
+            finally:
+                fcntl.flock(spool.fileno(), fcntl.LOCK_UN)
+
+        if iniciada is None:
+            return None
+
+        with self._lock:
+            self._ativas.add(iniciada['id'])
+        self._executor.submit(self._processar, iniciada)
+        return iniciada
+
+    def retomar(self, importacao: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Retoma uma importação com erro, ou sem batimento há mais de `inatividade` segundos.
+
+        A reivindicação é feita no banco, para que só um worker execute o job;
+        retorna None se a importação estiver ativa (aqui ou em outro processo).
+        """
+        if importacao['id'] in self._ativas:
+            return None
+
+        parada_desde = datetime.now(timezone.utc) - timedelta(seconds=self.inatividade)
+        importacao = get_supabase().reivindicar_importacao(importacao['id'], parada_desde.isoformat())
+        if importacao is None:
+            return None
+
+        with self._lock:
+            self._ativas.add(importacao['id'])
+        self._executor.submit(self._processar, importacao)
+        return importacao
+
+    def _batimento(self, importacao_id: str, parar: threading.Event) -> None:
+        # Mantém updated_at recente enquanto o job roda (inclusive durante a
+        # conversão da planilha, que não grava progresso)
+        while not parar.wait(max(self.inatividade / 4, 1)):
+            get_supabase().update_importacao(importacao_id, {})
+
+    def _processar(self, importacao: Dict[str, Any]) -> None:
+        db = get_supabase()
+        importacao_id = importacao['id']
+        empresa_id = importacao['empresa_id']
+
+        parar_batimento = threading.Event()
+        threading.Thread(target=self._batimento, args=(importacao_id, parar_batimento),
+                         name=f'importacao-batimento-{importacao_id}', daemon=True).start()
+
+        try:
+            db.update_importacao(importacao_id, {'status': 'processando'})
+
+            caminho_csv = self.caminho_csv(importacao)
+            if importacao['formato'] != 'csv' and not os.path.exists(caminho_csv):
+                # Conversão num arquivo parcial: um CSV interrompido não é tomado como pronto
+                parcial = f'{caminho_csv}.parcial'
+                converter_planilha(self.caminho_spool(importacao), parcial, importacao['formato'])
+                os.replace(parcial, caminho_csv)
+
+            def gravar_progresso(indice: int, resultado: Dict[str, int]) -> None:
+                db.update_importacao(importacao_id, {
+                    'ultimo_chunk': indice,
+                    'linhas_lidas': resultado['linhas'],
+                    'importados': resultado['importados'],
+                    'atualizados': resultado['atualizados'],
+                    'duplicados': resultado['duplicados'],
+                    'rejeitados': resultado['ignorados'],
+                    'falhas': resultado['falhas']
+                })
+
+            # Contadores seguem de onde a última execução parou
+            resultado = {
+                'linhas': importacao.get('linhas_lidas') or 0,
+                'importados': importacao.get('importados') or 0,
+                'atualizados': importacao.get('atualizados') or 0,
+                'duplicados': importacao.get('duplicados') or 0,
+                'ignorados': importacao.get('rejeitados') or 0,
+                'falhas': importacao.get('falhas') or 0,
+                'chunks': 0
+            }
+
+            with open(caminho_csv, 'rb') as arquivo:
+                resultado = importar_chunks(
+                    ler_csv_em_chunks(arquivo, importacao.get('tamanho_chunk') or TAMANHO_CHUNK),
+                    empresa_id,
+                    db,
+                    resultado=resultado,
+                    a_partir_de=importacao.get('ultimo_chunk', -1) + 1,
+                    ao_gravar_chunk=gravar_progresso,
+                    modo=importacao.get('modo') or MODO_PADRAO
+                )
+
+            db.update_importacao(importacao_id, {
+                'status': 'concluida',
+                'concluida_em': datetime.now(timezone.utc).isoformat()
+            })
+            self.concluidas += 1
+            self._remover_spool(importacao)
+
+            if resultado['importados'] or resultado['atualizados']:
+                db.invalidar_contagens_segmentos(empresa_id)
+
+        except Exception as e:
+            self.com_erro += 1
+            logger.error(f"Erro na importação {importacao_id}: {e}")
+            db.update_importacao(importacao_id, {'status': 'erro', 'erro': str(e)[:1000]})
+            # Contatos já gravados mudam as contagens mesmo com a importação incompleta
+            db.invalidar_contagens_segmentos(empresa_id)
+        finally:
+            parar_batimento.set()
+            with self._lock:
+                self._ativas.discard(importacao_id)
+
+    def _agendar_varredura(self) -> None:
+        # Disparada pelas próprias requisições (no máximo uma por intervalo), o
+        # que também funciona nos workers do gunicorn sem thread dedicada
+        agora = time.monotonic()
+        with self._lock:
+            if agora < self._proxima_varredura:
+                return
+            self._proxima_varredura = agora + self.intervalo_varredura
+        self._executor.submit(self.varrer_spool)
+
+    def varrer_spool(self) -> int:
+        """Remove spools de importações sem atividade há mais de `spool_ttl` segundos.
+
+        Cobre jobs com erro nunca retomados, uploads abandonados e processos
+        encerrados no meio; jobs em andamento mantêm updated_at recente pelo
+        batimento. Retorna quantos arquivos foram removidos.
+        """
+        limite = time.time() - self.spool_ttl
+        por_importacao: Dict[str, list] = {}
+        try:
+            for entrada in os.scandir(self.pasta):
+                if entrada.is_file() and entrada.stat().st_mtime < limite:
+                    por_importacao.setdefault(entrada.name.split('.', 1)[0], []).append(entrada.path)
+        except OSError as e:
+            logger.error(f"Erro ao listar spool de importações: {e}")
+            return 0
+
+        with self._lock:
+            for importacao_id in self._ativas:
+                por_importacao.pop(importacao_id, None)
+        if not por_importacao:
+            return 0
+
+        db = get_supabase()
+        linhas = db.get_importacoes_por_ids(list(por_importacao))
+        if linhas is None:
+            return 0
+        importacoes = {linha['id']: linha for linha in linhas}
+        expiracao = datetime.now(timezone.utc) - timedelta(seconds=self.spool_ttl)
+
+        removidos = 0
+        for importacao_id, caminhos in por_importacao.items():
+            importacao = importacoes.get(importacao_id)
+            if importacao and datetime.fromisoformat(importacao['updated_at'].replace('Z', '+00:00')) > expiracao:
+                continue
+
+            for caminho in caminhos:
+                try:
+                    os.remove(caminho)
+                    removidos += 1
+                except OSError:
+                    pass
+
+            if importacao and importacao['status'] not in ('concluida', 'erro'):
+                db.update_importacao(importacao_id, {'status': 'erro', 'erro': 'Arquivo da importação expirou; envie novamente'})
+
+        if removidos:
+            self.spools_removidos += removidos
+            logger.info(f"Limpeza do spool de importações: {removidos} arquivos removidos")
+        return removidos
+
+    def _remover_spool(self, importacao: Dict[str, Any]) -> None:
+        caminho_csv = self.caminho_csv(importacao)
+        for caminho in {self.caminho_spool(importacao), caminho_csv, f'{caminho_csv}.parcial'}:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'ativas': len(self._ativas),
+            'concluidas': self.concluidas,
+            'com_erro': self.com_erro,
+            'spools_removidos': self.spools_removidos
+        }
+
+
+# Instância global do gerenciador de importações
+gerenciador_importacoes = None
+
+def init_importacoes(config) -> GerenciadorImportacoes:
+    """Inicializa o gerenciador de importações em segundo plano"""
+    global gerenciador_importacoes
+    gerenciador_importacoes = GerenciadorImportacoes(
+        pasta=os.path.join(config.get('UPLOAD_FOLDER', 'uploads'), 'importacoes'),
+        max_simultaneas=config.get('IMPORTACAO_SIMULTANEAS', 2),
+        inatividade=config.get('IMPORTACAO_INATIVIDADE', 120),
+        spool_ttl=config.get('IMPORTACAO_SPOOL_TTL', 3 * 24 * 3600)
+    )
+    return gerenciador_importacoes
+
+def get_gerenciador_importacoes() -> GerenciadorImportacoes:
+    """Retorna a instância do gerenciador de importações"""
+    if gerenciador_importacoes is None:
+        raise RuntimeError("Importações não foram inicializadas. Chame init_importacoes() primeiro.")
+    return gerenciador_importacoes
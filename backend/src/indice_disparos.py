@@ -0,0 +1,78 @@
+from typing import Any, Dict, Iterable, Optional
+from src.database import get_supabase
+from src.evolution_api import normalizar_telefone
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Status em que um disparo ainda pode receber resposta
+STATUS_ABERTOS = ['pendente', 'enviado', 'entregue', 'lido']
+
+COLUNAS_INDICE = 'id,empresa_id,contato_id,campanha_id,telefone,external_id,status,created_at'
+
+
+class IndiceDisparos:
+    """Telefone -> último disparo aberto, resolvido em lote no banco.
+
+    Os telefones de um lote de webhooks são resolvidos numa única chamada à
+    RPC ultimos_disparos_por_telefone (migrations/016_ultimos_disparos.sql),
+    apoiada nos índices de migrations/003_indice_disparos.sql. Não há cache
+    por processo: com vários workers ele divergiria dos disparos criados nos
+    outros processos.
+    """
+
+    def __init__(self):
+        self.consultas = 0
+        self.telefones_consultados = 0
+
+    @staticmethod
+    def _resumo(disparo: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: disparo.get(k) for k in COLUNAS_INDICE.split(',')}
+
+    def buscar_por_telefones(self, numeros: Iterable[str], empresa_id: str = None) -> Dict[str, Dict[str, Any]]:
+        """Retorna {telefone normalizado: disparo aberto mais recente} (da empresa, se informada)"""
+        telefones = sorted({t for t in (normalizar_telefone(n) for n in numeros) if t})
+        if not telefones:
+            return {}
+
+        self.consultas += 1
+        self.telefones_consultados += len(telefones)
+        try:
+            response = get_supabase().get_client().rpc('ultimos_disparos_por_telefone', {
+                'p_telefones': telefones,
+                'p_empresa_id': empresa_id
+            }).execute()
+        except Exception as e:
+            logger.error(f"Erro ao buscar disparos de {len(telefones)} telefones: {e}")
+            raise
+
+        return {disparo['telefone']: self._resumo(disparo) for disparo in response.data or []}
+
+    def buscar_por_telefone(self, numero: str, empresa_id: str = None) -> Optional[Dict[str, Any]]:
+        """Retorna o disparo aberto mais recente para o número (e empresa, se informada)"""
+        telefone = normalizar_telefone(numero)
+        if not telefone:
+            return None
+        return self.buscar_por_telefones([telefone], empresa_id).get(telefone)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'consultas': self.consultas,
+            'telefones_consultados': self.telefones_consultados
+        }
+
+
+# Instância global do índice de disparos
+indice_disparos = None
+
+def init_indice_disparos(config) -> IndiceDisparos:
+    """Inicializa o índice de disparos"""
+    global indice_disparos
+    indice_disparos = IndiceDisparos()
+    return indice_disparos
+
+def get_indice_disparos() -> IndiceDisparos:
+    """Retorna a instância do índice de disparos"""
+    if indice_disparos is None:
+        raise RuntimeError("Índice de disparos não foi inicializado. Chame init_indice_disparos() primeiro.")
+    return indice_disparos
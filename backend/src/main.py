@@ -3,10 +3,20 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, jsonify
 from flask_cors import CORS
 from src.config import config
-from src.database import init_supabase
+from src.database import init_supabase, get_supabase
+from src.webhook import init_ingestao_webhook, get_ingestao_webhook
+from src.indice_disparos import init_indice_disparos
+from src.sentimento import init_sentimentos, get_processador_sentimentos
+from src.batch import estatisticas_processadores
+from src.auth import metricas_required, tokens_verificados, estatisticas_senhas
+from src.rate_limit import init_rate_limit, get_limitador_taxa
+from src.importacao_jobs import init_importacoes, get_gerenciador_importacoes
+from src.relatorios import init_relatorios, get_gerenciador_relatorios
+from src.auditoria import init_auditoria, get_registro_atividades
+from src.estaticos import init_estaticos, get_indice_estaticos
 
 # Importar blueprints
 from src.routes.auth import auth_bp
@@ -14,6 +24,9 @@ from src.routes.contatos import contatos_bp
 from src.routes.campanhas import campanhas_bp
 from src.routes.dashboard import dashboard_bp
 from src.routes.whatsapp import whatsapp_bp
+from src.routes.segmentos import segmentos_bp
+from src.routes.importacoes import importacoes_bp
+from src.routes.exportacoes import exportacoes_bp
 
 def create_app(config_name='default'):
     app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
@@ -31,12 +44,37 @@ def create_app(config_name='default'):
         print(f"Aviso: Erro ao inicializar Supabase: {e}")
         print("Configure as variáveis SUPABASE_URL e SUPABASE_KEY")
     
+    # Ingestão assíncrona de webhooks da Evolution API
+    init_indice_disparos(app.config)
+    init_ingestao_webhook(app.config)
+    
+    # Classificação de sentimento das respostas
+    init_sentimentos(app.config)
+    
+    # Cotas de requisições por empresa
+    init_rate_limit(app.config)
+    
+    # Importações de contatos em segundo plano
+    init_importacoes(app.config)
+    
+    # Relatórios em segundo plano
+    init_relatorios(app.config)
+    
+    # Log de atividades em lote
+    init_auditoria(app.config)
+    
+    # Frontend: índice dos arquivos estáticos com variantes pré-comprimidas
+    init_estaticos(app.static_folder, app.config)
+    
     # Registrar blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(contatos_bp, url_prefix='/api/contatos')
     app.register_blueprint(campanhas_bp, url_prefix='/api/campanhas')
     app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
     app.register_blueprint(whatsapp_bp, url_prefix='/api/whatsapp')
+    app.register_blueprint(segmentos_bp, url_prefix='/api/segmentos')
+    app.register_blueprint(importacoes_bp, url_prefix='/api/importacoes')
+    app.register_blueprint(exportacoes_bp, url_prefix='/api/exportacoes')
     
     # Rota de health check
     @app.route('/api/health')
@@ -47,29 +85,47 @@ def create_app(config_name='default'):
             'version': '1.0.0'
         })
     
+    # Métricas operacionais do processo (filas e lotes em segundo plano),
+    # restritas a quem tem o METRICS_TOKEN
+    @app.route('/api/metrics')
+    @metricas_required
+    def metrics():
+        return jsonify({
+            'pid': os.getpid(),
+            'processadores': estatisticas_processadores(),
+            'webhook': get_ingestao_webhook().stats(),
+            'sentimentos': get_processador_sentimentos().stats(),
+            'auth': {
+                'tokens_verificados': tokens_verificados.stats(),
+                'senhas': estatisticas_senhas,
+                'usuarios_cache': get_supabase().usuarios_cache.stats(),
+                'empresas_cache': get_supabase().empresas_cache.stats()
+            },
+            'rate_limit': get_limitador_taxa().stats() if get_limitador_taxa() else None,
+            'importacoes': get_gerenciador_importacoes().stats(),
+            'relatorios': get_gerenciador_relatorios().stats(),
+            'auditoria': get_registro_atividades().stats(),
+            'estaticos': get_indice_estaticos().stats()
+        })
+    
     # Servir frontend
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
     def serve(path):
-        static_folder_path = app.static_folder
-        if static_folder_path is None:
-            return "Static folder not configured", 404
-
-        if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-            return send_from_directory(static_folder_path, path)
-        else:
-            index_path = os.path.join(static_folder_path, 'index.html')
-            if os.path.exists(index_path):
-                return send_from_directory(static_folder_path, 'index.html')
-            else:
-                return jsonify({
-                    'message': 'Frontend não encontrado. Deploy o frontend React na pasta static.',
-                    'api_status': 'ok'
-                }), 200
+        # Arquivos do build vêm do índice em memória; caminhos sem arquivo
+        # são rotas do SPA e recebem o index.html
+        arquivo = get_indice_estaticos().buscar(path)
+        if arquivo is None:
+            return jsonify({
+                'message': 'Frontend não encontrado. Deploy o frontend React na pasta static.',
+                'api_status': 'ok'
+            }), 200
+        return get_indice_estaticos().responder(arquivo)
     
     return app
 
-app = create_app()
+# FLASK_ENV escolhe a configuração (development, production, testing)
+app = create_app(os.environ.get('FLASK_ENV') if os.environ.get('FLASK_ENV') in config else 'default')
 
 if __name__ == '__main__':
     import os
@@ -0,0 +1,73 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Séries diárias do dashboard, lidas de metricas_diarias (migração 010).
+# A tabela é mantida por triggers a cada INSERT/UPDATE em disparos e respostas;
+# a reconciliação abaixo refaz os dias já fechados a partir das tabelas brutas.
+
+CAMPOS_METRICAS = ['disparos', 'enviados', 'entregues', 'lidos', 'erros',
+                   'respondidos', 'positivas', 'neutras', 'negativas']
+
+# Mesmo fuso usado por dia_local() no banco
+FUSO_METRICAS = ZoneInfo('America/Sao_Paulo')
+
+DIAS_MAXIMO = 365
+
+# Dias fechados recalculados por execução da reconciliação
+DIAS_RECONCILIACAO = 3
+
+
+def hoje() -> date:
+    return datetime.now(FUSO_METRICAS).date()
+
+
+def periodo_dias(dias: int) -> tuple:
+    """Período [de, ate] dos últimos `dias` dias, incluindo hoje (1 a DIAS_MAXIMO)"""
+    dias = max(1, min(dias, DIAS_MAXIMO))
+    ate = hoje()
+    return ate - timedelta(days=dias - 1), ate
+
+
+def serie_diaria(linhas: List[Dict[str, Any]], de: date, ate: date) -> List[Dict[str, Any]]:
+    """Soma as linhas de metricas_diarias por dia (todas as campanhas), com zeros nos dias sem dados"""
+    por_dia = {}
+    for linha in linhas:
+        totais = por_dia.setdefault(linha['dia'], dict.fromkeys(CAMPOS_METRICAS, 0))
+        for campo in CAMPOS_METRICAS:
+            totais[campo] += linha.get(campo) or 0
+
+    serie = []
+    dia = de
+    while dia <= ate:
+        totais = por_dia.get(dia.isoformat(), dict.fromkeys(CAMPOS_METRICAS, 0))
+        serie.append({'data': dia.isoformat(), 'quantidade': totais['disparos'], **totais})
+        dia += timedelta(days=1)
+    return serie
+
+
+def reconciliar(db, dias: int = DIAS_RECONCILIACAO, empresa_id: Optional[str] = None) -> Optional[int]:
+    """Recalcula os últimos `dias` dias fechados (até ontem); retorna as linhas gravadas"""
+    ate = hoje() - timedelta(days=1)
+    de = ate - timedelta(days=dias - 1)
+    gravadas = db.recalcular_metricas_diarias(de.isoformat(), ate.isoformat(), empresa_id)
+    if gravadas is not None:
+        logger.info(f"Métricas diárias reconciliadas de {de} a {ate}: {gravadas} linhas")
+    return gravadas
+
+
+if __name__ == '__main__':
+    # Execução agendada (cron): python -m src.metricas [dias]
+    import os
+    import sys
+    from src.database import init_supabase
+
+    db = init_supabase(os.environ.get('SUPABASE_URL'), os.environ.get('SUPABASE_KEY'))
+    dias = int(sys.argv[1]) if len(sys.argv) > 1 else DIAS_RECONCILIACAO
+    gravadas = reconciliar(db, dias)
+    if gravadas is None:
+        sys.exit(1)
+    print(f"{gravadas} linhas de métricas diárias recalculadas")
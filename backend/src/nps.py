@@ -0,0 +1,124 @@
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+# Extração de notas (0 a 10) das respostas a campanhas de pesquisa.
+# Exemplos aceitos: "nota 9", "nota: 9", "10!", "dou 8", "9/10", "dez", "nota dez".
+
+NUMEROS_POR_EXTENSO = {
+    'zero': 0, 'um': 1, 'uma': 1, 'dois': 2, 'duas': 2, 'tres': 3, 'quatro': 4,
+    'cinco': 5, 'seis': 6, 'sete': 7, 'oito': 8, 'nove': 9, 'dez': 10
+}
+
+_EXTENSO = '|'.join(NUMEROS_POR_EXTENSO)
+_VALOR = rf'(?<![\d,.])(10|[0-9])(?!\d)(?![,.]\d)|\b({_EXTENSO})\b'
+
+# Faixas repetidas da pergunta ("de 0 a 10", "1 a 10") não são notas
+_FAIXA_RE = re.compile(r'\b(?:de\s+)?(?:0|1|zero|um)\s*(?:a|ate|-)\s*(?:10|dez)\b')
+# "9/10", "9 de 10"
+_FRACAO_RE = re.compile(r'(?<!\d)(10|[0-9])\s*(?:/|de)\s*10\b')
+# Separador opcional entre a palavra-chave e a nota: "nota 9", "nota:9", "nota = 9"
+_SEPARADOR = r'\s*[:=-]?\s*'
+# Nota indicada explicitamente: "nota 9", "dou 8", "daria um 10"
+_EXPLICITA_RE = re.compile(rf'\b(?:nota|dou|daria|darei|avalio){_SEPARADOR}(?:um\s+|uma\s+)?(?:{_VALOR})')
+
+# Nota solta (por extenso ou em dígitos) só vale como resposta inteira ("dez", "nota nove!")
+_SO_EXTENSO_RE = re.compile(rf'\W*(?:nota{_SEPARADOR})?({_EXTENSO})\W*')
+_SO_DIGITO_RE = re.compile(rf'\W*(?:nota{_SEPARADOR})?(10|[0-9])\W*')
+
+
+def _normalizar(texto: str) -> str:
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def _valor(match) -> int:
+    digito, extenso = match.group(1), match.group(2)
+    return int(digito) if digito is not None else NUMEROS_POR_EXTENSO[extenso]
+
+
+def extrair_nota(texto: Optional[str]) -> Optional[int]:
+    """Extrai uma nota de 0 a 10 da resposta; retorna None se não houver nota inequívoca"""
+    if not texto:
+        return None
+
+    texto = _normalizar(texto)
+    texto = _FAIXA_RE.sub(' ', texto)
+
+    fracao = _FRACAO_RE.search(texto)
+    if fracao:
+        return int(fracao.group(1))
+
+    explicita = _EXPLICITA_RE.search(texto)
+    if explicita:
+        return _valor(explicita)
+
+    # Número solto só vale como resposta inteira ("10!", "9"): em "2 semanas
+    # de atraso" ou "tenho 1 reclamação" o número não é a nota
+    so_digito = _SO_DIGITO_RE.fullmatch(texto)
+    if so_digito:
+        return int(so_digito.group(1))
+
+    so_extenso = _SO_EXTENSO_RE.fullmatch(texto)
+    if so_extenso:
+        return NUMEROS_POR_EXTENSO[so_extenso.group(1)]
+
+    return None
+
+
+def categoria_nps(nota: int) -> str:
+    """Classifica a nota segundo o NPS: promotor (9-10), neutro (7-8) ou detrator (0-6)"""
+    if nota >= 9:
+        return 'promotores'
+    if nota >= 7:
+        return 'neutros'
+    return 'detratores'
+
+
+def incrementos_nps(respostas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Agrupa as notas de respostas gravadas em incrementos por campanha e por empresa.
+
+    Cada empresa recebe também uma linha com campanha_id nulo (agregado da empresa).
+    """
+    grupos: Dict[tuple, Dict[str, Any]] = {}
+
+    for resposta in respostas:
+        nota = resposta.get('nota')
+        empresa_id = resposta.get('empresa_id')
+        if nota is None or not empresa_id:
+            continue
+
+        for campanha_id in {resposta.get('campanha_id'), None}:
+            grupo = grupos.setdefault((empresa_id, campanha_id), {
+                'empresa_id': empresa_id,
+                'campanha_id': campanha_id,
+                'promotores': 0,
+                'neutros': 0,
+                'detratores': 0,
+                'soma_notas': 0,
+                'total': 0
+            })
+            grupo[categoria_nps(nota)] += 1
+            grupo['soma_notas'] += nota
+            grupo['total'] += 1
+
+    return list(grupos.values())
+
+
+def resumo_nps(agregado: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Calcula NPS e média a partir de uma linha agregada"""
+    agregado = agregado or {}
+    total = agregado.get('total') or 0
+    promotores = agregado.get('promotores') or 0
+    neutros = agregado.get('neutros') or 0
+    detratores = agregado.get('detratores') or 0
+
+    return {
+        'nps': round((promotores - detratores) / total * 100, 2) if total else None,
+        'media': round((agregado.get('soma_notas') or 0) / total, 2) if total else None,
+        'total_respostas': total,
+        'promotores': promotores,
+        'neutros': neutros,
+        'detratores': detratores,
+        'atualizado_em': agregado.get('updated_at')
+    }
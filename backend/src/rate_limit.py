@@ -0,0 +1,172 @@
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Limites por plano: classe de endpoint -> (requisições, janela em segundos)
+LIMITES_PADRAO = {
+    'basico': {
+        'leitura': (600, 60),
+        'escrita': (120, 60),
+        'envio': (60, 60),
+        'importacao': (5, 60)
+    },
+    'profissional': {
+        'leitura': (1800, 60),
+        'escrita': (600, 60),
+        'envio': (300, 60),
+        'importacao': (20, 60)
+    },
+    'empresarial': {
+        'leitura': (6000, 60),
+        'escrita': (2000, 60),
+        'envio': (1200, 60),
+        'importacao': (60, 60)
+    }
+}
+
+PLANO_PADRAO = 'basico'
+
+
+def classe_endpoint(metodo: str, caminho: str) -> str:
+    """Classifica a requisição numa classe de cota"""
+    if caminho.startswith('/api/whatsapp/send') or (caminho.startswith('/api/campanhas/') and caminho.endswith('/execute')):
+        return 'envio'
+    # Só a criação da importação conta na cota; os blocos do upload são escrita comum
+    if caminho.startswith('/api/contatos/import') or (metodo == 'POST' and caminho.rstrip('/') in ('/api/importacoes', '/api/importacoes/upload')):
+        return 'importacao'
+    if metodo in ('GET', 'HEAD', 'OPTIONS'):
+        return 'leitura'
+    return 'escrita'
+
+
+class LimitadorTaxa:
+    """Janela deslizante aproximada por (empresa_id, classe de endpoint).
+
+    Cada chave guarda só o início da janela atual e as contagens da janela
+    atual e da anterior; a estimativa pondera a anterior pela fração ainda
+    sobreposta. Custo O(1) por requisição e no máximo `maxsize` chaves (LRU).
+    Os contadores são por processo: com N workers, o limite efetivo por
+    empresa é até N vezes o configurado.
+    """
+
+    def __init__(self, limites: Dict[str, Dict[str, Tuple[int, int]]] = None, maxsize: int = 50000):
+        self.limites = limites or LIMITES_PADRAO
+        self.maxsize = maxsize
+        self._janelas: "OrderedDict[tuple, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.permitidas = 0
+        self.rejeitadas = 0
+
+    def limite(self, plano: Optional[str], classe: str) -> Optional[Tuple[int, int]]:
+        limites_plano = self.limites.get(plano or PLANO_PADRAO) or self.limites.get(PLANO_PADRAO, {})
+        return limites_plano.get(classe)
+
+    def permitir(self, empresa_id: str, classe: str, plano: str = None) -> Tuple[bool, int]:
+        """Conta a requisição; retorna (permitida, segundos para tentar de novo)"""
+        limite = self.limite(plano, classe)
+        if not limite:
+            return True, 0
+
+        maximo, janela = limite
+        chave = (empresa_id, classe)
+        agora = time.monotonic()
+
+        with self._lock:
+            estado = self._janelas.get(chave)
+            if estado is None:
+                # [início da janela atual, contagem atual, contagem anterior]
+                estado = [agora, 0, 0]
+                self._janelas[chave] = estado
+                if len(self._janelas) > self.maxsize:
+                    self._janelas.popitem(last=False)
+            else:
+                self._janelas.move_to_end(chave)
+
+            decorrido = agora - estado[0]
+            if decorrido >= janela:
+                # Avança uma ou mais janelas; se pulou mais de uma, a anterior ficou vazia
+                janelas_passadas = int(decorrido // janela)
+                estado[2] = estado[1] if janelas_passadas == 1 else 0
+                estado[1] = 0
+                estado[0] += janelas_passadas * janela
+                decorrido = agora - estado[0]
+
+            peso_anterior = 1 - decorrido / janela
+            estimativa = estado[2] * peso_anterior + estado[1]
+
+            if estimativa + 1 > maximo:
+                self.rejeitadas += 1
+                return False, self._espera(estado, maximo, janela, decorrido)
+
+            estado[1] += 1
+            self.permitidas += 1
+            return True, 0
+
+    @staticmethod
+    def _espera(estado: list, maximo: int, janela: int, decorrido: float) -> int:
+        atual, anterior = estado[1], estado[2]
+        if atual + 1 > maximo:
+            # Janela atual cheia: depois da virada ela passa a ser a anterior,
+            # com peso ~1, e ainda é preciso esperar sua parcela cair o suficiente
+            proxima = 1 - (maximo - 1) / atual if atual else 0
+            return max(1, math.ceil(janela - decorrido + proxima * janela))
+
+        # Tempo até a parcela da janela anterior cair o suficiente
+        alvo = 1 - (maximo - 1 - atual) / anterior
+        return max(1, math.ceil(alvo * janela - decorrido))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'chaves': len(self._janelas),
+            'max': self.maxsize,
+            'permitidas': self.permitidas,
+            'rejeitadas': self.rejeitadas
+        }
+
+
+def _carregar_limites(config) -> Dict[str, Dict[str, Tuple[int, int]]]:
+    """Mescla os limites padrão com RATE_LIMIT_PLANOS (JSON: {"plano": {"classe": [n, janela]}})"""
+    limites = {plano: dict(classes) for plano, classes in LIMITES_PADRAO.items()}
+    personalizados = config.get('RATE_LIMIT_PLANOS')
+    if not personalizados:
+        return limites
+
+    try:
+        if isinstance(personalizados, str):
+            personalizados = json.loads(personalizados)
+        for plano, classes in personalizados.items():
+            destino = limites.setdefault(plano, {})
+            for classe, (maximo, janela) in classes.items():
+                destino[classe] = (int(maximo), int(janela))
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.error(f"RATE_LIMIT_PLANOS inválido, usando limites padrão: {e}")
+        return {plano: dict(classes) for plano, classes in LIMITES_PADRAO.items()}
+
+    return limites
+
+
+# Instância global do limitador (None = desabilitado)
+limitador_taxa = None
+
+def init_rate_limit(config) -> Optional[LimitadorTaxa]:
+    """Inicializa o limitador de taxa por empresa a partir da configuração"""
+    global limitador_taxa
+    if not config.get('RATE_LIMIT_ATIVO', True):
+        limitador_taxa = None
+        return None
+
+    limitador_taxa = LimitadorTaxa(
+        limites=_carregar_limites(config),
+        maxsize=config.get('RATE_LIMIT_MAX_CHAVES', 50000)
+    )
+    return limitador_taxa
+
+def get_limitador_taxa() -> Optional[LimitadorTaxa]:
+    """Retorna o limitador de taxa (None se desabilitado ou não inicializado)"""
+    return limitador_taxa
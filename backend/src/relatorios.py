@@ -0,0 +1,354 @@
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from src.database import get_supabase
+from src.exportacao import texto_xlsx
+from src.metricas import CAMPOS_METRICAS, DIAS_MAXIMO, periodo_dias, serie_diaria
+import logging
+
+logger = logging.getLogger(__name__)
+
+FORMATOS_RELATORIO = ('json', 'csv', 'xlsx')
+
+# Período padrão do relatório (últimos N dias, incluindo hoje)
+DIAS_PADRAO_RELATORIO = 30
+
+# Tabelas cujas versões (versoes_empresa) entram na chave do artefato
+ESCOPOS_RELATORIO = ['contatos', 'campanhas', 'disparos', 'respostas']
+
+# Status em que o job ainda vai produzir o artefato
+STATUS_EM_ANDAMENTO = {'pendente', 'processando'}
+
+
+class ErroRelatorio(ValueError):
+    """Parâmetros de relatório inválidos"""
+
+
+def periodo_relatorio(de: Optional[str], ate: Optional[str]) -> Tuple[date, date]:
+    """Valida o período (datas AAAA-MM-DD); sem datas, os últimos DIAS_PADRAO_RELATORIO dias"""
+    padrao_de, padrao_ate = periodo_dias(DIAS_PADRAO_RELATORIO)
+    try:
+        inicio = date.fromisoformat(de) if de else None
+        fim = date.fromisoformat(ate) if ate else padrao_ate
+    except ValueError:
+        raise ErroRelatorio('Data inválida. Use o formato AAAA-MM-DD')
+
+    if inicio is None:
+        inicio = fim - (padrao_ate - padrao_de)
+    if inicio > fim:
+        raise ErroRelatorio('Data inicial posterior à final')
+    if (fim - inicio).days + 1 > DIAS_MAXIMO:
+        raise ErroRelatorio(f'Período máximo de {DIAS_MAXIMO} dias')
+    return inicio, fim
+
+
+def coletar_dados(db, executor: ThreadPoolExecutor, empresa_id: str, de: date, ate: date) -> Dict[str, Any]:
+    """Executa as consultas do relatório em paralelo; contagens são feitas no banco"""
+    futuros = {
+        'empresa': executor.submit(db.get_empresa_by_id, empresa_id),
+        'total_contatos': executor.submit(db.contar, 'contatos', empresa_id),
+        'contatos_ativos': executor.submit(db.contar, 'contatos', empresa_id, {'status': 'ativo'}),
+        'total_campanhas': executor.submit(db.contar, 'campanhas', empresa_id),
+        'campanhas_ativas': executor.submit(db.contar, 'campanhas', empresa_id, {'status': 'executando'}),
+        'metricas_diarias': executor.submit(db.get_metricas_diarias, empresa_id, de.isoformat(), ate.isoformat()),
+        'campanhas': executor.submit(db.get_metricas_campanhas, empresa_id)
+    }
+    dados = {nome: futuro.result() for nome, futuro in futuros.items()}
+
+    falhas = [nome for nome, valor in dados.items() if valor is None and nome != 'empresa']
+    if falhas:
+        raise RuntimeError(f'Falha ao consultar {", ".join(falhas)}')
+    return dados
+
+
+def montar_relatorio(dados: Dict[str, Any], de: date, ate: date) -> Dict[str, Any]:
+    """Relatório da empresa: totais atuais, métricas do período, campanhas e série diária"""
+    serie = serie_diaria(dados['metricas_diarias'], de, ate)
+    totais = {campo: sum(dia[campo] for dia in serie) for campo in CAMPOS_METRICAS}
+
+    taxa_resposta = round(totais['respondidos'] / totais['enviados'] * 100, 2) if totais['enviados'] else 0
+    avaliadas = totais['positivas'] + totais['negativas']
+    percentual_satisfacao = round(totais['positivas'] / avaliadas * 100, 2) if avaliadas else 0
+
+    empresa = dados.get('empresa') or {}
+    return {
+        'empresa': {'id': empresa.get('id'), 'nome': empresa.get('nome')},
+        'periodo': {'de': de.isoformat(), 'ate': ate.isoformat()},
+        'gerado_em': datetime.now(timezone.utc).isoformat(),
+        'metricas_gerais': {
+            'total_contatos': dados['total_contatos'],
+            'contatos_ativos': dados['contatos_ativos'],
+            'total_campanhas': dados['total_campanhas'],
+            'campanhas_ativas': dados['campanhas_ativas'],
+            'total_disparos': totais['disparos'],
+            'total_enviados': totais['enviados'],
+            'total_entregues': totais['entregues'],
+            'total_lidos': totais['lidos'],
+            'total_erros': totais['erros'],
+            'total_respostas': totais['respondidos'],
+            'taxa_resposta': taxa_resposta,
+            'positivas': totais['positivas'],
+            'neutras': totais['neutras'],
+            'negativas': totais['negativas'],
+            'percentual_satisfacao': percentual_satisfacao
+        },
+        'campanhas': dados['campanhas'],
+        'serie_diaria': [{'data': dia['data'], **{campo: dia[campo] for campo in CAMPOS_METRICAS}} for dia in serie]
+    }
+
+
+# =====================================================
+# ARTEFATOS
+# =====================================================
+
+def _gravar_json(relatorio: Dict[str, Any], caminho: str) -> None:
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, default=str)
+
+
+def _gravar_csv(relatorio: Dict[str, Any], caminho: str) -> None:
+    # CSV: série diária do período, com uma linha de total ao final
+    colunas = ['data'] + CAMPOS_METRICAS
+    with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+        writer = csv.writer(arquivo, lineterminator='\n')
+        writer.writerow(colunas)
+        writer.writerows([dia[c] for c in colunas] for dia in relatorio['serie_diaria'])
+        writer.writerow(['total'] + [sum(dia[c] for dia in relatorio['serie_diaria']) for c in CAMPOS_METRICAS])
+
+
+def _gravar_xlsx(relatorio: Dict[str, Any], caminho: str) -> None:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+
+    resumo = workbook.create_sheet(title='Resumo')
+    resumo.append(['empresa', texto_xlsx(relatorio['empresa'].get('nome'))])
+    resumo.append(['de', relatorio['periodo']['de']])
+    resumo.append(['ate', relatorio['periodo']['ate']])
+    resumo.append(['gerado_em', relatorio['gerado_em']])
+    for chave, valor in relatorio['metricas_gerais'].items():
+        resumo.append([chave, valor])
+
+    diario = workbook.create_sheet(title='Diario')
+    colunas = ['data'] + CAMPOS_METRICAS
+    diario.append(colunas)
+    for dia in relatorio['serie_diaria']:
+        diario.append([dia[c] for c in colunas])
+
+    campanhas = workbook.create_sheet(title='Campanhas')
+    if relatorio['campanhas']:
+        colunas = list(relatorio['campanhas'][0].keys())
+        campanhas.append(colunas)
+        for campanha in relatorio['campanhas']:
+            campanhas.append([texto_xlsx(campanha.get(c)) for c in colunas])
+
+    workbook.save(caminho)
+
+
+GRAVADORES = {'json': _gravar_json, 'csv': _gravar_csv, 'xlsx': _gravar_xlsx}
+
+
+class GerenciadorRelatorios:
+    """Relatórios gerados em segundo plano, com artefato reaproveitado.
+
+    Cada pedido vira um job no pool; as consultas do relatório rodam em paralelo
+    num segundo pool. O artefato fica em disco com a chave empresa + período +
+    formato + versões dos dados: pedidos iguais enquanto os dados não mudam
+    recebem o artefato pronto (ou o job já em andamento).
+
+    Quando um relatório fica pronto, os anteriores do mesmo período e formato
+    são apagados (linha e arquivo); o que passar de `ttl` segundos é removido
+    por uma varredura periódica.
+    """
+
+    def __init__(self, pasta: str, max_simultaneos: int = 2, inatividade: int = 600,
+                 ttl: int = 7 * 24 * 3600, intervalo_varredura: int = 3600):
+        self.pasta = os.path.abspath(pasta)
+        self.inatividade = inatividade
+        self.ttl = ttl
+        self.intervalo_varredura = intervalo_varredura
+        self._proxima_varredura = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=max_simultaneos, thread_name_prefix='relatorio')
+        self._executor_consultas = ThreadPoolExecutor(max_workers=max_simultaneos * 7, thread_name_prefix='relatorio-consulta')
+        self._ativos = set()
+        self._lock = threading.Lock()
+        self.concluidos = 0
+        self.com_erro = 0
+        self.reaproveitados = 0
+        self.artefatos_removidos = 0
+        os.makedirs(self.pasta, exist_ok=True)
+
+    def caminho(self, relatorio: Dict[str, Any]) -> str:
+        return os.path.join(self.pasta, f"{relatorio['id']}.{relatorio['formato']}")
+
+    def _chave(self, empresa_id: str, de: date, ate: date, formato: str) -> Optional[str]:
+        versoes = get_supabase().get_versoes_empresa(empresa_id, ESCOPOS_RELATORIO)
+        if versoes is None:
+            # Sem versões não há como saber se o artefato anterior ainda vale
+            return None
+        assinatura = ','.join(f"{e}:{versoes.get(e, {}).get('versao', 0)}" for e in ESCOPOS_RELATORIO)
+        return hashlib.sha256(f'{de}|{ate}|{formato}|{assinatura}'.encode('utf-8')).hexdigest()
+
+    def _reaproveitavel(self, relatorio: Dict[str, Any]) -> bool:
+        if relatorio['status'] == 'concluido':
+            return os.path.exists(self.caminho(relatorio))
+        if relatorio['status'] not in STATUS_EM_ANDAMENTO:
+            return False
+        if relatorio['id'] in self._ativos:
+            return True
+        # Job de outro processo: vale enquanto não estiver parado há mais de `inatividade`
+        atualizado_em = datetime.fromisoformat(relatorio['updated_at'].replace('Z', '+00:00'))
+        return (datetime.now(timezone.utc) - atualizado_em).total_seconds() <= self.inatividade
+
+    def solicitar(self, empresa_id: str, usuario_id: str, de: date, ate: date,
+                  formato: str = 'json') -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Retorna (relatório, reaproveitado): o existente com a mesma chave ou um novo job.
+
+        Retorna (None, False) se não for possível montar a chave ou criar o job.
+        """
+        if formato not in FORMATOS_RELATORIO:
+            raise ErroRelatorio(f'Formato inválido. Use {", ".join(FORMATOS_RELATORIO)}')
+
+        self._agendar_varredura()
+
+        db = get_supabase()
+        chave = self._chave(empresa_id, de, ate, formato)
+        if chave is None:
+            logger.error(f"Relatório não solicitado: versões da empresa {empresa_id} indisponíveis")
+            return None, False
+
+        existente = db.get_relatorio_por_chave(empresa_id, chave)
+        if existente and self._reaproveitavel(existente):
+            self.reaproveitados += 1
+            return existente, True
+
+        relatorio = db.create_relatorio({
+            'empresa_id': empresa_id,
+            'usuario_id': usuario_id,
+            'formato': formato,
+            'de': de.isoformat(),
+            'ate': ate.isoformat(),
+            'chave': chave,
+            'status': 'pendente'
+        })
+        if relatorio:
+            with self._lock:
+                self._ativos.add(relatorio['id'])
+            self._executor.submit(self._gerar, relatorio)
+        return relatorio, False
+
+    def _gerar(self, relatorio: Dict[str, Any]) -> None:
+        db = get_supabase()
+        relatorio_id = relatorio['id']
+        caminho = self.caminho(relatorio)
+        temporario = f'{caminho}.tmp'
+
+        try:
+            db.update_relatorio(relatorio_id, {'status': 'processando'})
+
+            de, ate = date.fromisoformat(relatorio['de']), date.fromisoformat(relatorio['ate'])
+            dados = coletar_dados(db, self._executor_consultas, relatorio['empresa_id'], de, ate)
+            GRAVADORES[relatorio['formato']](montar_relatorio(dados, de, ate), temporario)
+            os.replace(temporario, caminho)
+
+            db.update_relatorio(relatorio_id, {
+                'status': 'concluido',
+                'tamanho_bytes': os.path.getsize(caminho),
+                'concluido_em': datetime.now(timezone.utc).isoformat()
+            })
+            self.concluidos += 1
+            self._remover_artefatos(db.remover_relatorios_anteriores(relatorio))
+
+        except Exception as e:
+            self.com_erro += 1
+            logger.error(f"Erro ao gerar relatório {relatorio_id}: {e}")
+            db.update_relatorio(relatorio_id, {'status': 'erro', 'erro': str(e)[:1000]})
+            try:
+                os.remove(temporario)
+            except OSError:
+                pass
+        finally:
+            with self._lock:
+                self._ativos.discard(relatorio_id)
+
+    def _remover_artefatos(self, relatorios: List[Dict[str, Any]]) -> None:
+        for relatorio in relatorios:
+            try:
+                os.remove(self.caminho(relatorio))
+                self.artefatos_removidos += 1
+            except OSError:
+                pass
+
+    def _agendar_varredura(self) -> None:
+        # Disparada pelos próprios pedidos (no máximo uma por intervalo), o que
+        # também funciona nos workers do gunicorn sem thread dedicada
+        agora = time.monotonic()
+        with self._lock:
+            if agora < self._proxima_varredura:
+                return
+            self._proxima_varredura = agora + self.intervalo_varredura
+        self._executor.submit(self.varrer_expirados)
+
+    def varrer_expirados(self) -> int:
+        """Remove relatórios criados há mais de `ttl` segundos e arquivos sem linha.
+
+        Arquivos mais antigos que o ttl pertencem a linhas expiradas ou já
+        apagadas (incluindo .tmp de jobs interrompidos). Retorna quantos
+        arquivos foram removidos.
+        """
+        antes = self.artefatos_removidos
+        expiracao = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        self._remover_artefatos(get_supabase().remover_relatorios_expirados(expiracao.isoformat()))
+
+        limite = time.time() - self.ttl
+        try:
+            for entrada in os.scandir(self.pasta):
+                if entrada.is_file() and entrada.stat().st_mtime < limite:
+                    try:
+                        os.remove(entrada.path)
+                        self.artefatos_removidos += 1
+                    except OSError:
+                        pass
+        except OSError as e:
+            logger.error(f"Erro ao listar artefatos de relatórios: {e}")
+
+        removidos = self.artefatos_removidos - antes
+        if removidos:
+            logger.info(f"Varredura de relatórios: {removidos} artefatos removidos")
+        return removidos
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'ativos': len(self._ativos),
+            'concluidos': self.concluidos,
+            'com_erro': self.com_erro,
+            'reaproveitados': self.reaproveitados,
+            'artefatos_removidos': self.artefatos_removidos
+        }
+
+
+# Instância global do gerenciador de relatórios
+gerenciador_relatorios = None
+
+def init_relatorios(config) -> GerenciadorRelatorios:
+    """Inicializa o gerenciador de relatórios em segundo plano"""
+    global gerenciador_relatorios
+    gerenciador_relatorios = GerenciadorRelatorios(
+        pasta=os.path.join(config.get('UPLOAD_FOLDER', 'uploads'), 'relatorios'),
+        max_simultaneos=config.get('RELATORIO_SIMULTANEOS', 2),
+        inatividade=config.get('RELATORIO_INATIVIDADE', 600),
+        ttl=config.get('RELATORIO_TTL', 7 * 24 * 3600)
+    )
+    return gerenciador_relatorios
+
+def get_gerenciador_relatorios() -> GerenciadorRelatorios:
+    """Retorna a instância do gerenciador de relatórios"""
+    if gerenciador_relatorios is None:
+        raise RuntimeError("Relatórios não foram inicializados. Chame init_relatorios() primeiro.")
+    return gerenciador_relatorios
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from src.auth import AuthService
+from src.auditoria import registrar_atividade
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,7 +24,15 @@ def login():
         
         result = AuthService.login(email, password)
         
+        if result.get('sobrecarga'):
+            response = jsonify({'message': result['message']})
+            response.headers['Retry-After'] = '2'
+            return response, 503
+        
         if result['success']:
+            user = result['user']
+            registrar_atividade('login', 'usuario', user['id'],
+                                empresa_id=(user.get('empresa') or {}).get('id'), usuario_id=user['id'])
             return jsonify({
                 'message': 'Login realizado com sucesso',
                 'user': result['user'],
@@ -65,7 +74,15 @@ def register():
         
         result = AuthService.register(nome, email, password, empresa_nome, empresa_slug)
         
+        if result.get('sobrecarga'):
+            response = jsonify({'message': result['message']})
+            response.headers['Retry-After'] = '2'
+            return response, 503
+        
         if result['success']:
+            user = result['user']
+            registrar_atividade('registro', 'usuario', user['id'],
+                                empresa_id=(user.get('empresa') or {}).get('id'), usuario_id=user['id'])
             return jsonify({
                 'message': 'Registro realizado com sucesso',
                 'user': result['user'],
@@ -117,13 +134,13 @@ def me():
             from src.database import get_supabase
             
             db = get_supabase()
-            user = db.get_user_by_email(request.current_user['email'])
+            user = db.get_user_by_id(request.current_user['id'])
             
             if not user:
                 return jsonify({'message': 'Usuário não encontrado'}), 404
             
             # Buscar dados da empresa
-            empresa = db.get_empresa_by_slug(user['empresa_id'])
+            empresa = db.get_empresa_by_id(user['empresa_id'])
             
             return jsonify({
                 'user': {
@@ -144,6 +161,17 @@ def me():
 
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
-    """Endpoint de logout (apenas retorna sucesso, pois JWT é stateless)"""
+    """Endpoint de logout (JWT é stateless; apenas descarta o token do cache de verificação)"""
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        token = auth_header.split(" ")[1]
+        try:
+            payload = AuthService.verify_token(token)
+            registrar_atividade('logout', 'usuario', payload['user_id'],
+                                empresa_id=payload['empresa_id'], usuario_id=payload['user_id'])
+        except Exception:
+            pass
+        AuthService.invalidate_token(token)
+    
     return jsonify({'message': 'Logout realizado com sucesso'}), 200
 
@@ -1,15 +1,54 @@
 from flask import Blueprint, request, jsonify
 from src.auth import token_required
+from src.auditoria import registrar_atividade
+from src.versoes import condicional
 from src.database import get_supabase
+from src.segmentos import validar_segmento, SegmentoInvalido
+from src.evolution_api import normalizar_telefone
+from src.nps import resumo_nps
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Quantidade de contatos lidos e disparos inseridos por round-trip
+DISPAROS_POR_LOTE = 1000
+
 campanhas_bp = Blueprint('campanhas', __name__)
 
+# Templates de mensagem pré-definidos
+TEMPLATES_MENSAGEM = {
+    'saudacao': [
+        {
+            'nome': 'Saudação Padrão',
+            'template': 'Olá {nome}! Obrigado por escolher a Madeireira Cambará. Como foi sua experiência conosco?'
+        },
+        {
+            'nome': 'Saudação Formal',
+            'template': 'Prezado(a) {nome}, agradecemos pela confiança em nossos produtos. Gostaríamos de saber sua opinião sobre nosso atendimento.'
+        }
+    ],
+    'pesquisa': [
+        {
+            'nome': 'Pesquisa de Satisfação',
+            'template': 'Olá {nome}! Em uma escala de 1 a 10, como você avalia nosso atendimento? Sua opinião é muito importante para nós!'
+        },
+        {
+            'nome': 'NPS Simples',
+            'template': 'Oi {nome}! Você recomendaria a Madeireira Cambará para um amigo? Responda de 0 a 10.'
+        }
+    ],
+    'follow_up': [
+        {
+            'nome': 'Follow-up Padrão',
+            'template': 'Olá {nome}! Tudo certo com sua compra? Se precisar de algo, estamos aqui para ajudar!'
+        }
+    ]
+}
+
 @campanhas_bp.route('/', methods=['GET'])
 @token_required
+@condicional('campanhas')
 def get_campanhas():
     """Lista campanhas da empresa"""
     try:
@@ -77,6 +116,7 @@ def create_campanha():
         campanha = db.create_campanha(campanha_data)
         
         if campanha:
+            registrar_atividade('criar', 'campanha', campanha['id'], {'nome': nome, 'tipo': tipo})
             return jsonify({
                 'message': 'Campanha criada com sucesso',
                 'campanha': campanha
@@ -114,6 +154,7 @@ def update_campanha(campanha_id):
         campanha = db.update_campanha(campanha_id, update_data)
         
         if campanha:
+            registrar_atividade('atualizar', 'campanha', campanha_id, {'campos': sorted(update_data)})
             return jsonify({
                 'message': 'Campanha atualizada com sucesso',
                 'campanha': campanha
@@ -145,42 +186,66 @@ def execute_campanha(campanha_id):
         if campanha['status'] not in ['rascunho', 'pausada']:
             return jsonify({'message': 'Campanha não pode ser executada no status atual'}), 400
         
-        # Buscar contatos para a campanha
+        # Definir público da campanha: lista explícita, segmento salvo ou definição inline
         contatos_ids = data.get('contatos_ids', [])
+        definicao = None
         
         if not contatos_ids:
-            # Se não especificou contatos, usar todos os contatos ativos
-            contatos = db.get_contatos(empresa_id, 10000, 0)
-            contatos_ids = [c['id'] for c in contatos if c['status'] == 'ativo']
-        
-        if not contatos_ids:
-            return jsonify({'message': 'Nenhum contato encontrado para a campanha'}), 400
-        
-        # Criar disparos para cada contato
-        disparos_criados = 0
-        
-        for contato_id in contatos_ids:
-            disparo_data = {
+            try:
+                if data.get('segmento_id'):
+                    segmento = db.get_segmento(empresa_id, data['segmento_id'])
+                    if not segmento:
+                        return jsonify({'message': 'Segmento não encontrado'}), 404
+                    definicao = validar_segmento(segmento['definicao'])
+                else:
+                    # Sem segmento, usar todos os contatos ativos
+                    definicao = validar_segmento(data.get('segmento') or {'status': 'ativo'})
+            except SegmentoInvalido as e:
+                return jsonify({'message': str(e)}), 400
+        
+        def novo_disparo(contato):
+            return {
+                'empresa_id': empresa_id,
                 'campanha_id': campanha_id,
-                'contato_id': contato_id,
+                'contato_id': contato['id'],
                 'canal': campanha['canal'],
                 'mensagem': campanha['template_mensagem'],
+                'telefone': normalizar_telefone(contato.get('telefone')),
                 'status': 'pendente'
             }
-            
-            disparo = db.create_disparo(disparo_data)
-            if disparo:
-                disparos_criados += 1
+        
+        def criar_disparos(contatos):
+            criados = db.bulk_create_disparos([novo_disparo(c) for c in contatos])
+            return len(criados)
+        
+        # Criar disparos em lotes, percorrendo o segmento página a página
+        disparos_criados = 0
+        total_contatos = 0
+        
+        if contatos_ids:
+            for inicio in range(0, len(contatos_ids), DISPAROS_POR_LOTE):
+                lote = db.get_contatos_by_ids(empresa_id, contatos_ids[inicio:inicio + DISPAROS_POR_LOTE], 'id,telefone')
+                total_contatos += len(lote)
+                disparos_criados += criar_disparos(lote)
+        else:
+            for pagina in db.iter_contatos(empresa_id, definicao, 'id,telefone', page_size=DISPAROS_POR_LOTE):
+                total_contatos += len(pagina)
+                disparos_criados += criar_disparos(pagina)
+        
+        if not total_contatos:
+            return jsonify({'message': 'Nenhum contato encontrado para a campanha'}), 400
         
         # Atualizar status da campanha
         db.update_campanha(campanha_id, {
             'status': 'executando',
-            'total_contatos': len(contatos_ids)
+            'total_contatos': total_contatos
         })
         
         # Aqui você integraria com n8n para processar os disparos
         # Por enquanto, vamos simular o envio
         
+        registrar_atividade('executar', 'campanha', campanha_id, {'disparos_criados': disparos_criados})
+        
         return jsonify({
             'message': f'Campanha executada com sucesso. {disparos_criados} disparos criados.',
             'disparos_criados': disparos_criados
@@ -200,6 +265,7 @@ def pause_campanha(campanha_id):
         campanha = db.update_campanha(campanha_id, {'status': 'pausada'})
         
         if campanha:
+            registrar_atividade('pausar', 'campanha', campanha_id)
             return jsonify({
                 'message': 'Campanha pausada com sucesso',
                 'campanha': campanha
@@ -221,6 +287,7 @@ def resume_campanha(campanha_id):
         campanha = db.update_campanha(campanha_id, {'status': 'executando'})
         
         if campanha:
+            registrar_atividade('retomar', 'campanha', campanha_id)
             return jsonify({
                 'message': 'Campanha retomada com sucesso',
                 'campanha': campanha
@@ -242,6 +309,7 @@ def cancel_campanha(campanha_id):
         campanha = db.update_campanha(campanha_id, {'status': 'cancelada'})
         
         if campanha:
+            registrar_atividade('cancelar', 'campanha', campanha_id)
             return jsonify({
                 'message': 'Campanha cancelada com sucesso',
                 'campanha': campanha
@@ -255,18 +323,18 @@ def cancel_campanha(campanha_id):
 
 @campanhas_bp.route('/<campanha_id>/stats', methods=['GET'])
 @token_required
+@condicional('campanhas', 'disparos', 'respostas')
 def get_campanha_stats(campanha_id):
     """Retorna estatísticas da campanha"""
     try:
         db = get_supabase()
         
-        # Buscar métricas da campanha usando a view
-        client = db.get_client()
-        response = client.table('vw_metricas_campanhas').select('*').eq('id', campanha_id).execute()
+        # Métricas da campanha, restritas à empresa do usuário
+        stats = db.get_metricas_campanhas(request.current_user['empresa_id'], campanha_id)
         
-        if response.data:
+        if stats:
             return jsonify({
-                'stats': response.data[0]
+                'stats': stats[0]
             }), 200
         else:
             return jsonify({'message': 'Campanha não encontrada'}), 404
@@ -275,38 +343,32 @@ def get_campanha_stats(campanha_id):
         logger.error(f"Erro ao buscar estatísticas da campanha: {e}")
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
+@campanhas_bp.route('/<campanha_id>/nps', methods=['GET'])
+@token_required
+@condicional('nps')
+def get_campanha_nps(campanha_id):
+    """Retorna o NPS da campanha (agregado mantido incrementalmente)"""
+    try:
+        db = get_supabase()
+        
+        agregado = db.get_nps_agregado(request.current_user['empresa_id'], campanha_id)
+        
+        return jsonify({
+            'campanha_id': campanha_id,
+            'nps': resumo_nps(agregado)
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao buscar NPS da campanha: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
 @campanhas_bp.route('/templates', methods=['GET'])
 @token_required
 def get_templates():
     """Retorna templates de mensagem pré-definidos"""
-    templates = {
-        'saudacao': [
-            {
-                'nome': 'Saudação Padrão',
-                'template': 'Olá {nome}! Obrigado por escolher a Madeireira Cambará. Como foi sua experiência conosco?'
-            },
-            {
-                'nome': 'Saudação Formal',
-                'template': 'Prezado(a) {nome}, agradecemos pela confiança em nossos produtos. Gostaríamos de saber sua opinião sobre nosso atendimento.'
-            }
-        ],
-        'pesquisa': [
-            {
-                'nome': 'Pesquisa de Satisfação',
-                'template': 'Olá {nome}! Em uma escala de 1 a 10, como você avalia nosso atendimento? Sua opinião é muito importante para nós!'
-            },
-            {
-                'nome': 'NPS Simples',
-                'template': 'Oi {nome}! Você recomendaria a Madeireira Cambará para um amigo? Responda de 0 a 10.'
-            }
-        ],
-        'follow_up': [
-            {
-                'nome': 'Follow-up Padrão',
-                'template': 'Olá {nome}! Tudo certo com sua compra? Se precisar de algo, estamos aqui para ajudar!'
-            }
-        ]
-    }
-    
-    return jsonify({'templates': templates}), 200
+    response = jsonify({'templates': TEMPLATES_MENSAGEM})
+    # Conteúdo estático: ETag do próprio corpo, 304 se o cliente já o tem
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
@@ -1,8 +1,10 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from src.auth import token_required
-from src.database import get_supabase
-import pandas as pd
-import io
+from src.auditoria import registrar_atividade
+from src.versoes import condicional
+from src.database import ContatoDuplicado, get_supabase
+from src.exportacao import COLUNAS_CONTATOS, comprimir_gzip, gerar_csv
+from src.importacao import MODO_PADRAO, MODOS_IMPORTACAO, ErroImportacao, importar_csv, importar_planilha
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,6 +13,7 @@ contatos_bp = Blueprint('contatos', __name__)
 
 @contatos_bp.route('/', methods=['GET'])
 @token_required
+@condicional('contatos')
 def get_contatos():
     """Lista contatos da empresa"""
     try:
@@ -22,9 +25,18 @@ def get_contatos():
         per_page = int(request.args.get('per_page', 50))
         search = request.args.get('search', '')
         
+        # Filtro por tags (usa o índice GIN): ?tags=vip,obra&tags_modo=any|all
+        tags = [t.strip() for t in request.args.get('tags', '').split(',') if t.strip()]
+        tags_modo = request.args.get('tags_modo', 'any')
+        
+        if tags_modo not in ['any', 'all']:
+            return jsonify({'message': 'tags_modo deve ser any ou all'}), 400
+        
+        definicao = {'tags': {tags_modo: tags}} if tags else None
+        
         offset = (page - 1) * per_page
         
-        contatos = db.get_contatos(empresa_id, per_page, offset)
+        contatos = db.get_contatos(empresa_id, per_page, offset, definicao)
         
         # Se houver busca, filtrar localmente (idealmente seria no banco)
         if search:
@@ -77,9 +89,14 @@ def create_contato():
             'origem': 'manual'
         }
         
-        contato = db.create_contato(contato_data)
+        try:
+            contato = db.create_contato(contato_data)
+        except ContatoDuplicado as e:
+            return jsonify({'message': str(e), 'contato_id': e.contato_id}), 409
         
         if contato:
+            db.invalidar_contagens_segmentos(contato_data['empresa_id'])
+            registrar_atividade('criar', 'contato', contato['id'])
             return jsonify({
                 'message': 'Contato criado com sucesso',
                 'contato': contato
@@ -107,9 +124,14 @@ def update_contato(contato_id):
         update_data = {k: v for k, v in data.items() 
                       if k not in ['id', 'empresa_id', 'created_at', 'updated_at']}
         
-        contato = db.update_contato(contato_id, update_data)
+        try:
+            contato = db.update_contato(contato_id, update_data)
+        except ContatoDuplicado as e:
+            return jsonify({'message': str(e), 'contato_id': e.contato_id}), 409
         
         if contato:
+            db.invalidar_contagens_segmentos(request.current_user['empresa_id'])
+            registrar_atividade('atualizar', 'contato', contato_id, {'campos': sorted(update_data)})
             return jsonify({
                 'message': 'Contato atualizado com sucesso',
                 'contato': contato
@@ -131,6 +153,8 @@ def delete_contato(contato_id):
         success = db.delete_contato(contato_id)
         
         if success:
+            db.invalidar_contagens_segmentos(request.current_user['empresa_id'])
+            registrar_atividade('excluir', 'contato', contato_id)
             return jsonify({'message': 'Contato deletado com sucesso'}), 200
         else:
             return jsonify({'message': 'Contato não encontrado'}), 404
@@ -159,63 +183,50 @@ def import_contatos():
         if file_extension not in allowed_extensions:
             return jsonify({'message': 'Formato de arquivo não suportado. Use CSV ou Excel'}), 400
         
-        # Ler arquivo
+        # Contatos já existentes (mesmo telefone/email): ignorar ou mesclar
+        modo = request.form.get('modo') or request.args.get('modo') or MODO_PADRAO
+        if modo not in MODOS_IMPORTACAO:
+            return jsonify({'message': 'modo deve ser ignorar ou mesclar'}), 400
+        
+        empresa_id = request.current_user['empresa_id']
+        db = get_supabase()
+        
+        # Ler, limpar, deduplicar e gravar em blocos (planilhas são convertidas para CSV num processo auxiliar)
         try:
             if file_extension == 'csv':
-                df = pd.read_csv(io.StringIO(file.read().decode('utf-8')))
+                resultado = importar_csv(file.stream, empresa_id, db, modo=modo)
             else:
-                df = pd.read_excel(file)
+                resultado = importar_planilha(file, file_extension, empresa_id, db, modo=modo)
+        except ErroImportacao as e:
+            return jsonify({'message': str(e)}), 400
         except Exception as e:
             return jsonify({'message': f'Erro ao ler arquivo: {str(e)}'}), 400
         
-        # Validar colunas obrigatórias
-        required_columns = ['nome']
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        gravados = resultado['importados'] + resultado['atualizados']
+        if gravados:
+            db.invalidar_contagens_segmentos(empresa_id)
         
-        if missing_columns:
-            return jsonify({
-                'message': f'Colunas obrigatórias não encontradas: {", ".join(missing_columns)}'
-            }), 400
-        
-        # Preparar dados para inserção
-        contatos_data = []
-        empresa_id = request.current_user['empresa_id']
-        
-        for _, row in df.iterrows():
-            # Pular linhas com nome vazio
-            if pd.isna(row['nome']) or str(row['nome']).strip() == '':
-                continue
-            
-            contato_data = {
-                'empresa_id': empresa_id,
-                'nome': str(row['nome']).strip(),
-                'telefone': str(row.get('telefone', '')).strip() if not pd.isna(row.get('telefone')) else None,
-                'email': str(row.get('email', '')).strip() if not pd.isna(row.get('email')) else None,
-                'documento': str(row.get('documento', '')).strip() if not pd.isna(row.get('documento')) else None,
-                'endereco': str(row.get('endereco', '')).strip() if not pd.isna(row.get('endereco')) else None,
-                'origem': 'importacao'
-            }
-            
-            # Validar se tem pelo menos telefone ou email
-            if not contato_data['telefone'] and not contato_data['email']:
-                continue
-            
-            contatos_data.append(contato_data)
-        
-        if not contatos_data:
+        if not gravados and not resultado['falhas'] and not resultado['duplicados']:
             return jsonify({'message': 'Nenhum contato válido encontrado no arquivo'}), 400
         
-        # Inserir contatos no banco
-        db = get_supabase()
-        success = db.bulk_create_contatos(contatos_data)
-        
-        if success:
-            return jsonify({
-                'message': f'{len(contatos_data)} contatos importados com sucesso',
-                'total_importados': len(contatos_data)
-            }), 201
-        else:
+        if not gravados and resultado['falhas']:
             return jsonify({'message': 'Erro ao importar contatos'}), 500
+        
+        registrar_atividade('importar', 'contato', detalhes={
+            'arquivo': file.filename,
+            'modo': modo,
+            'importados': resultado['importados'],
+            'atualizados': resultado['atualizados']
+        })
+        
+        return jsonify({
+            'message': f"{resultado['importados']} contatos importados com sucesso",
+            'total_importados': resultado['importados'],
+            'total_atualizados': resultado['atualizados'],
+            'total_duplicados': resultado['duplicados'],
+            'total_ignorados': resultado['ignorados'],
+            'total_falhas': resultado['falhas']
+        }), 201
             
     except Exception as e:
         logger.error(f"Erro ao importar contatos: {e}")
@@ -224,33 +235,40 @@ def import_contatos():
 @contatos_bp.route('/export', methods=['GET'])
 @token_required
 def export_contatos():
-    """Exporta contatos para CSV"""
+    """Exporta contatos para CSV em streaming (?gzip=1 para compactar)"""
     try:
         db = get_supabase()
         empresa_id = request.current_user['empresa_id']
+        compactar = request.args.get('gzip', '').lower() in ('1', 'true')
         
-        # Buscar todos os contatos
-        contatos = db.get_contatos(empresa_id, 10000, 0)  # Limite alto para pegar todos
+        # Percorre os contatos por keyset, sem limite de linhas
+        paginas = db.iter_contatos(empresa_id, colunas=','.join(COLUNAS_CONTATOS))
         
-        if not contatos:
+        # Primeira página antes de responder, para ainda poder devolver 404
+        primeira = next(paginas, None)
+        if not primeira:
             return jsonify({'message': 'Nenhum contato encontrado'}), 404
         
-        # Converter para DataFrame
-        df = pd.DataFrame(contatos)
-        
-        # Selecionar apenas colunas relevantes
-        columns_to_export = ['nome', 'telefone', 'email', 'documento', 'endereco', 'status', 'created_at']
-        df = df[columns_to_export]
+        def todas_paginas():
+            yield primeira
+            try:
+                yield from paginas
+            except Exception as e:
+                # Os cabeçalhos já foram enviados: só resta interromper o arquivo
+                logger.error(f"Erro durante exportação de contatos da empresa {empresa_id}: {e}")
+                raise
         
-        # Converter para CSV
-        output = io.StringIO()
-        df.to_csv(output, index=False, encoding='utf-8')
-        csv_data = output.getvalue()
+        conteudo = gerar_csv(todas_paginas(), COLUNAS_CONTATOS)
         
-        from flask import Response
+        if compactar:
+            return Response(
+                comprimir_gzip(conteudo),
+                mimetype='application/gzip',
+                headers={'Content-Disposition': 'attachment; filename=contatos.csv.gz'}
+            )
         
         return Response(
-            csv_data,
+            conteudo,
             mimetype='text/csv',
             headers={'Content-Disposition': 'attachment; filename=contatos.csv'}
         )
@@ -261,6 +279,7 @@ def export_contatos():
 
 @contatos_bp.route('/stats', methods=['GET'])
 @token_required
+@condicional('contatos')
 def get_contatos_stats():
     """Retorna estatísticas dos contatos"""
     try:
@@ -288,3 +307,22 @@ def get_contatos_stats():
         logger.error(f"Erro ao buscar estatísticas: {e}")
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
+@contatos_bp.route('/tags', methods=['GET'])
+@token_required
+@condicional('contatos')
+def get_contatos_tags():
+    """Retorna a contagem de contatos por tag"""
+    try:
+        db = get_supabase()
+        empresa_id = request.current_user['empresa_id']
+        
+        tags = db.get_tags_contagem(empresa_id)
+        
+        return jsonify({
+            'tags': tags,
+            'total_tags': len(tags)
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao buscar contagem de tags: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
@@ -1,15 +1,47 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file
 from src.auth import token_required
+from src.versoes import condicional
 from src.database import get_supabase
-from datetime import datetime, timedelta
+from src.nps import resumo_nps
+from src.metricas import periodo_dias, serie_diaria
+from src.relatorios import ErroRelatorio, get_gerenciador_relatorios, periodo_relatorio
+from datetime import datetime
+import base64
+import json
+import os
+import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+ATIVIDADES_POR_PAGINA_MAX = 100
+
+def _gerar_cursor(created_at, log_id):
+    """Cursor opaco da paginação de atividades: posição (created_at, id) do último item"""
+    return base64.urlsafe_b64encode(json.dumps([created_at, log_id]).encode('utf-8')).decode('ascii')
+
+def _ler_cursor(cursor):
+    """Decodifica e valida o cursor (os valores vão para o filtro da consulta)"""
+    if not cursor:
+        return None
+    try:
+        created_at, log_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        return created_at, str(uuid.UUID(log_id))
+    except (TypeError, ValueError, AttributeError, UnicodeError):
+        raise ValueError('Cursor inválido')
+
+MIMETYPES_RELATORIO = {
+    'json': 'application/json',
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
 @dashboard_bp.route('/metrics', methods=['GET'])
 @token_required
+@condicional('contatos', 'campanhas', 'disparos', 'respostas', diario=True)
 def get_dashboard_metrics():
     """Retorna métricas principais do dashboard"""
     try:
@@ -29,22 +61,16 @@ def get_dashboard_metrics():
             status = campanha['status']
             campanhas_por_status[status] = campanhas_por_status.get(status, 0) + 1
         
-        # Disparos dos últimos 7 dias
-        seven_days_ago = (datetime.now() - timedelta(days=7)).isoformat()
-        disparos_response = client.rpc('get_disparos_last_days', {
-            'empresa_id_param': empresa_id,
-            'days_param': 7
-        }).execute()
+        # Disparos dos últimos 7 dias (rollup diário)
+        de, ate = periodo_dias(7)
+        disparos_ultimos_dias = serie_diaria(db.get_metricas_diarias(empresa_id, de.isoformat(), ate.isoformat()), de, ate)
         
-        disparos_ultimos_dias = disparos_response.data or []
-        
-        # Respostas por sentimento
-        sentimentos_response = client.table('vw_analise_sentimentos').select('*').execute()
-        sentimentos_data = sentimentos_response.data or []
+        # Respostas por sentimento (somente da empresa)
+        sentimentos = db.get_sentimentos_empresa(empresa_id)
         
         # Calcular média de sentimento
-        total_positivas = sum(s.get('positivas', 0) for s in sentimentos_data)
-        total_negativas = sum(s.get('negativas', 0) for s in sentimentos_data)
+        total_positivas = sentimentos['positivas']
+        total_negativas = sentimentos['negativas']
         total_respostas_sentimento = total_positivas + total_negativas
         
         percentual_satisfacao = 0
@@ -69,32 +95,64 @@ def get_dashboard_metrics():
         logger.error(f"Erro ao buscar métricas do dashboard: {e}")
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
+@dashboard_bp.route('/nps', methods=['GET'])
+@token_required
+@condicional('nps')
+def get_dashboard_nps():
+    """Retorna o NPS da empresa (agregado mantido incrementalmente)"""
+    try:
+        db = get_supabase()
+        empresa_id = request.current_user['empresa_id']
+        
+        agregado = db.get_nps_agregado(empresa_id)
+        
+        return jsonify({
+            'nps': resumo_nps(agregado)
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao buscar NPS: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
 @dashboard_bp.route('/recent-activity', methods=['GET'])
 @token_required
+@condicional('logs_sistema')
 def get_recent_activity():
-    """Retorna atividades recentes"""
+    """Retorna atividades recentes, paginadas por cursor (?limit=20&cursor=...)"""
     try:
         db = get_supabase()
         empresa_id = request.current_user['empresa_id']
         
-        client = db.get_client()
+        try:
+            limit = max(1, min(int(request.args.get('limit', 20)), ATIVIDADES_POR_PAGINA_MAX))
+            antes = _ler_cursor(request.args.get('cursor'))
+        except ValueError:
+            return jsonify({'message': 'Parâmetros de paginação inválidos'}), 400
         
-        # Buscar logs recentes
-        logs_response = client.table('logs_sistema').select('*').eq('empresa_id', empresa_id).order('created_at', desc=True).limit(20).execute()
+        # Um registro a mais indica se há próxima página
+        logs = db.get_logs_sistema(empresa_id, limit + 1, antes)
         
         activities = []
-        for log in logs_response.data:
+        for log in logs[:limit]:
             activity = {
                 'id': log['id'],
                 'acao': log['acao'],
                 'entidade': log['entidade'],
+                'entidade_id': log.get('entidade_id'),
+                'detalhes': log.get('detalhes'),
                 'created_at': log['created_at'],
                 'usuario_id': log.get('usuario_id')
             }
             activities.append(activity)
         
+        next_cursor = None
+        if len(logs) > limit:
+            ultimo = activities[-1]
+            next_cursor = _gerar_cursor(ultimo['created_at'], ultimo['id'])
+        
         return jsonify({
-            'activities': activities
+            'activities': activities,
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -103,24 +161,23 @@ def get_recent_activity():
 
 @dashboard_bp.route('/charts/disparos-por-dia', methods=['GET'])
 @token_required
+@condicional('disparos', 'respostas', diario=True)
 def get_disparos_por_dia():
     """Retorna dados para gráfico de disparos por dia"""
     try:
         db = get_supabase()
         empresa_id = request.current_user['empresa_id']
         
-        # Parâmetros de período
-        days = int(request.args.get('days', 30))
-        
-        client = db.get_client()
+        # Parâmetros de período (limitado a 1..365 dias)
+        try:
+            days = int(request.args.get('days', 30))
+        except ValueError:
+            return jsonify({'message': 'days inválido'}), 400
         
-        # Buscar disparos agrupados por dia
-        response = client.rpc('get_disparos_chart_data', {
-            'empresa_id_param': empresa_id,
-            'days_param': days
-        }).execute()
-        
-        chart_data = response.data or []
+        # Lê só o rollup diário: no máximo uma linha por dia e campanha
+        de, ate = periodo_dias(days)
+        linhas = db.get_metricas_diarias(empresa_id, de.isoformat(), ate.isoformat(), request.args.get('campanha_id'))
+        chart_data = serie_diaria(linhas, de, ate)
         
         return jsonify({
             'chart_data': chart_data
@@ -132,28 +189,20 @@ def get_disparos_por_dia():
 
 @dashboard_bp.route('/charts/respostas-por-sentimento', methods=['GET'])
 @token_required
+@condicional('respostas')
 def get_respostas_por_sentimento():
     """Retorna dados para gráfico de respostas por sentimento"""
     try:
         db = get_supabase()
         empresa_id = request.current_user['empresa_id']
         
-        client = db.get_client()
-        
-        # Buscar análise de sentimentos
-        response = client.table('vw_analise_sentimentos').select('*').execute()
-        
-        sentimentos_data = response.data or []
-        
-        # Agregar dados
-        total_positivas = sum(s.get('positivas', 0) for s in sentimentos_data)
-        total_neutras = sum(s.get('neutras', 0) for s in sentimentos_data)
-        total_negativas = sum(s.get('negativas', 0) for s in sentimentos_data)
+        # Totais já agregados no banco, somente da empresa
+        sentimentos = db.get_sentimentos_empresa(empresa_id)
         
         chart_data = [
-            {'sentimento': 'Positivo', 'quantidade': total_positivas},
-            {'sentimento': 'Neutro', 'quantidade': total_neutras},
-            {'sentimento': 'Negativo', 'quantidade': total_negativas}
+            {'sentimento': 'Positivo', 'quantidade': sentimentos['positivas']},
+            {'sentimento': 'Neutro', 'quantidade': sentimentos['neutras']},
+            {'sentimento': 'Negativo', 'quantidade': sentimentos['negativas']}
         ]
         
         return jsonify({
@@ -166,21 +215,15 @@ def get_respostas_por_sentimento():
 
 @dashboard_bp.route('/charts/campanhas-performance', methods=['GET'])
 @token_required
+@condicional('campanhas', 'disparos', 'respostas')
 def get_campanhas_performance():
     """Retorna dados de performance das campanhas"""
     try:
         db = get_supabase()
         empresa_id = request.current_user['empresa_id']
         
-        client = db.get_client()
-        
-        # Buscar métricas das campanhas
-        response = client.table('vw_metricas_campanhas').select('*').execute()
-        
-        campanhas_data = response.data or []
-        
-        # Filtrar apenas campanhas da empresa (se necessário)
-        # Nota: isso deveria ser feito no banco com RLS
+        # Métricas das campanhas da empresa (filtradas no banco)
+        campanhas_data = db.get_metricas_campanhas(empresa_id)
         
         chart_data = []
         for campanha in campanhas_data:
@@ -200,42 +243,131 @@ def get_campanhas_performance():
         logger.error(f"Erro ao buscar performance das campanhas: {e}")
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
+def _resumo_relatorio(relatorio):
+    """Status do relatório para o cliente"""
+    return {
+        'id': relatorio['id'],
+        'formato': relatorio['formato'],
+        'de': relatorio['de'],
+        'ate': relatorio['ate'],
+        'status': relatorio['status'],
+        'tamanho_bytes': relatorio.get('tamanho_bytes'),
+        'erro': relatorio.get('erro'),
+        'created_at': relatorio.get('created_at'),
+        'concluido_em': relatorio.get('concluido_em'),
+        'download_url': f"/api/dashboard/export/report/{relatorio['id']}/download" if relatorio['status'] == 'concluido' else None
+    }
+
+def _solicitar_relatorio(de, ate, formato):
+    """Pede o relatório ao gerenciador; retorna (relatorio, resposta de erro)"""
+    try:
+        inicio, fim = periodo_relatorio(de, ate)
+        relatorio, _ = get_gerenciador_relatorios().solicitar(
+            request.current_user['empresa_id'],
+            request.current_user['id'],
+            inicio,
+            fim,
+            formato
+        )
+    except ErroRelatorio as e:
+        return None, (jsonify({'message': str(e)}), 400)
+
+    if not relatorio:
+        return None, (jsonify({'message': 'Erro ao solicitar relatório'}), 500)
+    return relatorio, None
+
+@dashboard_bp.route('/export/report', methods=['POST'])
+@token_required
+def solicitar_relatorio():
+    """Solicita a geração do relatório em segundo plano.
+
+    Corpo: {"de": "AAAA-MM-DD", "ate": "AAAA-MM-DD", "formato": "json|csv|xlsx"}.
+    Se já houver artefato para o mesmo período e formato (e os dados não mudaram),
+    responde 200 com ele pronto para download; senão 202 com o job.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        relatorio, erro = _solicitar_relatorio(data.get('de'), data.get('ate'), data.get('formato', 'json'))
+        if erro:
+            return erro
+
+        return jsonify({
+            'relatorio': _resumo_relatorio(relatorio)
+        }), 200 if relatorio['status'] == 'concluido' else 202
+
+    except Exception as e:
+        logger.error(f"Erro ao solicitar relatório: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
 @dashboard_bp.route('/export/report', methods=['GET'])
 @token_required
 def export_report():
-    """Exporta relatório completo"""
+    """Relatório completo em JSON (?de=&ate=): 200 com o conteúdo se já gerado, senão 202 com o job"""
     try:
-        db = get_supabase()
-        empresa_id = request.current_user['empresa_id']
-        
-        # Buscar todos os dados necessários
-        metrics = db.get_metricas_dashboard(empresa_id)
-        campanhas = db.get_campanhas(empresa_id)
-        contatos = db.get_contatos(empresa_id, 10000, 0)
-        
-        client = db.get_client()
-        
-        # Buscar respostas recentes
-        respostas_response = client.table('respostas').select('*').order('created_at', desc=True).limit(100).execute()
-        respostas = respostas_response.data or []
-        
-        # Gerar relatório
-        report_data = {
-            'empresa': request.current_user.get('empresa', {}),
-            'periodo': datetime.now().isoformat(),
-            'metricas_gerais': metrics,
-            'total_campanhas': len(campanhas),
-            'total_contatos': len(contatos),
-            'campanhas_ativas': len([c for c in campanhas if c['status'] == 'executando']),
-            'contatos_ativos': len([c for c in contatos if c['status'] == 'ativo']),
-            'respostas_recentes': len(respostas)
-        }
-        
+        relatorio, erro = _solicitar_relatorio(request.args.get('de'), request.args.get('ate'), 'json')
+        if erro:
+            return erro
+
+        if relatorio['status'] != 'concluido':
+            return jsonify({
+                'relatorio': _resumo_relatorio(relatorio)
+            }), 202
+
+        with open(get_gerenciador_relatorios().caminho(relatorio), encoding='utf-8') as arquivo:
+            report_data = json.load(arquivo)
+
         return jsonify({
-            'report': report_data
+            'report': report_data,
+            'relatorio': _resumo_relatorio(relatorio)
         }), 200
-        
+
     except Exception as e:
         logger.error(f"Erro ao gerar relatório: {e}")
         return jsonify({'message': 'Erro interno do servidor'}), 500
 
+@dashboard_bp.route('/export/report/<relatorio_id>', methods=['GET'])
+@token_required
+def get_relatorio(relatorio_id):
+    """Status do relatório"""
+    try:
+        relatorio = get_supabase().get_relatorio(request.current_user['empresa_id'], relatorio_id)
+        if not relatorio:
+            return jsonify({'message': 'Relatório não encontrado'}), 404
+
+        return jsonify({
+            'relatorio': _resumo_relatorio(relatorio)
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar relatório {relatorio_id}: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@dashboard_bp.route('/export/report/<relatorio_id>/download', methods=['GET'])
+@token_required
+def download_relatorio(relatorio_id):
+    """Baixa o artefato do relatório concluído"""
+    try:
+        relatorio = get_supabase().get_relatorio(request.current_user['empresa_id'], relatorio_id)
+        if not relatorio:
+            return jsonify({'message': 'Relatório não encontrado'}), 404
+
+        if relatorio['status'] != 'concluido':
+            return jsonify({
+                'message': 'Relatório ainda não está pronto',
+                'relatorio': _resumo_relatorio(relatorio)
+            }), 409
+
+        caminho = get_gerenciador_relatorios().caminho(relatorio)
+        if not os.path.exists(caminho):
+            return jsonify({'message': 'Artefato do relatório não está mais disponível. Solicite novamente'}), 410
+
+        return send_file(
+            caminho,
+            mimetype=MIMETYPES_RELATORIO[relatorio['formato']],
+            as_attachment=True,
+            download_name=f"relatorio_{relatorio['de']}_{relatorio['ate']}.{relatorio['formato']}"
+        )
+
+    except Exception as e:
+        logger.error(f"Erro ao baixar relatório {relatorio_id}: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
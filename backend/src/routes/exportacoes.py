@@ -0,0 +1,80 @@
+from flask import Blueprint, request, jsonify, Response, send_file
+from src.auth import token_required
+from src.database import get_supabase
+from src.exportacao import (
+    FORMATOS_EXPORTACAO, ExportacaoInvalida, comprimir_gzip, filtro_periodo,
+    gerar_csv, gerar_parquet, gerar_xlsx, resolver_colunas
+)
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+exportacoes_bp = Blueprint('exportacoes', __name__)
+
+# Registros lidos do banco por página
+PAGINA_EXPORTACAO = 5000
+
+@exportacoes_bp.route('/<entidade>', methods=['GET'])
+@token_required
+def exportar(entidade):
+    """Exporta contatos, disparos ou respostas em CSV, Parquet ou XLSX.
+
+    Parâmetros: formato=csv|parquet|xlsx, colunas=a,b,c, de=AAAA-MM-DD, ate=AAAA-MM-DD
+    (filtram created_at) e gzip=1 (apenas CSV).
+    """
+    try:
+        formato = request.args.get('formato', 'csv').lower()
+        if formato not in FORMATOS_EXPORTACAO:
+            return jsonify({'message': f'Formato inválido. Use {", ".join(FORMATOS_EXPORTACAO)}'}), 400
+
+        try:
+            colunas = resolver_colunas(entidade, request.args.get('colunas'))
+            filtro = filtro_periodo(request.args.get('de'), request.args.get('ate'))
+        except ExportacaoInvalida as e:
+            return jsonify({'message': str(e)}), 400
+
+        empresa_id = request.current_user['empresa_id']
+        paginas = get_supabase().iter_registros(entidade, empresa_id, ','.join(colunas), filtro, PAGINA_EXPORTACAO)
+        nome_arquivo = f'{entidade}.{formato}'
+
+        if formato == 'csv':
+            conteudo = gerar_csv(paginas, colunas)
+            if request.args.get('gzip', '').lower() in ('1', 'true'):
+                return Response(
+                    comprimir_gzip(conteudo),
+                    mimetype='application/gzip',
+                    headers={'Content-Disposition': f'attachment; filename={nome_arquivo}.gz'}
+                )
+            return Response(
+                conteudo,
+                mimetype='text/csv',
+                headers={'Content-Disposition': f'attachment; filename={nome_arquivo}'}
+            )
+
+        if formato == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                return jsonify({'message': 'Exportação em Parquet indisponível (pyarrow não instalado)'}), 501
+
+            return Response(
+                gerar_parquet(paginas, entidade, colunas),
+                mimetype='application/vnd.apache.parquet',
+                headers={'Content-Disposition': f'attachment; filename={nome_arquivo}'}
+            )
+
+        # XLSX: write-only em arquivo temporário, enviado em streaming e removido ao final
+        caminho = gerar_xlsx(paginas, entidade, colunas)
+        response = send_file(
+            caminho,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=nome_arquivo
+        )
+        response.call_on_close(lambda: os.remove(caminho))
+        return response
+
+    except Exception as e:
+        logger.error(f"Erro ao exportar {entidade}: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
@@ -0,0 +1,228 @@
+from flask import Blueprint, request, jsonify, current_app
+from src.auth import token_required
+from src.database import get_supabase
+from src.importacao import MODO_PADRAO, ErroImportacao
+from src.importacao_jobs import ConflitoUpload, get_gerenciador_importacoes
+import logging
+
+logger = logging.getLogger(__name__)
+
+importacoes_bp = Blueprint('importacoes', __name__)
+
+# Tamanho de bloco sugerido ao cliente (abaixo de MAX_CONTENT_LENGTH)
+TAMANHO_BLOCO_SUGERIDO = 8 * 1024 * 1024
+
+def _progresso(importacao):
+    """Resumo do job para o cliente"""
+    return {
+        'id': importacao['id'],
+        'nome_arquivo': importacao['nome_arquivo'],
+        'status': importacao['status'],
+        'modo': importacao.get('modo'),
+        'bytes_recebidos': importacao.get('bytes_recebidos', 0),
+        'tamanho_bytes': importacao.get('tamanho_bytes'),
+        'linhas_lidas': importacao.get('linhas_lidas', 0),
+        'importados': importacao.get('importados', 0),
+        'atualizados': importacao.get('atualizados', 0),
+        'duplicados': importacao.get('duplicados', 0),
+        'rejeitados': importacao.get('rejeitados', 0),
+        'falhas': importacao.get('falhas', 0),
+        'ultimo_chunk': importacao.get('ultimo_chunk', -1),
+        'erro': importacao.get('erro'),
+        'created_at': importacao.get('created_at'),
+        'updated_at': importacao.get('updated_at'),
+        'concluida_em': importacao.get('concluida_em')
+    }
+
+@importacoes_bp.route('/', methods=['GET'])
+@token_required
+def get_importacoes():
+    """Lista as importações recentes da empresa"""
+    try:
+        importacoes = get_supabase().get_importacoes(request.current_user['empresa_id'])
+        return jsonify({
+            'importacoes': [_progresso(i) for i in importacoes]
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar importações: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@importacoes_bp.route('/', methods=['POST'])
+@token_required
+def create_importacao():
+    """Cria uma importação para upload em blocos (PUT /<id>/arquivo) e posterior processamento"""
+    try:
+        data = request.get_json()
+
+        if not data or not data.get('nome_arquivo'):
+            return jsonify({'message': 'nome_arquivo é obrigatório'}), 400
+
+        try:
+            importacao = get_gerenciador_importacoes().criar(
+                request.current_user['empresa_id'],
+                request.current_user['id'],
+                data['nome_arquivo'],
+                data.get('tamanho_bytes'),
+                data.get('modo', MODO_PADRAO)
+            )
+        except ErroImportacao as e:
+            return jsonify({'message': str(e)}), 400
+
+        if not importacao:
+            return jsonify({'message': 'Erro ao criar importação'}), 500
+
+        return jsonify({
+            'message': 'Importação criada. Envie o arquivo em blocos',
+            'importacao': _progresso(importacao),
+            'tamanho_bloco': TAMANHO_BLOCO_SUGERIDO
+        }), 201
+
+    except Exception as e:
+        logger.error(f"Erro ao criar importação: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@importacoes_bp.route('/upload', methods=['POST'])
+@token_required
+def upload_importacao():
+    """Recebe o arquivo inteiro num único stream (corpo bruto) e inicia o processamento.
+
+    Uso: POST /api/importacoes/upload?nome_arquivo=clientes.csv&modo=mesclar com o arquivo no corpo.
+    """
+    try:
+        nome_arquivo = request.args.get('nome_arquivo')
+        if not nome_arquivo:
+            return jsonify({'message': 'nome_arquivo é obrigatório'}), 400
+
+        # O corpo vai direto para o spool em disco: o limite é o de importação, não o global
+        request.max_content_length = current_app.config.get('IMPORTACAO_MAX_BYTES')
+
+        gerenciador = get_gerenciador_importacoes()
+        try:
+            importacao = gerenciador.criar(
+                request.current_user['empresa_id'],
+                request.current_user['id'],
+                nome_arquivo,
+                request.content_length,
+                request.args.get('modo', MODO_PADRAO)
+            )
+        except ErroImportacao as e:
+            return jsonify({'message': str(e)}), 400
+
+        if not importacao:
+            return jsonify({'message': 'Erro ao criar importação'}), 500
+
+        gerenciador.anexar_bloco(importacao, 0, request.stream)
+        iniciada = gerenciador.iniciar(importacao)
+        if iniciada is None:
+            return jsonify({'message': 'Importação já foi iniciada'}), 409
+        importacao = iniciada
+
+        return jsonify({
+            'message': 'Importação iniciada',
+            'importacao': _progresso(importacao)
+        }), 202
+
+    except Exception as e:
+        logger.error(f"Erro no upload da importação: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@importacoes_bp.route('/<importacao_id>/arquivo', methods=['PUT'])
+@token_required
+def upload_bloco(importacao_id):
+    """Anexa um bloco do arquivo (corpo bruto) no offset informado em ?offset=N"""
+    try:
+        importacao = get_supabase().get_importacao(request.current_user['empresa_id'], importacao_id)
+        if not importacao:
+            return jsonify({'message': 'Importação não encontrada'}), 404
+
+        try:
+            offset = int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({'message': 'offset inválido'}), 400
+
+        try:
+            recebidos = get_gerenciador_importacoes().anexar_bloco(importacao, offset, request.stream)
+        except ConflitoUpload as e:
+            # Cliente retoma o upload a partir do que já foi gravado
+            return jsonify({'message': str(e), 'bytes_recebidos': e.bytes_recebidos}), 409
+        except ErroImportacao as e:
+            return jsonify({'message': str(e)}), 409
+
+        return jsonify({
+            'bytes_recebidos': recebidos
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Erro ao receber bloco da importação {importacao_id}: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@importacoes_bp.route('/<importacao_id>/processar', methods=['POST'])
+@token_required
+def processar_importacao(importacao_id):
+    """Finaliza o upload em blocos e inicia o processamento"""
+    try:
+        importacao = get_supabase().get_importacao(request.current_user['empresa_id'], importacao_id)
+        if not importacao:
+            return jsonify({'message': 'Importação não encontrada'}), 404
+
+        if importacao['status'] != 'recebendo':
+            return jsonify({'message': 'Importação já foi iniciada'}), 409
+
+        iniciada = get_gerenciador_importacoes().iniciar(importacao)
+        if iniciada is None:
+            return jsonify({'message': 'Importação já foi iniciada'}), 409
+        importacao = iniciada
+
+        return jsonify({
+            'message': 'Importação iniciada',
+            'importacao': _progresso(importacao)
+        }), 202
+
+    except Exception as e:
+        logger.error(f"Erro ao iniciar importação {importacao_id}: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@importacoes_bp.route('/<importacao_id>/retomar', methods=['POST'])
+@token_required
+def retomar_importacao(importacao_id):
+    """Retoma uma importação interrompida a partir do último chunk gravado"""
+    try:
+        importacao = get_supabase().get_importacao(request.current_user['empresa_id'], importacao_id)
+        if not importacao:
+            return jsonify({'message': 'Importação não encontrada'}), 404
+
+        retomada = get_gerenciador_importacoes().retomar(importacao)
+        if retomada is None:
+            return jsonify({
+                'message': 'Importação não pode ser retomada agora',
+                'importacao': _progresso(importacao)
+            }), 409
+
+        importacao = retomada
+
+        return jsonify({
+            'message': 'Importação retomada',
+            'importacao': _progresso(importacao)
+        }), 202
+
+    except Exception as e:
+        logger.error(f"Erro ao retomar importação {importacao_id}: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@importacoes_bp.route('/<importacao_id>', methods=['GET'])
+@token_required
+def get_importacao(importacao_id):
+    """Progresso da importação: linhas lidas, importadas e rejeitadas"""
+    try:
+        importacao = get_supabase().get_importacao(request.current_user['empresa_id'], importacao_id)
+        if not importacao:
+            return jsonify({'message': 'Importação não encontrada'}), 404
+
+        return jsonify({
+            'importacao': _progresso(importacao)
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar importação {importacao_id}: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
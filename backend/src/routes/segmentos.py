@@ -0,0 +1,191 @@
+from flask import Blueprint, request, jsonify
+from src.auth import token_required
+from src.database import get_supabase
+from src.segmentos import validar_segmento, SegmentoInvalido
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+segmentos_bp = Blueprint('segmentos', __name__)
+
+@segmentos_bp.route('/', methods=['GET'])
+@token_required
+def get_segmentos():
+    """Lista segmentos da empresa"""
+    try:
+        db = get_supabase()
+        empresa_id = request.current_user['empresa_id']
+
+        segmentos = db.get_segmentos(empresa_id)
+
+        return jsonify({
+            'segmentos': segmentos
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar segmentos: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@segmentos_bp.route('/', methods=['POST'])
+@token_required
+def create_segmento():
+    """Cria novo segmento e pré-calcula sua contagem"""
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'message': 'Dados não fornecidos'}), 400
+
+        nome = data.get('nome')
+        if not nome:
+            return jsonify({'message': 'Nome é obrigatório'}), 400
+
+        try:
+            definicao = validar_segmento(data.get('definicao', {}))
+        except SegmentoInvalido as e:
+            return jsonify({'message': str(e)}), 400
+
+        db = get_supabase()
+        empresa_id = request.current_user['empresa_id']
+
+        segmento_data = {
+            'empresa_id': empresa_id,
+            'nome': nome,
+            'descricao': data.get('descricao'),
+            'definicao': definicao,
+            'total_contatos': db.count_contatos_segmento(empresa_id, definicao),
+            'contado_em': datetime.utcnow().isoformat()
+        }
+
+        segmento = db.create_segmento(segmento_data)
+
+        if segmento:
+            return jsonify({
+                'message': 'Segmento criado com sucesso',
+                'segmento': segmento
+            }), 201
+        else:
+            return jsonify({'message': 'Erro ao criar segmento'}), 500
+
+    except Exception as e:
+        logger.error(f"Erro ao criar segmento: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@segmentos_bp.route('/<segmento_id>', methods=['PUT'])
+@token_required
+def update_segmento(segmento_id):
+    """Atualiza segmento"""
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'message': 'Dados não fornecidos'}), 400
+
+        db = get_supabase()
+        empresa_id = request.current_user['empresa_id']
+
+        update_data = {k: v for k, v in data.items() if k in ['nome', 'descricao']}
+
+        if 'definicao' in data:
+            try:
+                definicao = validar_segmento(data['definicao'])
+            except SegmentoInvalido as e:
+                return jsonify({'message': str(e)}), 400
+
+            update_data.update({
+                'definicao': definicao,
+                'total_contatos': db.count_contatos_segmento(empresa_id, definicao),
+                'contado_em': datetime.utcnow().isoformat()
+            })
+
+        segmento = db.update_segmento(empresa_id, segmento_id, update_data)
+
+        if segmento:
+            return jsonify({
+                'message': 'Segmento atualizado com sucesso',
+                'segmento': segmento
+            }), 200
+        else:
+            return jsonify({'message': 'Segmento não encontrado'}), 404
+
+    except Exception as e:
+        logger.error(f"Erro ao atualizar segmento: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@segmentos_bp.route('/<segmento_id>', methods=['DELETE'])
+@token_required
+def delete_segmento(segmento_id):
+    """Deleta segmento"""
+    try:
+        db = get_supabase()
+
+        success = db.delete_segmento(request.current_user['empresa_id'], segmento_id)
+
+        if success:
+            return jsonify({'message': 'Segmento deletado com sucesso'}), 200
+        else:
+            return jsonify({'message': 'Segmento não encontrado'}), 404
+
+    except Exception as e:
+        logger.error(f"Erro ao deletar segmento: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@segmentos_bp.route('/<segmento_id>/contagem', methods=['GET'])
+@token_required
+def get_segmento_contagem(segmento_id):
+    """Retorna a contagem do segmento (do cache, ou recalculada se expirada)"""
+    try:
+        db = get_supabase()
+        empresa_id = request.current_user['empresa_id']
+
+        segmento = db.get_segmento(empresa_id, segmento_id)
+        if not segmento:
+            return jsonify({'message': 'Segmento não encontrado'}), 404
+
+        total = db.count_contatos_segmento(empresa_id, segmento['definicao'])
+        if total is None:
+            return jsonify({'message': 'Erro ao contar contatos do segmento'}), 500
+
+        if total != segmento.get('total_contatos'):
+            db.update_segmento(empresa_id, segmento_id, {
+                'total_contatos': total,
+                'contado_em': datetime.utcnow().isoformat()
+            })
+
+        return jsonify({
+            'segmento_id': segmento_id,
+            'total_contatos': total
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Erro ao contar segmento: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
+
+@segmentos_bp.route('/preview', methods=['POST'])
+@token_required
+def preview_segmento():
+    """Conta e amostra os contatos de uma definição sem salvá-la"""
+    try:
+        data = request.get_json() or {}
+
+        try:
+            definicao = validar_segmento(data.get('definicao', {}))
+        except SegmentoInvalido as e:
+            return jsonify({'message': str(e)}), 400
+
+        db = get_supabase()
+        empresa_id = request.current_user['empresa_id']
+
+        total = db.count_contatos_segmento(empresa_id, definicao)
+        amostra = next(db.iter_contatos(empresa_id, definicao, 'id,nome,telefone,email,tags', page_size=10), [])
+
+        return jsonify({
+            'definicao': definicao,
+            'total_contatos': total,
+            'amostra': amostra
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Erro ao pré-visualizar segmento: {e}")
+        return jsonify({'message': 'Erro interno do servidor'}), 500
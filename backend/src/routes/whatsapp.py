@@ -1,9 +1,12 @@
 from flask import Blueprint, request, jsonify
-from src.evolution_api import init_evolution_api
+from src.evolution_api import init_evolution_api, normalizar_telefone
 from src.database import get_supabase
 from src.auth import token_required
+from src.auditoria import registrar_atividade
+from src.webhook import get_ingestao_webhook
 import os
-from datetime import datetime
+import uuid
+from urllib.parse import urlencode, urlparse, parse_qsl, urlunparse
 
 whatsapp_bp = Blueprint('whatsapp', __name__)
 
@@ -14,8 +17,9 @@ INSTANCE_NAME = "cambara"
 
 @whatsapp_bp.route('/status', methods=['GET'])
 @token_required
-def get_whatsapp_status(current_user):
+def get_whatsapp_status():
     """Verifica status da instância WhatsApp"""
+    current_user = request.current_user
     try:
         evolution = init_evolution_api(EVOLUTION_API_URL, EVOLUTION_API_KEY, INSTANCE_NAME)
         status = evolution.get_instance_status()
@@ -30,8 +34,9 @@ def get_whatsapp_status(current_user):
 
 @whatsapp_bp.route('/send-message', methods=['POST'])
 @token_required
-def send_whatsapp_message(current_user):
+def send_whatsapp_message():
     """Envia mensagem individual via WhatsApp"""
+    current_user = request.current_user
     try:
         data = request.get_json()
         number = data.get('number')
@@ -49,12 +54,16 @@ def send_whatsapp_message(current_user):
             "empresa_id": current_user['empresa_id'],
             "canal": "whatsapp",
             "mensagem": message,
+            "telefone": normalizar_telefone(number),
             "status": "enviado" if not result.get('error') else "erro",
             "external_id": result.get('key', {}).get('id') if result.get('key') else None,
             "erro_mensagem": result.get('error') if result.get('error') else None
         }
         
-        supabase.table('disparos').insert(disparo_data).execute()
+        response = supabase.get_client().table('disparos').insert(disparo_data).execute()
+        
+        registrar_atividade('enviar_mensagem', 'disparo', response.data[0]['id'] if response.data else None,
+                            {'telefone': disparo_data['telefone'], 'status': disparo_data['status']})
         
         return jsonify({
             "success": True,
@@ -66,8 +75,9 @@ def send_whatsapp_message(current_user):
 
 @whatsapp_bp.route('/send-bulk', methods=['POST'])
 @token_required
-def send_bulk_whatsapp(current_user):
+def send_bulk_whatsapp():
     """Envia mensagens em massa via WhatsApp"""
+    current_user = request.current_user
     try:
         data = request.get_json()
         contatos_ids = data.get('contatos_ids', [])
@@ -79,7 +89,7 @@ def send_bulk_whatsapp(current_user):
         
         # Buscar contatos no banco
         supabase = get_supabase()
-        contatos_response = supabase.table('contatos').select('*').in_('id', contatos_ids).eq('empresa_id', current_user['empresa_id']).execute()
+        contatos_response = supabase.get_client().table('contatos').select('*').in_('id', contatos_ids).eq('empresa_id', current_user['empresa_id']).execute()
         contatos = contatos_response.data
         
         if not contatos:
@@ -98,6 +108,7 @@ def send_bulk_whatsapp(current_user):
                 "contato_id": result['contato_id'],
                 "canal": "whatsapp",
                 "mensagem": template_mensagem.replace("{{nome}}", result['nome']),
+                "telefone": normalizar_telefone(result.get('telefone')),
                 "status": result['status'],
                 "external_id": result.get('response', {}).get('key', {}).get('id') if result.get('response', {}).get('key') else None,
                 "erro_mensagem": result.get('error') if result.get('error') else None
@@ -105,60 +116,62 @@ def send_bulk_whatsapp(current_user):
             disparos_data.append(disparo)
         
         if disparos_data:
-            supabase.table('disparos').insert(disparos_data).execute()
+            response = supabase.get_client().table('disparos').insert(disparos_data).execute()
+        
+        total_enviados = len([r for r in results if r['status'] == 'enviado'])
+        total_erros = len([r for r in results if r['status'] == 'erro'])
+        registrar_atividade('enviar_em_massa', 'disparo', detalhes={
+            'campanha_id': campanha_id,
+            'total_enviados': total_enviados,
+            'total_erros': total_erros
+        })
         
         return jsonify({
             "success": True,
-            "total_enviados": len([r for r in results if r['status'] == 'enviado']),
-            "total_erros": len([r for r in results if r['status'] == 'erro']),
+            "total_enviados": total_enviados,
+            "total_erros": total_erros,
             "results": results
         })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 @whatsapp_bp.route('/webhook', methods=['POST'])
-def whatsapp_webhook():
-    """Recebe webhooks da Evolution API"""
+@whatsapp_bp.route('/webhook/<evento>', methods=['POST'])
+def whatsapp_webhook(evento=None):
+    """Recebe webhooks da Evolution API e enfileira para persistência em lote"""
     try:
-        data = request.get_json()
-        
-        evolution = init_evolution_api(EVOLUTION_API_URL, EVOLUTION_API_KEY, INSTANCE_NAME)
-        processed = evolution.process_webhook_message(data)
-        
-        if processed.get('tipo') == 'mensagem_recebida':
-            # Salvar resposta no banco
-            supabase = get_supabase()
-            
-            # Buscar disparo relacionado pelo número
-            numero = processed['de']
-            disparo_response = supabase.table('disparos').select('*').eq('canal', 'whatsapp').like('mensagem', f'%{numero}%').order('created_at', desc=True).limit(1).execute()
-            
-            resposta_data = {
-                "canal": "whatsapp",
-                "conteudo": processed['mensagem'],
-                "tipo_resposta": "texto",
-                "created_at": datetime.now().isoformat()
-            }
-            
-            if disparo_response.data:
-                disparo = disparo_response.data[0]
-                resposta_data.update({
-                    "empresa_id": disparo['empresa_id'],
-                    "disparo_id": disparo['id'],
-                    "contato_id": disparo['contato_id'],
-                    "campanha_id": disparo['campanha_id']
-                })
-            
-            supabase.table('respostas').insert(resposta_data).execute()
-        
-        return jsonify({"success": True, "processed": processed})
+        data = request.get_json(silent=True)
+        
+        ingestao = get_ingestao_webhook()
+        erro = ingestao.validar(data)
+        if erro:
+            return jsonify({"success": False, "error": erro}), 400
+        
+        # Empresa dona da instância, incluída na URL por /setup-webhook
+        empresa_id = request.args.get('empresa_id')
+        if empresa_id:
+            try:
+                empresa_id = str(uuid.UUID(empresa_id))
+            except ValueError:
+                return jsonify({"success": False, "error": "empresa_id inválido"}), 400
+        
+        resultado = ingestao.enfileirar(data, empresa_id)
+        
+        if resultado == 'fila_cheia':
+            # Fila cheia: a Evolution API reenvia o evento mais tarde
+            response = jsonify({"success": False, "error": "Fila de webhooks cheia"})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        
+        return jsonify({"success": True, "resultado": resultado})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 @whatsapp_bp.route('/contacts', methods=['GET'])
 @token_required
-def get_whatsapp_contacts(current_user):
+def get_whatsapp_contacts():
     """Busca contatos da instância WhatsApp"""
+    current_user = request.current_user
     try:
         evolution = init_evolution_api(EVOLUTION_API_URL, EVOLUTION_API_KEY, INSTANCE_NAME)
         contacts = evolution.get_contacts()
@@ -172,14 +185,22 @@ def get_whatsapp_contacts(current_user):
 
 @whatsapp_bp.route('/setup-webhook', methods=['POST'])
 @token_required
-def setup_webhook(current_user):
+def setup_webhook():
     """Configura webhook da Evolution API"""
+    current_user = request.current_user
     try:
         data = request.get_json()
         webhook_url = data.get('webhook_url', f'http://31.97.95.124:5000/api/whatsapp/webhook')
         
+        # A empresa vai na URL para que as respostas sejam atribuídas só aos disparos dela
+        partes = urlparse(webhook_url)
+        parametros = dict(parse_qsl(partes.query))
+        parametros['empresa_id'] = current_user['empresa_id']
+        webhook_url = urlunparse(partes._replace(query=urlencode(parametros)))
+        
         evolution = init_evolution_api(EVOLUTION_API_URL, EVOLUTION_API_KEY, INSTANCE_NAME)
         result = evolution.create_webhook(webhook_url)
+        registrar_atividade('configurar_webhook', 'whatsapp', detalhes={'webhook_url': webhook_url})
         
         return jsonify({
             "success": True,
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+# Linguagem de definição de segmentos de público.
+#
+# Exemplo:
+# {
+#     "status": "ativo",
+#     "tags": {"any": ["vip", "telhado"], "all": ["2024"], "none": ["bloqueado"]},
+#     "campos": [
+#         {"campo": "cidade", "op": "eq", "valor": "Curitiba"},
+#         {"campo": "total_compras", "op": "gte", "valor": 3}
+#     ],
+#     "criado_de": "2024-01-01",
+#     "criado_ate": "2024-06-30",
+#     "respondeu_em_dias": 30,
+#     "sem_resposta_em_dias": 90
+# }
+#
+# Todos os critérios são combinados com AND e compilados para filtros do
+# PostgREST que usam os índices criados em migrations/001_segmentos.sql.
+
+OPERADORES_CAMPOS = {'eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'in', 'ilike'}
+OPERADORES_NUMERICOS = {'gt', 'gte', 'lt', 'lte'}
+CHAVES_VALIDAS = {
+    'status', 'tags', 'campos', 'criado_de', 'criado_ate',
+    'respondeu_em_dias', 'sem_resposta_em_dias'
+}
+
+_NOME_CAMPO_RE = re.compile(r'^[A-Za-z0-9_]+$')
+
+
+class SegmentoInvalido(ValueError):
+    """Definição de segmento com erro de sintaxe ou de valor"""
+
+
+def _validar_lista_tags(valor: Any, chave: str) -> list:
+    if not isinstance(valor, list) or not all(isinstance(t, str) and t for t in valor):
+        raise SegmentoInvalido(f'tags.{chave} deve ser uma lista de textos')
+    return valor
+
+
+def _validar_data(valor: Any, chave: str) -> str:
+    try:
+        return datetime.fromisoformat(str(valor).replace('Z', '+00:00')).isoformat()
+    except ValueError:
+        raise SegmentoInvalido(f'{chave} deve ser uma data ISO 8601')
+
+
+def _validar_dias(valor: Any, chave: str) -> int:
+    if isinstance(valor, bool) or not isinstance(valor, int) or valor <= 0:
+        raise SegmentoInvalido(f'{chave} deve ser um número inteiro positivo')
+    return valor
+
+
+def validar_segmento(definicao: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Valida e normaliza uma definição de segmento"""
+    if definicao is None:
+        return {}
+
+    if not isinstance(definicao, dict):
+        raise SegmentoInvalido('Segmento deve ser um objeto JSON')
+
+    desconhecidas = set(definicao) - CHAVES_VALIDAS
+    if desconhecidas:
+        raise SegmentoInvalido(f'Critérios desconhecidos: {", ".join(sorted(desconhecidas))}')
+
+    normalizado: Dict[str, Any] = {}
+
+    if definicao.get('status'):
+        normalizado['status'] = str(definicao['status'])
+
+    tags = definicao.get('tags')
+    if tags:
+        if not isinstance(tags, dict) or set(tags) - {'any', 'all', 'none'}:
+            raise SegmentoInvalido('tags deve conter apenas as chaves any, all e none')
+        normalizado['tags'] = {
+            chave: sorted(set(_validar_lista_tags(valor, chave)))
+            for chave, valor in tags.items() if valor
+        }
+
+    campos = definicao.get('campos')
+    if campos:
+        if not isinstance(campos, list):
+            raise SegmentoInvalido('campos deve ser uma lista de comparações')
+
+        normalizado['campos'] = []
+        for comparacao in campos:
+            if not isinstance(comparacao, dict):
+                raise SegmentoInvalido('Cada comparação deve ser um objeto')
+
+            campo = comparacao.get('campo')
+            op = comparacao.get('op', 'eq')
+            valor = comparacao.get('valor')
+
+            if not isinstance(campo, str) or not _NOME_CAMPO_RE.match(campo):
+                raise SegmentoInvalido(f'Nome de campo inválido: {campo}')
+            if op not in OPERADORES_CAMPOS:
+                raise SegmentoInvalido(f'Operador deve ser um dos: {", ".join(sorted(OPERADORES_CAMPOS))}')
+            if op == 'in' and not isinstance(valor, list):
+                raise SegmentoInvalido(f'Operador in exige uma lista de valores ({campo})')
+            if op in OPERADORES_NUMERICOS and (isinstance(valor, bool) or not isinstance(valor, (int, float))):
+                raise SegmentoInvalido(f'Operador {op} exige valor numérico ({campo})')
+
+            normalizado['campos'].append({'campo': campo, 'op': op, 'valor': valor})
+
+    for chave in ('criado_de', 'criado_ate'):
+        if definicao.get(chave):
+            normalizado[chave] = _validar_data(definicao[chave], chave)
+
+    for chave in ('respondeu_em_dias', 'sem_resposta_em_dias'):
+        if definicao.get(chave) is not None:
+            normalizado[chave] = _validar_dias(definicao[chave], chave)
+
+    return normalizado
+
+
+def chave_segmento(definicao: Dict[str, Any]) -> str:
+    """Gera hash estável de uma definição normalizada (usado como chave de cache)"""
+    serializado = json.dumps(definicao, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(serializado.encode('utf-8')).hexdigest()
+
+
+def aplicar_segmento(query, definicao: Dict[str, Any]):
+    """Aplica os critérios de uma definição normalizada a uma query de contatos"""
+    if definicao.get('status'):
+        query = query.eq('status', definicao['status'])
+
+    tags = definicao.get('tags', {})
+    if tags.get('any'):
+        query = query.overlaps('tags', tags['any'])
+    if tags.get('all'):
+        query = query.contains('tags', tags['all'])
+    if tags.get('none'):
+        query = query.not_.overlaps('tags', tags['none'])
+
+    for comparacao in definicao.get('campos', []):
+        op = comparacao['op']
+        valor = comparacao['valor']
+
+        # ->> compara como texto; -> compara como jsonb (ordenação numérica)
+        if op in OPERADORES_NUMERICOS:
+            coluna = f"campos_customizados->{comparacao['campo']}"
+        else:
+            coluna = f"campos_customizados->>{comparacao['campo']}"
+
+        if op == 'eq':
+            # @> usa o índice GIN de campos_customizados
+            query = query.contains('campos_customizados', {comparacao['campo']: valor})
+        elif op == 'in':
+            query = query.in_(coluna, [str(v) for v in valor])
+        elif op == 'ilike':
+            query = query.ilike(coluna, f'%{valor}%')
+        else:
+            query = getattr(query, op)(coluna, valor if op in OPERADORES_NUMERICOS else str(valor))
+
+    if definicao.get('criado_de'):
+        query = query.gte('created_at', definicao['criado_de'])
+    if definicao.get('criado_ate'):
+        query = query.lte('created_at', definicao['criado_ate'])
+
+    agora = datetime.utcnow()
+    if definicao.get('respondeu_em_dias'):
+        limite = (agora - timedelta(days=definicao['respondeu_em_dias'])).isoformat()
+        query = query.gte('ultima_resposta_em', limite)
+    if definicao.get('sem_resposta_em_dias'):
+        limite = (agora - timedelta(days=definicao['sem_resposta_em_dias'])).isoformat()
+        query = query.or_(f'ultima_resposta_em.is.null,ultima_resposta_em.lt.{limite}')
+
+    return query
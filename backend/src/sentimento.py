@@ -0,0 +1,247 @@
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from src.database import get_supabase
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Léxico de sentimento em português (sem acentos, minúsculo), com termos do
+# pós-venda de madeireira. Pesos entre -3 e 3.
+LEXICO = {
+    # Positivos
+    'bom': 1.5, 'boa': 1.5, 'otimo': 2.5, 'otima': 2.5, 'excelente': 3.0, 'perfeito': 3.0,
+    'perfeita': 3.0, 'maravilhoso': 3.0, 'maravilhosa': 3.0, 'gostei': 2.0, 'adorei': 3.0,
+    'amei': 3.0, 'satisfeito': 2.0, 'satisfeita': 2.0, 'recomendo': 2.5, 'recomendaria': 2.5,
+    'rapido': 1.5, 'rapida': 1.5, 'agil': 1.5, 'pontual': 1.5, 'obrigado': 1.0, 'obrigada': 1.0,
+    'parabens': 2.5, 'top': 2.0, 'legal': 1.5, 'show': 2.0, 'atencioso': 2.0, 'atenciosa': 2.0,
+    'educado': 1.5, 'educada': 1.5, 'qualidade': 1.0, 'resistente': 1.5, 'bonito': 1.5,
+    'bonita': 1.5, 'caprichado': 2.0, 'tranquilo': 1.0, 'sucesso': 2.0, 'feliz': 2.0,
+    'certinho': 1.5, 'beleza': 1.0, 'aprovado': 2.0, 'voltarei': 2.0, 'melhor': 2.0,
+    'sim': 0.5, 'ok': 0.5,
+    # Negativos
+    'ruim': -2.0, 'pessimo': -3.0, 'pessima': -3.0, 'horrivel': -3.0, 'terrivel': -3.0,
+    'demorou': -1.5, 'demora': -1.5, 'demorado': -1.5, 'atraso': -2.0, 'atrasou': -2.0,
+    'atrasado': -2.0, 'atrasada': -2.0, 'defeito': -2.5, 'defeituoso': -2.5, 'problema': -1.5,
+    'problemas': -1.5, 'reclamacao': -2.0, 'reclamar': -1.5, 'insatisfeito': -2.5,
+    'insatisfeita': -2.5, 'caro': -1.0, 'cara': -0.5, 'errado': -2.0, 'errada': -2.0,
+    'quebrado': -2.5, 'quebrada': -2.5, 'quebrou': -2.5, 'empenada': -2.5, 'empenado': -2.5,
+    'empenou': -2.5, 'rachada': -2.5, 'rachado': -2.5, 'rachou': -2.5, 'cupim': -3.0,
+    'umida': -1.5, 'umido': -1.5, 'podre': -3.0, 'lixo': -3.0, 'descaso': -3.0,
+    'grosso': -1.5, 'grosseiro': -2.5, 'mal': -1.5, 'pior': -2.5, 'decepcionado': -2.5,
+    'decepcionada': -2.5, 'decepcao': -2.5, 'faltou': -1.5, 'faltando': -1.5, 'nunca': -1.0,
+    'absurdo': -2.5, 'vergonha': -2.5, 'cancelar': -2.0, 'devolver': -2.0, 'devolucao': -2.0,
+    'procon': -3.0,
+    # Emojis
+    '👍': 2.0, '👏': 2.0, '😊': 2.0, '😀': 2.0, '😁': 2.0, '😍': 3.0, '❤': 2.5, '🙏': 1.0,
+    '👎': -2.0, '😡': -3.0, '😠': -2.5, '😞': -2.0, '😢': -2.0
+}
+
+NEGADORES = {'nao', 'nem', 'jamais', 'sem', 'nenhum', 'nenhuma'}
+INTENSIFICADORES = {'muito': 1.5, 'muita': 1.5, 'super': 1.5, 'bastante': 1.3, 'extremamente': 2.0, 'bem': 1.2, 'mega': 1.5}
+
+# Quantos tokens após um negador têm a polaridade invertida
+JANELA_NEGACAO = 3
+LIMIAR_NEUTRO = 0.05
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[\U0001F300-\U0001FAFF❤]")
+
+
+def _normalizar(texto: str) -> str:
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+class ClassificadorSentimento:
+    """Classificador léxico com negação e intensificadores, vetorizado por lote com NumPy"""
+
+    def __init__(self, lexico: Dict[str, float] = None):
+        lexico = lexico or LEXICO
+        vocabulario = list(lexico) + list(NEGADORES) + list(INTENSIFICADORES)
+        # id 0 é reservado para tokens fora do vocabulário
+        self._ids = {token: i + 1 for i, token in enumerate(vocabulario)}
+        tamanho = len(vocabulario) + 1
+
+        self._pesos = np.zeros(tamanho)
+        self._negador = np.zeros(tamanho, dtype=bool)
+        self._intensidade = np.ones(tamanho)
+        for token, peso in lexico.items():
+            self._pesos[self._ids[token]] = peso
+        for token in NEGADORES:
+            self._negador[self._ids[token]] = True
+        for token, fator in INTENSIFICADORES.items():
+            self._intensidade[self._ids[token]] = fator
+
+    def _tokenizar(self, textos: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        ids = []
+        documentos = []
+        for i, texto in enumerate(textos):
+            tokens = _TOKEN_RE.findall(_normalizar(texto or ''))
+            ids.extend(self._ids.get(t, 0) for t in tokens)
+            documentos.extend([i] * len(tokens))
+        return np.asarray(ids, dtype=np.int64), np.asarray(documentos, dtype=np.int64)
+
+    def pontuar(self, textos: List[str]) -> np.ndarray:
+        """Retorna um score em [-1, 1] para cada texto"""
+        n = len(textos)
+        if n == 0:
+            return np.zeros(0)
+
+        ids, documentos = self._tokenizar(textos)
+        if ids.size == 0:
+            return np.zeros(n)
+
+        posicoes = np.arange(ids.size)
+        pesos = self._pesos[ids]
+
+        # Início de cada documento, para que negação/intensificador não cruzem textos
+        inicio_doc = np.zeros(ids.size, dtype=np.int64)
+        mudou = np.flatnonzero(np.diff(documentos)) + 1
+        inicio_doc[mudou] = mudou
+        inicio_doc = np.maximum.accumulate(inicio_doc)
+
+        # Posição do último negador até cada token (inclusive)
+        ultimo_negador = np.maximum.accumulate(np.where(self._negador[ids], posicoes, -1))
+        distancia = posicoes - ultimo_negador
+        negado = (ultimo_negador >= inicio_doc) & (distancia > 0) & (distancia <= JANELA_NEGACAO)
+        pesos = np.where(negado, -pesos, pesos)
+
+        # Intensificador imediatamente anterior, no mesmo documento
+        anterior = np.ones(ids.size)
+        anterior[1:] = self._intensidade[ids[:-1]]
+        anterior[posicoes == inicio_doc] = 1.0
+        pesos = pesos * anterior
+
+        brutos = np.bincount(documentos, weights=pesos, minlength=n)
+        # Normalização suave para [-1, 1]
+        return brutos / np.sqrt(brutos * brutos + 15.0)
+
+    def classificar(self, textos: List[str]) -> Tuple[List[str], np.ndarray]:
+        """Retorna (rótulos, scores) para os textos"""
+        scores = self.pontuar(textos)
+        rotulos = np.where(scores > LIMIAR_NEUTRO, 'positivo', np.where(scores < -LIMIAR_NEUTRO, 'negativo', 'neutro'))
+        return rotulos.tolist(), scores
+
+
+class ProcessadorSentimentos:
+    """Classifica respostas novas em micro-lotes, guiado por uma marca d'água em created_at"""
+
+    NOME_WATERMARK = 'sentimento_respostas'
+
+    def __init__(self, tamanho_lote: int = 2000, intervalo: float = 5.0, atraso: float = 120.0):
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.atraso = atraso
+        self.classificador = ClassificadorSentimento()
+        self._thread = None
+        self._parar = threading.Event()
+        self.classificadas = 0
+        self.ciclos = 0
+        self.ultimo_ciclo_s = 0.0
+
+    def executar_ciclo(self) -> int:
+        """Processa um lote de respostas sem sentimento; retorna quantas foram classificadas"""
+        db = get_supabase()
+        inicio = time.monotonic()
+
+        # Lotes de outros workers podem ser gravados com created_at anterior à
+        # marca (transações ainda abertas): a busca relê uma janela de atraso
+        # atrás dela, e o filtro sentimento IS NULL descarta o já classificado
+        watermark = db.get_watermark(self.NOME_WATERMARK)
+        desde = None
+        if watermark:
+            desde = (datetime.fromisoformat(watermark) - timedelta(seconds=self.atraso)).isoformat()
+        respostas = db.get_respostas_sem_sentimento(desde, self.tamanho_lote)
+        if not respostas:
+            return 0
+
+        rotulos, scores = self.classificador.classificar([r.get('conteudo') for r in respostas])
+        payload = [
+            {'id': r['id'], 'sentimento': rotulo, 'score_sentimento': round(float(score), 4)}
+            for r, rotulo, score in zip(respostas, rotulos, scores)
+        ]
+
+        if not db.bulk_update_sentimentos(payload):
+            raise RuntimeError('Falha ao gravar sentimentos')
+
+        # Respostas vêm ordenadas por created_at: a última define a nova marca,
+        # que nunca recua (a janela de atraso pode trazer só respostas antigas)
+        ultima = respostas[-1]['created_at']
+        if not watermark or datetime.fromisoformat(ultima) > datetime.fromisoformat(watermark):
+            db.set_watermark(self.NOME_WATERMARK, ultima)
+
+        self.classificadas += len(payload)
+        self.ciclos += 1
+        self.ultimo_ciclo_s = time.monotonic() - inicio
+        return len(payload)
+
+    def _executar(self) -> None:
+        while not self._parar.is_set():
+            try:
+                processadas = self.executar_ciclo()
+            except Exception as e:
+                logger.error(f"Erro ao classificar sentimentos: {e}")
+                processadas = 0
+
+            # Lote cheio indica acúmulo: seguir sem esperar
+            if processadas < self.tamanho_lote:
+                self._parar.wait(self.intervalo)
+
+    def iniciar(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._executar, name='sentimentos', daemon=True)
+            self._thread.start()
+
+    def parar(self) -> None:
+        self._parar.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'ativo': self._thread is not None and self._thread.is_alive(),
+            'classificadas': self.classificadas,
+            'ciclos': self.ciclos,
+            'ultimo_ciclo_s': round(self.ultimo_ciclo_s, 3)
+        }
+
+
+# Instância global do processador de sentimentos
+processador_sentimentos = None
+
+def init_sentimentos(config) -> ProcessadorSentimentos:
+    """Inicializa o processador de sentimentos (e a thread, se habilitada)"""
+    global processador_sentimentos
+    processador_sentimentos = ProcessadorSentimentos(
+        tamanho_lote=config.get('SENTIMENTO_LOTE', 2000),
+        intervalo=config.get('SENTIMENTO_INTERVALO', 5.0),
+        atraso=config.get('SENTIMENTO_ATRASO', 120.0)
+    )
+    if config.get('SENTIMENTO_AUTOMATICO', True):
+        processador_sentimentos.iniciar()
+    return processador_sentimentos
+
+def get_processador_sentimentos() -> ProcessadorSentimentos:
+    """Retorna a instância do processador de sentimentos"""
+    if processador_sentimentos is None:
+        raise RuntimeError("Processador de sentimentos não foi inicializado. Chame init_sentimentos() primeiro.")
+    return processador_sentimentos
+
+
+if __name__ == '__main__':
+    # Execução avulsa: python -m src.sentimento (processa o acumulado e sai)
+    import os
+    from src.database import init_supabase
+
+    init_supabase(os.environ.get('SUPABASE_URL'), os.environ.get('SUPABASE_KEY'))
+    processador = ProcessadorSentimentos()
+    total = 0
+    while True:
+        processadas = processador.executar_ciclo()
+        total += processadas
+        if processadas < processador.tamanho_lote:
+            break
+    print(f"{total} respostas classificadas")
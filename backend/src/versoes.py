@@ -0,0 +1,87 @@
+import hashlib
+from datetime import datetime, time as hora, timezone
+from functools import wraps
+from typing import Any, Dict, Optional
+from flask import request, make_response, Response
+from src.database import get_supabase
+from src.metricas import FUSO_METRICAS, hoje
+import logging
+
+logger = logging.getLogger(__name__)
+
+# GET condicional (ETag / If-None-Match e Last-Modified / If-Modified-Since)
+# para endpoints de leitura. A versão de cada tabela por empresa é mantida em
+# versoes_empresa por triggers (migração 012); se as versões das tabelas de que
+# o endpoint depende não mudaram, a resposta é 304 sem executar as consultas.
+
+CACHE_CONTROL = 'private, no-cache'
+
+
+def _data(valor: Any) -> Optional[datetime]:
+    if not valor:
+        return None
+    return datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+
+
+def _validadores(empresa_id: str, escopos: tuple, versoes: Dict[str, Dict[str, Any]], diario: bool):
+    """ETag (fraco) e Last-Modified da representação atual"""
+    partes = [empresa_id, request.full_path]
+    partes += [f"{escopo}:{versoes.get(escopo, {}).get('versao', 0)}" for escopo in escopos]
+
+    alteracoes = [_data(versoes[escopo].get('updated_at')) for escopo in escopos if escopo in versoes]
+    if diario:
+        # Séries "últimos N dias" mudam à meia-noite mesmo sem escritas
+        dia = hoje()
+        partes.append(dia.isoformat())
+        alteracoes.append(datetime.combine(dia, hora.min, FUSO_METRICAS))
+
+    etag = hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest()
+    alteracoes = [a for a in alteracoes if a is not None]
+    ultima = max(alteracoes).astimezone(timezone.utc).replace(microsecond=0) if alteracoes else None
+    return etag, ultima
+
+
+def _nao_modificado(etag: str, ultima: Optional[datetime]) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if ultima is not None and request.if_modified_since is not None:
+        return ultima <= request.if_modified_since
+    return False
+
+
+def _aplicar_validadores(response: Response, etag: str, ultima: Optional[datetime]) -> Response:
+    response.set_etag(etag, weak=True)
+    if ultima is not None:
+        response.last_modified = ultima
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    response.vary.add('Authorization')
+    return response
+
+
+def condicional(*escopos: str, diario: bool = False):
+    """Decorator de GET condicional; usar abaixo de @token_required.
+
+    escopos: tabelas de que a resposta depende (contatos, campanhas, disparos,
+    respostas, logs_sistema). diario=True para respostas que dependem da data
+    atual (séries dos últimos N dias).
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            empresa_id = request.current_user['empresa_id']
+            versoes = get_supabase().get_versoes_empresa(empresa_id, list(escopos))
+            if versoes is None:
+                # Sem versões não há como validar: resposta completa, sem cache
+                return f(*args, **kwargs)
+
+            etag, ultima = _validadores(empresa_id, escopos, versoes, diario)
+            if _nao_modificado(etag, ultima):
+                return _aplicar_validadores(Response(status=304), etag, ultima)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                _aplicar_validadores(response, etag, ultima)
+            return response
+
+        return decorated
+    return decorator
@@ -0,0 +1,249 @@
+from typing import Any, Dict, List, Optional
+from src.batch import ProcessadorLote
+from src.cache import JanelaDeduplicacao, TTLCache
+from src.database import get_supabase
+from src.evolution_api import init_evolution_api
+from src.indice_disparos import get_indice_disparos
+from src.nps import extrair_nota, incrementos_nps
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Status que cada atualização pode substituir: o disparo só avança (pendente -> enviado -> entregue -> lido)
+ORDEM_STATUS = {'erro': 0, 'enviado': 1, 'entregue': 2, 'lido': 3}
+STATUS_ANTERIORES = {
+    'erro': ['pendente', 'enviado'],
+    'enviado': ['pendente'],
+    'entregue': ['pendente', 'enviado'],
+    'lido': ['pendente', 'enviado', 'entregue']
+}
+
+
+class AtualizadorStatus:
+    """Agrupa atualizações de status (MESSAGES_UPDATE) numa janela e aplica em UPDATEs em lote"""
+
+    def __init__(self, max_lote: int = 5000, intervalo: float = 2.0, maxsize: int = 50000):
+        self.coalescidas = 0
+        self.processador = ProcessadorLote(
+            'status_disparos',
+            self._aplicar,
+            max_lote=max_lote,
+            intervalo=intervalo,
+            maxsize=maxsize
+        )
+
+    def enviar(self, id_mensagem: str, status: str) -> bool:
+        return self.processador.enviar((id_mensagem, status))
+
+    @staticmethod
+    def coalescer(atualizacoes: List[tuple]) -> Dict[str, str]:
+        """Mantém apenas o status mais avançado de cada mensagem"""
+        finais: Dict[str, str] = {}
+        for id_mensagem, status in atualizacoes:
+            atual = finais.get(id_mensagem)
+            if atual is None or ORDEM_STATUS[status] > ORDEM_STATUS[atual]:
+                finais[id_mensagem] = status
+        return finais
+
+    def _aplicar(self, atualizacoes: List[tuple]) -> None:
+        finais = self.coalescer(atualizacoes)
+        self.coalescidas += len(atualizacoes) - len(finais)
+
+        por_status: Dict[str, List[str]] = {}
+        for id_mensagem, status in finais.items():
+            por_status.setdefault(status, []).append(id_mensagem)
+
+        db = get_supabase()
+        for status, ids in por_status.items():
+            db.update_disparos_status(ids, status, STATUS_ANTERIORES[status])
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.processador.stats(), 'coalescidas': self.coalescidas}
+
+
+class IngestaoWebhook:
+    """Recebe eventos da Evolution API, responde de imediato e persiste em micro-lotes"""
+
+    def __init__(self, evolution, atualizador_status: AtualizadorStatus, deduplicacao: JanelaDeduplicacao,
+                 max_lote: int = 200, intervalo: float = 0.5, maxsize: int = 10000, tentativas: int = 5):
+        self.evolution = evolution
+        self.atualizador_status = atualizador_status
+        self.deduplicacao = deduplicacao
+        self.tipos_campanha = TTLCache(maxsize=10000, ttl=600)
+        self.processador = ProcessadorLote(
+            'webhook',
+            self._processar_lote,
+            max_lote=max_lote,
+            intervalo=intervalo,
+            maxsize=maxsize,
+            tentativas=tentativas,
+            ao_falhar=self._liberar_lote
+        )
+
+    @staticmethod
+    def validar(data: Any) -> Optional[str]:
+        """Valida a estrutura mínima do evento; retorna a mensagem de erro ou None"""
+        if not isinstance(data, dict):
+            return 'Payload deve ser um objeto JSON'
+        if not isinstance(data.get('event'), str) or not data['event']:
+            return 'Campo event é obrigatório'
+        if not isinstance(data.get('data', {}), (dict, list)):
+            return 'Campo data inválido'
+        return None
+
+    def enfileirar(self, data: Dict[str, Any], empresa_id: Optional[str] = None) -> str:
+        """Interpreta o evento e o enfileira para persistência.
+
+        `empresa_id` (da URL configurada em /setup-webhook) restringe a
+        atribuição das respostas aos disparos da empresa. Retorna 'enfileirado', 'ignorado', 'duplicado' ou 'fila_cheia'.
+        Mensagens repetidas (mesmo id_mensagem) são descartadas aqui, sem acesso ao banco.
+        """
+        processed = self.evolution.process_webhook_message(data)
+
+        if processed.get('tipo') not in ('mensagem_recebida', 'status_atualizado'):
+            return 'ignorado'
+
+        id_mensagem = processed.get('id_mensagem')
+        if id_mensagem and not self.deduplicacao.registrar(id_mensagem):
+            return 'duplicado'
+
+        enfileirado = self.processador.enviar({'processed': processed, 'empresa_id': empresa_id})
+
+        if not enfileirado:
+            # A Evolution API vai reenviar: não pode ser tratado como duplicado
+            if id_mensagem:
+                self.deduplicacao.remover(id_mensagem)
+            return 'fila_cheia'
+
+        return 'enfileirado'
+
+    def _processar_lote(self, eventos: List[Dict[str, Any]]) -> None:
+        db = get_supabase()
+        indice = get_indice_disparos()
+        respostas = []
+
+        # Último disparo aberto de cada número que respondeu: uma consulta por
+        # empresa do lote (normalmente uma só), em vez de uma por mensagem
+        telefones_por_empresa: Dict[Optional[str], set] = {}
+        for evento in eventos:
+            if evento['processed'].get('tipo') == 'mensagem_recebida':
+                telefones_por_empresa.setdefault(evento.get('empresa_id'), set()).add(evento['processed']['de'])
+        disparos = {
+            (empresa_id, telefone): disparo
+            for empresa_id, telefones in telefones_por_empresa.items()
+            for telefone, disparo in indice.buscar_por_telefones(telefones, empresa_id).items()
+        }
+
+        for evento in eventos:
+            processed = evento['processed']
+
+            if processed.get('tipo') == 'status_atualizado':
+                for atualizacao in processed['atualizacoes']:
+                    if not self.atualizador_status.enviar(atualizacao['id_mensagem'], atualizacao['status']):
+                        logger.warning(f"Fila de status cheia, atualização descartada: {atualizacao['id_mensagem']}")
+                continue
+
+            # Todas as linhas do lote precisam das mesmas chaves para o insert em massa.
+            # created_at fica com o default do banco (hora do insert, em UTC): é a
+            # referência da marca d'água de sentimentos e das métricas diárias
+            resposta_data = {
+                "canal": "whatsapp",
+                "conteudo": processed['mensagem'],
+                "tipo_resposta": "texto",
+                "id_mensagem": processed.get('id_mensagem'),
+                "empresa_id": None,
+                "disparo_id": None,
+                "contato_id": None,
+                "campanha_id": None,
+                "nota": None
+            }
+
+            disparo = disparos.get((evento.get('empresa_id'), processed['de']))
+            if disparo:
+                resposta_data.update({
+                    "empresa_id": disparo['empresa_id'],
+                    "disparo_id": disparo['id'],
+                    "contato_id": disparo['contato_id'],
+                    "campanha_id": disparo['campanha_id']
+                })
+
+            # Nota de 0 a 10 em respostas a campanhas de pesquisa
+            if self._tipo_campanha(resposta_data['campanha_id']) == 'pesquisa':
+                resposta_data['nota'] = extrair_nota(processed['mensagem'])
+
+            respostas.append(resposta_data)
+
+        if not respostas:
+            return
+
+        inseridas = db.bulk_create_respostas(respostas)
+        if inseridas is None:
+            raise RuntimeError(f'Falha ao inserir {len(respostas)} respostas')
+
+        # Agregados de NPS só contam respostas efetivamente inseridas (sem duplicadas)
+        incrementos = incrementos_nps(inseridas)
+        if incrementos:
+            db.incrementar_nps(incrementos)
+
+    def _liberar_lote(self, eventos: List[Dict[str, Any]]) -> None:
+        """Lote perdido após todas as tentativas: tira os ids da deduplicação para
+        que o reenvio da Evolution API seja aceito em vez de tratado como duplicado"""
+        for evento in eventos:
+            id_mensagem = evento['processed'].get('id_mensagem')
+            if id_mensagem:
+                self.deduplicacao.remover(id_mensagem)
+
+    def _tipo_campanha(self, campanha_id: Optional[str]) -> Optional[str]:
+        if not campanha_id:
+            return None
+
+        def carregar():
+            campanha = get_supabase().get_campanha_by_id(campanha_id)
+            return campanha['tipo'] if campanha else None
+
+        return self.tipos_campanha.get_or_set(campanha_id, carregar)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.processador.stats(),
+            'status': self.atualizador_status.stats(),
+            'deduplicacao': self.deduplicacao.stats()
+        }
+
+
+# Instância global da ingestão de webhooks
+ingestao_webhook = None
+
+def init_ingestao_webhook(config) -> IngestaoWebhook:
+    """Inicializa a ingestão de webhooks a partir da configuração da aplicação"""
+    global ingestao_webhook
+    evolution = init_evolution_api(
+        config.get('EVOLUTION_API_URL'),
+        config.get('EVOLUTION_API_KEY'),
+        config.get('EVOLUTION_INSTANCE_NAME', 'cambara')
+    )
+    atualizador_status = AtualizadorStatus(
+        max_lote=config.get('STATUS_LOTE_MAX', 5000),
+        intervalo=config.get('STATUS_LOTE_INTERVALO', 2.0)
+    )
+    deduplicacao = JanelaDeduplicacao(
+        maxsize=config.get('WEBHOOK_DEDUP_MAX', 100000),
+        janela=config.get('WEBHOOK_DEDUP_JANELA', 600)
+    )
+    ingestao_webhook = IngestaoWebhook(
+        evolution,
+        atualizador_status,
+        deduplicacao,
+        max_lote=config.get('WEBHOOK_LOTE_MAX', 200),
+        intervalo=config.get('WEBHOOK_LOTE_INTERVALO', 0.5),
+        maxsize=config.get('WEBHOOK_FILA_MAX', 10000),
+        tentativas=config.get('WEBHOOK_LOTE_TENTATIVAS', 5)
+    )
+    return ingestao_webhook
+
+def get_ingestao_webhook() -> IngestaoWebhook:
+    """Retorna a instância da ingestão de webhooks"""
+    if ingestao_webhook is None:
+        raise RuntimeError("Ingestão de webhooks não foi inicializada. Chame init_ingestao_webhook() primeiro.")
+    return ingestao_webhook
@@ -0,0 +1,37 @@
+from src.batch import ProcessadorLote
+
+
+def _lote(*itens):
+    return [(0.0, item) for item in itens]
+
+
+def test_lote_com_falha_transitoria_e_tentado_de_novo():
+    chamadas = []
+
+    def gravar(itens):
+        chamadas.append(list(itens))
+        if len(chamadas) < 3:
+            raise RuntimeError('Supabase indisponível')
+
+    processador = ProcessadorLote('teste_retentativa', gravar, tentativas=3, espera_base=0)
+    processador._processar(_lote('a', 'b'))
+
+    assert chamadas == [['a', 'b']] * 3
+    assert processador.processados == 2
+    assert processador.erros == 0
+    assert processador.retentativas == 2
+
+
+def test_lote_esgotado_vai_para_ao_falhar():
+    descartados = []
+
+    def gravar(itens):
+        raise RuntimeError('falha permanente')
+
+    processador = ProcessadorLote('teste_descarte', gravar, tentativas=2, espera_base=0,
+                                  ao_falhar=descartados.extend)
+    processador._processar(_lote('a', 'b'))
+
+    assert descartados == ['a', 'b']
+    assert processador.erros == 2
+    assert processador.processados == 0
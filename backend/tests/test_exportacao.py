@@ -0,0 +1,115 @@
+import csv
+import gzip
+import io
+import os
+from datetime import datetime
+
+import pyarrow.parquet as pq
+import pytest
+from openpyxl import load_workbook
+
+from src import exportacao
+from src.exportacao import (ExportacaoInvalida, comprimir_gzip, gerar_csv, gerar_parquet, gerar_xlsx,
+                            resolver_colunas, texto_seguro)
+
+
+RESPOSTA_MALICIOSA = '=HYPERLINK("http://x","clique")'
+
+
+def _csv(paginas, colunas):
+    return list(csv.reader(io.StringIO(b''.join(gerar_csv(paginas, colunas)).decode('utf-8'))))
+
+
+def test_gerar_csv_escreve_cabecalho_e_paginas():
+    linhas = _csv([[{'nome': 'Ana', 'telefone': '5511999990000'}], [{'nome': 'Bia'}]], ['nome', 'telefone'])
+    assert linhas == [['nome', 'telefone'], ['Ana', '5511999990000'], ['Bia', '']]
+
+
+def test_gerar_csv_neutraliza_formulas():
+    linhas = _csv([[{'conteudo': RESPOSTA_MALICIOSA, 'nota': -1}]], ['conteudo', 'nota'])
+    assert linhas[1] == ["'" + RESPOSTA_MALICIOSA, '-1']
+
+
+def test_texto_seguro_so_altera_textos_com_prefixo_de_formula():
+    assert texto_seguro('@SUM(A1)') == "'@SUM(A1)"
+    assert texto_seguro('ótimo') == 'ótimo'
+    assert texto_seguro(-5) == -5
+    assert texto_seguro(None) is None
+
+
+def test_comprimir_gzip_preserva_conteudo():
+    blocos = [b'a' * 100, b'b' * 100]
+    assert gzip.decompress(b''.join(comprimir_gzip(blocos))) == b''.join(blocos)
+
+
+def test_gerar_xlsx_sem_formulas_e_sem_caracteres_de_controle():
+    colunas = resolver_colunas('respostas', 'conteudo,nota,created_at')
+    registros = [
+        {'conteudo': RESPOSTA_MALICIOSA, 'nota': 9, 'created_at': '2025-03-01T12:00:00+00:00'},
+        {'conteudo': 'linha\x0bquebrada', 'nota': None, 'created_at': None}
+    ]
+    caminho = gerar_xlsx([registros], 'respostas', colunas)
+    try:
+        aba = load_workbook(caminho).active
+        assert [c.value for c in aba[1]] == colunas
+        assert aba['A2'].data_type == 's'
+        assert aba['A2'].value == "'" + RESPOSTA_MALICIOSA
+        assert aba['B2'].value == 9
+        assert aba['A3'].value == 'linhaquebrada'
+    finally:
+        os.remove(caminho)
+
+
+def test_gerar_xlsx_vazio_tem_cabecalho():
+    colunas = resolver_colunas('contatos', None)
+    caminho = gerar_xlsx([], 'contatos', colunas)
+    try:
+        assert [c.value for c in load_workbook(caminho).active[1]] == colunas
+    finally:
+        os.remove(caminho)
+
+
+def test_resolver_colunas():
+    assert resolver_colunas('contatos', ' nome, tags ,nome') == ['nome', 'tags']
+    for entidade, colunas in (('usuarios', None), ('contatos', 'senha_hash'), ('contatos', ' , ')):
+        with pytest.raises(ExportacaoInvalida):
+            resolver_colunas(entidade, colunas)
+
+
+def test_gerar_xlsx_converte_tipos_e_abre_nova_aba(monkeypatch):
+    monkeypatch.setattr(exportacao, 'LINHAS_POR_ABA_XLSX', 2)
+    colunas = ['nome', 'tags', 'campos_customizados', 'created_at']
+    registros = [
+        {'nome': f'Contato {i}', 'tags': ['vip', 'telhado'], 'campos_customizados': {'cidade': 'Curitiba'},
+         'created_at': '2025-03-01T12:00:00Z'}
+        for i in range(3)
+    ]
+    caminho = gerar_xlsx([registros[:2], registros[2:]], 'contatos', colunas)
+    try:
+        workbook = load_workbook(caminho)
+        assert workbook.sheetnames == ['contatos', 'contatos_2']
+        primeira, segunda = workbook.worksheets
+        assert [c.value for c in primeira[2]] == [
+            'Contato 0', 'vip, telhado', '{"cidade": "Curitiba"}', datetime(2025, 3, 1, 12, 0)
+        ]
+        assert [c.value for c in segunda[1]] == colunas
+        assert segunda['A2'].value == 'Contato 2'
+    finally:
+        os.remove(caminho)
+
+
+def test_gerar_parquet_em_row_groups(monkeypatch):
+    monkeypatch.setattr(exportacao, 'LINHAS_POR_GRUPO_PARQUET', 2)
+    colunas = ['conteudo', 'nota', 'score_sentimento', 'created_at']
+    paginas = [
+        [{'conteudo': f'resposta {i}', 'nota': i, 'score_sentimento': 0.5, 'created_at': '2025-03-01T12:00:00Z'}
+         for i in range(2)],
+        [{'conteudo': None, 'nota': None, 'score_sentimento': None, 'created_at': None}]
+    ]
+    arquivo = pq.ParquetFile(io.BytesIO(b''.join(gerar_parquet(paginas, 'respostas', colunas))))
+
+    assert arquivo.metadata.num_row_groups == 2
+    tabela = arquivo.read()
+    assert tabela.column_names == colunas
+    assert tabela.column('nota').to_pylist() == [0, 1, None]
+    assert str(tabela.schema.field('created_at').type) == 'timestamp[us, tz=UTC]'
@@ -0,0 +1,127 @@
+import io
+
+import pandas as pd
+import pytest
+
+from src.importacao import ErroImportacao, importar_chunks, ler_csv_em_chunks, limpar_chunk
+
+
+def _df(linhas):
+    return pd.DataFrame(linhas, dtype=str).fillna('')
+
+
+class BancoFalso:
+    """Registra os upserts; contatos com chave em `existentes` contam como já cadastrados"""
+
+    def __init__(self, existentes=(), falhar=False):
+        self.existentes = set(existentes)
+        self.falhar = falhar
+        self.upserts = []
+
+    def upsert_contatos(self, contatos, modo):
+        self.upserts.append((contatos, modo))
+        if self.falhar:
+            return None
+        novos = [c for c in contatos if c['chave_dedupe'] not in self.existentes]
+        atualizados = len(contatos) - len(novos) if modo == 'mesclar' else 0
+        return {'inseridos': len(novos), 'atualizados': atualizados}
+
+
+def test_limpar_chunk_normaliza_e_descarta_invalidos():
+    contatos = limpar_chunk(_df([
+        {'nome': ' Ana ', 'telefone': '(11) 99999-0000', 'email': 'ANA@Exemplo.com'},
+        {'nome': 'Bia', 'telefone': '123', 'email': 'bia@exemplo.com'},
+        {'nome': 'Caio', 'telefone': '12345', 'email': 'caio@'},
+        {'nome': '', 'telefone': '11988887777', 'email': ''},
+        {'nome': 'Duda', 'telefone': '5541 3333-4444', 'email': ''}
+    ]), 'e1')
+
+    assert [c['nome'] for c in contatos] == ['Ana', 'Bia', 'Duda']
+    ana, bia, duda = contatos
+    assert ana['telefone'] == '(11) 99999-0000'
+    assert ana['email'] == 'ANA@Exemplo.com'
+    # Telefone inválido é descartado, a linha fica pelo email
+    assert bia['telefone'] is None
+    assert bia['email'] == 'bia@exemplo.com'
+    assert duda['email'] is None
+    assert ana['documento'] is None
+    assert {(c['empresa_id'], c['origem']) for c in contatos} == {('e1', 'importacao')}
+
+
+def test_chave_dedupe_prefere_telefone_com_ddi():
+    contatos = limpar_chunk(_df([
+        {'nome': 'Ana', 'telefone': '(11) 99999-0000', 'email': 'ana@exemplo.com'},
+        {'nome': 'Bia', 'telefone': '+55 11 98888-7777', 'email': ''},
+        {'nome': 'Caio', 'telefone': '', 'email': 'Caio@Exemplo.COM'}
+    ]), 'e1')
+
+    assert [c['chave_dedupe'] for c in contatos] == [
+        'tel:5511999990000',
+        'tel:5511988887777',
+        'email:caio@exemplo.com'
+    ]
+
+
+def test_limpar_chunk_exige_nome():
+    with pytest.raises(ErroImportacao):
+        limpar_chunk(_df([{'telefone': '11999990000'}]), 'e1')
+
+
+def test_ler_csv_em_chunks_normaliza_colunas():
+    # BOM do Excel e cabeçalho em maiúsculas; colunas fora de COLUNAS_IMPORTACAO são ignoradas
+    arquivo = io.BytesIO('\ufeffNome,Cidade\nAna,Curitiba\nBia,Lapa\nCaio,Castro\n'.encode('utf-8'))
+    chunks = list(ler_csv_em_chunks(arquivo, tamanho_chunk=2))
+    assert [list(c.columns) for c in chunks] == [['nome'], ['nome']]
+    assert [len(c) for c in chunks] == [2, 1]
+
+
+def test_importar_chunks_deduplica_no_arquivo_e_no_banco():
+    chunks = [
+        _df([
+            {'nome': 'Ana', 'telefone': '11999990000', 'email': ''},
+            {'nome': 'Ana de novo', 'telefone': '5511999990000', 'email': ''},
+            {'nome': 'Sem contato', 'telefone': '', 'email': ''}
+        ]),
+        _df([
+            {'nome': 'Ana outra vez', 'telefone': '(11) 99999-0000', 'email': ''},
+            {'nome': 'Bia', 'telefone': '', 'email': 'bia@exemplo.com'}
+        ])
+    ]
+    db = BancoFalso(existentes={'email:bia@exemplo.com'})
+
+    resultado = importar_chunks(chunks, 'e1', db)
+
+    assert [[c['nome'] for c in contatos] for contatos, _ in db.upserts] == [['Ana'], ['Bia']]
+    assert resultado == {
+        'linhas': 5, 'importados': 1, 'atualizados': 0, 'duplicados': 3,
+        'ignorados': 1, 'falhas': 0, 'chunks': 2
+    }
+
+
+def test_importar_chunks_retoma_a_partir_do_chunk():
+    chunks = [_df([{'nome': f'Contato {i}', 'telefone': f'1199999000{i}'}]) for i in range(3)]
+    db = BancoFalso()
+    gravados = []
+
+    resultado = importar_chunks(
+        chunks, 'e1', db, resultado={'linhas': 1, 'importados': 1, 'chunks': 1}, a_partir_de=1,
+        ao_gravar_chunk=lambda indice, parcial: gravados.append((indice, parcial['importados']))
+    )
+
+    assert [contatos[0]['nome'] for contatos, _ in db.upserts] == ['Contato 1', 'Contato 2']
+    assert gravados == [(1, 2), (2, 3)]
+    assert resultado['linhas'] == 3
+    assert resultado['chunks'] == 3
+
+
+def test_importar_chunks_modo_mesclar_e_falhas():
+    chunk = _df([{'nome': 'Ana', 'telefone': '11999990000'}])
+
+    mesclado = importar_chunks([chunk], 'e1', BancoFalso(existentes={'tel:5511999990000'}), modo='mesclar')
+    assert (mesclado['importados'], mesclado['atualizados'], mesclado['duplicados']) == (0, 1, 0)
+
+    falhou = importar_chunks([chunk], 'e1', BancoFalso(falhar=True))
+    assert (falhou['importados'], falhou['falhas']) == (0, 1)
+
+    with pytest.raises(ErroImportacao):
+        importar_chunks([chunk], 'e1', BancoFalso(), modo='substituir')
@@ -0,0 +1,108 @@
+import io
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src import importacao_jobs
+from src.importacao import ErroImportacao
+from src.importacao_jobs import ConflitoUpload, GerenciadorImportacoes
+
+
+class BancoFalso:
+    """Tabela importacoes em memória, com os UPDATEs condicionais do SupabaseClient"""
+
+    def __init__(self):
+        self.importacoes = {}
+
+    def create_importacao(self, data):
+        importacao = {**data, 'id': f'imp{len(self.importacoes) + 1}', 'updated_at': datetime.now(timezone.utc).isoformat()}
+        self.importacoes[importacao['id']] = importacao
+        return dict(importacao)
+
+    def get_importacao(self, empresa_id, importacao_id):
+        importacao = self.importacoes.get(importacao_id)
+        return dict(importacao) if importacao and importacao['empresa_id'] == empresa_id else None
+
+    def update_importacao(self, importacao_id, data):
+        self.importacoes[importacao_id].update(data)
+        return dict(self.importacoes[importacao_id])
+
+    def iniciar_importacao(self, importacao_id, bytes_recebidos):
+        if self.importacoes[importacao_id]['status'] != 'recebendo':
+            return None
+        return self.update_importacao(importacao_id, {'status': 'pendente', 'bytes_recebidos': bytes_recebidos})
+
+    def get_importacoes_por_ids(self, ids):
+        return [dict(self.importacoes[i]) for i in ids if i in self.importacoes]
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    banco = BancoFalso()
+    monkeypatch.setattr(importacao_jobs, 'get_supabase', lambda: banco)
+    return banco
+
+
+@pytest.fixture
+def gerenciador(tmp_path, monkeypatch):
+    gerenciador = GerenciadorImportacoes(str(tmp_path), spool_ttl=60)
+    # O processamento em si não faz parte destes testes
+    monkeypatch.setattr(gerenciador, '_processar', lambda importacao: None)
+    monkeypatch.setattr(gerenciador, '_agendar_varredura', lambda: None)
+    return gerenciador
+
+
+def test_blocos_sao_anexados_por_offset(banco, gerenciador):
+    importacao = gerenciador.criar('e1', 'u1', 'contatos.csv')
+    assert gerenciador.anexar_bloco(importacao, 0, io.BytesIO(b'nome\n')) == 5
+    assert gerenciador.anexar_bloco(importacao, 5, io.BytesIO(b'Ana\n')) == 9
+
+    with pytest.raises(ConflitoUpload) as erro:
+        gerenciador.anexar_bloco(importacao, 5, io.BytesIO(b'Ana\n'))
+    assert erro.value.bytes_recebidos == 9
+
+
+def test_iniciar_so_uma_vez(banco, gerenciador):
+    importacao = gerenciador.criar('e1', 'u1', 'contatos.csv')
+    gerenciador.anexar_bloco(importacao, 0, io.BytesIO(b'nome\nAna\n'))
+
+    iniciada = gerenciador.iniciar(importacao)
+    assert iniciada['status'] == 'pendente'
+    assert iniciada['bytes_recebidos'] == 9
+
+    # Segunda chamada concorrente (mesmo snapshot em 'recebendo') não inicia de novo
+    assert gerenciador.iniciar(importacao) is None
+
+
+def test_bloco_apos_iniciar_e_recusado(banco, gerenciador):
+    importacao = gerenciador.criar('e1', 'u1', 'contatos.csv')
+    gerenciador.iniciar(importacao)
+
+    with pytest.raises(ErroImportacao):
+        gerenciador.anexar_bloco(importacao, 0, io.BytesIO(b'nome\n'))
+
+
+def _envelhecer(caminho, segundos):
+    antigo = time.time() - segundos
+    os.utime(caminho, (antigo, antigo))
+
+
+def test_varredura_remove_spool_abandonado(banco, gerenciador):
+    abandonada = gerenciador.criar('e1', 'u1', 'velha.csv')
+    recente = gerenciador.criar('e1', 'u1', 'nova.csv')
+    banco.importacoes[abandonada['id']]['updated_at'] = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+    _envelhecer(gerenciador.caminho_spool(abandonada), 3600)
+    # Arquivo antigo, mas o job segue ativo (updated_at recente pelo batimento)
+    _envelhecer(gerenciador.caminho_spool(recente), 3600)
+    # Arquivo de uma importação que nem existe mais
+    orfao = os.path.join(gerenciador.pasta, 'apagada.csv')
+    open(orfao, 'wb').close()
+    _envelhecer(orfao, 3600)
+
+    assert gerenciador.varrer_spool() == 2
+    assert not os.path.exists(gerenciador.caminho_spool(abandonada))
+    assert not os.path.exists(orfao)
+    assert os.path.exists(gerenciador.caminho_spool(recente))
+    assert banco.importacoes[abandonada['id']]['status'] == 'erro'
@@ -0,0 +1,49 @@
+from src import indice_disparos
+from src.indice_disparos import IndiceDisparos
+
+
+class ClienteFalso:
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.chamadas = []
+
+    def get_client(self):
+        return self
+
+    def rpc(self, nome, parametros):
+        self.chamadas.append((nome, parametros))
+        return self
+
+    def execute(self):
+        class Resposta:
+            data = self.linhas
+        return Resposta()
+
+
+def test_resolve_os_telefones_do_lote_numa_unica_chamada(monkeypatch):
+    cliente = ClienteFalso([
+        {'id': 'd1', 'empresa_id': 'e1', 'contato_id': 'c1', 'campanha_id': 'k1', 'telefone': '5511999990001'},
+        {'id': 'd2', 'empresa_id': 'e1', 'contato_id': 'c2', 'campanha_id': 'k1', 'telefone': '5511999990002'},
+    ])
+    monkeypatch.setattr(indice_disparos, 'get_supabase', lambda: cliente)
+
+    disparos = IndiceDisparos().buscar_por_telefones(
+        ['5511999990001', '(11) 99999-0002', '5511999990001', '5511999990003'], 'e1'
+    )
+
+    assert len(cliente.chamadas) == 1
+    nome, parametros = cliente.chamadas[0]
+    assert nome == 'ultimos_disparos_por_telefone'
+    assert parametros == {
+        'p_telefones': ['5511999990001', '5511999990002', '5511999990003'],
+        'p_empresa_id': 'e1'
+    }
+    assert {t: d['id'] for t, d in disparos.items()} == {'5511999990001': 'd1', '5511999990002': 'd2'}
+
+
+def test_sem_telefones_validos_nao_consulta(monkeypatch):
+    cliente = ClienteFalso([])
+    monkeypatch.setattr(indice_disparos, 'get_supabase', lambda: cliente)
+
+    assert IndiceDisparos().buscar_por_telefones([None, '']) == {}
+    assert cliente.chamadas == []
@@ -0,0 +1,65 @@
+import pytest
+
+from src.nps import categoria_nps, extrair_nota, incrementos_nps
+
+
+@pytest.mark.parametrize('texto, nota', [
+    # Exemplos documentados em src/nps.py
+    ('nota 9', 9),
+    ('nota: 9', 9),
+    ('10!', 10),
+    ('dou 8', 8),
+    ('9/10', 9),
+    ('dez', 10),
+    ('nota dez', 10),
+    # Separadores e variações
+    ('nota: dez!', 10),
+    ('nota:9', 9),
+    ('Nota = 7', 7),
+    ('daria um 10', 10),
+    ('9 de 10, muito bom', 9),
+    ('De 0 a 10 dou 9', 9),
+    ('  7  ', 7),
+    ('Ótimo atendimento, nota 10', 10),
+])
+def test_extrai_nota(texto, nota):
+    assert extrair_nota(texto) == nota
+
+
+@pytest.mark.parametrize('texto', [
+    # Números soltos no meio do texto não são nota
+    'tenho 1 reclamação',
+    '2 semanas de atraso',
+    'Entrega em 3 dias, ótimo',
+    'chegaram 2 de 5 tábuas',
+    'comprei 10,5 metros',
+    # Sem nota
+    'ótimo atendimento',
+    'de 0 a 10',
+    '',
+    None,
+])
+def test_sem_nota_inequivoca(texto):
+    assert extrair_nota(texto) is None
+
+
+def test_categoria_nps():
+    assert [categoria_nps(n) for n in (10, 9, 8, 7, 6, 0)] == [
+        'promotores', 'promotores', 'neutros', 'neutros', 'detratores', 'detratores'
+    ]
+
+
+def test_incrementos_por_campanha_e_empresa():
+    respostas = [
+        {'empresa_id': 'e1', 'campanha_id': 'c1', 'nota': 10},
+        {'empresa_id': 'e1', 'campanha_id': 'c1', 'nota': 3},
+        {'empresa_id': 'e1', 'campanha_id': 'c2', 'nota': 8},
+        {'empresa_id': 'e1', 'campanha_id': 'c2', 'nota': None},
+    ]
+    por_chave = {(i['empresa_id'], i['campanha_id']): i for i in incrementos_nps(respostas)}
+
+    assert por_chave[('e1', 'c1')]['promotores'] == 1
+    assert por_chave[('e1', 'c1')]['detratores'] == 1
+    assert por_chave[('e1', 'c2')]['neutros'] == 1
+    assert por_chave[('e1', None)]['total'] == 3
+    assert por_chave[('e1', None)]['soma_notas'] == 21
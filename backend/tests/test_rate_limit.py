@@ -0,0 +1,103 @@
+import pytest
+
+from src import rate_limit
+from src.rate_limit import PLANO_PADRAO, LimitadorTaxa, classe_endpoint
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(rate_limit.time, 'monotonic', lambda: agora[0])
+    return agora
+
+
+def _limitador(maximo=10, janela=60):
+    return LimitadorTaxa({PLANO_PADRAO: {'leitura': (maximo, janela)}, 'premium': {'leitura': (100, janela)}})
+
+
+def test_permite_ate_o_maximo_e_rejeita_o_seguinte(relogio):
+    limitador = _limitador()
+    assert all(limitador.permitir('e1', 'leitura')[0] for _ in range(10))
+
+    permitida, espera = limitador.permitir('e1', 'leitura')
+    assert not permitida
+    assert espera > 0
+    assert limitador.stats()['rejeitadas'] == 1
+
+
+def test_empresas_e_classes_tem_cotas_separadas(relogio):
+    limitador = _limitador(maximo=1)
+    assert limitador.permitir('e1', 'leitura')[0]
+    assert limitador.permitir('e2', 'leitura')[0]
+    # Classe sem limite configurado é sempre permitida
+    assert limitador.permitir('e1', 'escrita') == (True, 0)
+
+
+def test_limite_segue_o_plano_da_empresa(relogio):
+    limitador = _limitador(maximo=1)
+    assert limitador.permitir('e1', 'leitura', 'premium')[0]
+    assert limitador.permitir('e1', 'leitura', 'premium')[0]
+    # Plano desconhecido cai no padrão
+    assert limitador.limite('inexistente', 'leitura') == (1, 60)
+
+
+def test_retry_after_com_janela_cheia_e_suficiente(relogio):
+    limitador = _limitador()
+    for _ in range(10):
+        limitador.permitir('e1', 'leitura')
+
+    relogio[0] += 5
+    permitida, espera = limitador.permitir('e1', 'leitura')
+    assert not permitida
+
+    # Um segundo antes ainda é rejeitada; no tempo indicado, permitida
+    relogio[0] += espera - 1
+    assert not limitador.permitir('e1', 'leitura')[0]
+    relogio[0] += 1
+    assert limitador.permitir('e1', 'leitura')[0]
+
+
+def test_retry_after_pela_parcela_da_janela_anterior(relogio):
+    limitador = _limitador()
+    for _ in range(10):
+        limitador.permitir('e1', 'leitura')
+
+    # Janela seguinte: a anterior ainda pesa quase tudo
+    relogio[0] += 61
+    permitida, espera = limitador.permitir('e1', 'leitura')
+    assert not permitida
+    # Peso da anterior cai para 0,9 (9 requisições) aos 6s da janela
+    assert espera == 5
+
+    relogio[0] += espera - 1
+    assert not limitador.permitir('e1', 'leitura')[0]
+    relogio[0] += 1
+    assert limitador.permitir('e1', 'leitura')[0]
+
+
+def test_janela_anterior_some_apos_duas_janelas(relogio):
+    limitador = _limitador()
+    for _ in range(10):
+        limitador.permitir('e1', 'leitura')
+
+    relogio[0] += 125
+    assert all(limitador.permitir('e1', 'leitura')[0] for _ in range(10))
+
+
+def test_lru_limita_as_chaves(relogio):
+    limitador = LimitadorTaxa({PLANO_PADRAO: {'leitura': (5, 60)}}, maxsize=2)
+    for empresa in ('e1', 'e2', 'e3'):
+        limitador.permitir(empresa, 'leitura')
+    assert limitador.stats()['chaves'] == 2
+
+
+@pytest.mark.parametrize('metodo, caminho, classe', [
+    ('GET', '/api/contatos', 'leitura'),
+    ('POST', '/api/contatos', 'escrita'),
+    ('POST', '/api/whatsapp/send-message', 'envio'),
+    ('POST', '/api/campanhas/abc/execute', 'envio'),
+    ('POST', '/api/importacoes', 'importacao'),
+    ('PUT', '/api/importacoes/abc/arquivo', 'escrita'),
+])
+def test_classe_endpoint(metodo, caminho, classe):
+    assert classe_endpoint(metodo, caminho) == classe
@@ -0,0 +1,112 @@
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from src import relatorios
+from src.relatorios import GerenciadorRelatorios
+
+
+class BancoFalso:
+    """Tabela relatorios em memória; as consultas do relatório devolvem dados vazios"""
+
+    def __init__(self):
+        self.relatorios = {}
+        self.versoes = {}
+
+    def get_versoes_empresa(self, empresa_id, escopos):
+        return self.versoes
+
+    def get_relatorio_por_chave(self, empresa_id, chave):
+        return None
+
+    def create_relatorio(self, data):
+        relatorio = {**data, 'id': f'rel{len(self.relatorios) + 1}',
+                     'created_at': datetime.now(timezone.utc).isoformat()}
+        self.relatorios[relatorio['id']] = relatorio
+        return dict(relatorio)
+
+    def update_relatorio(self, relatorio_id, data):
+        if relatorio_id in self.relatorios:
+            self.relatorios[relatorio_id].update(data)
+
+    def remover_relatorios_anteriores(self, relatorio):
+        removidos = [
+            r for r in self.relatorios.values()
+            if r['id'] != relatorio['id'] and r['formato'] == relatorio['formato']
+            and (r['de'], r['ate']) == (relatorio['de'], relatorio['ate'])
+            and r['created_at'] < relatorio['created_at'] and r['status'] in ('concluido', 'erro')
+        ]
+        for r in removidos:
+            del self.relatorios[r['id']]
+        return removidos
+
+    def remover_relatorios_expirados(self, criados_antes_de):
+        removidos = [r for r in self.relatorios.values() if r['created_at'] < criados_antes_de]
+        for r in removidos:
+            del self.relatorios[r['id']]
+        return removidos
+
+    def get_empresa_by_id(self, empresa_id):
+        return {'id': empresa_id, 'nome': 'Madeireira'}
+
+    def contar(self, tabela, empresa_id, filtros=None):
+        return 0
+
+    def get_metricas_diarias(self, empresa_id, de, ate):
+        return []
+
+    def get_metricas_campanhas(self, empresa_id):
+        return []
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    banco = BancoFalso()
+    monkeypatch.setattr(relatorios, 'get_supabase', lambda: banco)
+    return banco
+
+
+@pytest.fixture
+def gerenciador(tmp_path, monkeypatch):
+    gerenciador = GerenciadorRelatorios(str(tmp_path), ttl=60)
+    # Jobs executados na própria thread do teste
+    monkeypatch.setattr(gerenciador._executor, 'submit', lambda fn, *args: fn(*args))
+    monkeypatch.setattr(gerenciador, '_agendar_varredura', lambda: None)
+    return gerenciador
+
+
+def test_sem_versoes_nao_solicita(banco, gerenciador):
+    banco.versoes = None
+    assert gerenciador.solicitar('e1', 'u1', date(2026, 1, 1), date(2026, 1, 31), 'csv') == (None, False)
+    assert banco.relatorios == {}
+
+
+def test_relatorio_novo_apaga_anterior(banco, gerenciador):
+    primeiro, _ = gerenciador.solicitar('e1', 'u1', date(2026, 1, 1), date(2026, 1, 31), 'csv')
+    outro_formato, _ = gerenciador.solicitar('e1', 'u1', date(2026, 1, 1), date(2026, 1, 31), 'json')
+    # Dados mudaram: nova chave, novo job
+    banco.versoes = {'respostas': {'versao': 2}}
+    segundo, _ = gerenciador.solicitar('e1', 'u1', date(2026, 1, 1), date(2026, 1, 31), 'csv')
+
+    assert banco.relatorios[segundo['id']]['status'] == 'concluido'
+    assert primeiro['id'] not in banco.relatorios
+    assert not os.path.exists(gerenciador.caminho(primeiro))
+    assert os.path.exists(gerenciador.caminho(segundo))
+    assert os.path.exists(gerenciador.caminho(outro_formato))
+
+
+def test_varredura_remove_expirados(banco, gerenciador):
+    antigo, _ = gerenciador.solicitar('e1', 'u1', date(2026, 1, 1), date(2026, 1, 31), 'csv')
+    recente, _ = gerenciador.solicitar('e1', 'u1', date(2026, 2, 1), date(2026, 2, 28), 'csv')
+    banco.relatorios[antigo['id']]['created_at'] = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+    # Temporário de um job interrompido
+    temporario = os.path.join(gerenciador.pasta, 'rel9.csv.tmp')
+    open(temporario, 'w').close()
+    antigo_mtime = time.time() - 3600
+    os.utime(temporario, (antigo_mtime, antigo_mtime))
+
+    assert gerenciador.varrer_expirados() == 2
+    assert list(banco.relatorios) == [recente['id']]
+    assert os.listdir(gerenciador.pasta) == [os.path.basename(gerenciador.caminho(recente))]
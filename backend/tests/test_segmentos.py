@@ -0,0 +1,108 @@
+import pytest
+
+from src.segmentos import SegmentoInvalido, aplicar_segmento, chave_segmento, validar_segmento
+
+
+class QueryFalsa:
+    """Registra os filtros aplicados, como o query builder do PostgREST"""
+
+    def __init__(self):
+        self.filtros = []
+        self._negar = False
+
+    @property
+    def not_(self):
+        self._negar = True
+        return self
+
+    def __getattr__(self, operador):
+        def filtro(*args):
+            self.filtros.append((('not.' if self._negar else '') + operador, *args))
+            self._negar = False
+            return self
+        return filtro
+
+
+def _compilar(definicao):
+    return aplicar_segmento(QueryFalsa(), validar_segmento(definicao)).filtros
+
+
+def test_validar_normaliza_tags_e_datas():
+    normalizado = validar_segmento({
+        'status': 'ativo',
+        'tags': {'any': ['vip', 'telhado', 'vip'], 'none': []},
+        'criado_de': '2024-01-01',
+        'criado_ate': '2024-06-30T23:59:59Z'
+    })
+    assert normalizado == {
+        'status': 'ativo',
+        'tags': {'any': ['telhado', 'vip']},
+        'criado_de': '2024-01-01T00:00:00',
+        'criado_ate': '2024-06-30T23:59:59+00:00'
+    }
+    assert validar_segmento(None) == {}
+
+
+@pytest.mark.parametrize('definicao', [
+    [],
+    {'cidade': 'Curitiba'},
+    {'tags': {'algum': ['vip']}},
+    {'tags': {'any': 'vip'}},
+    {'campos': [{'campo': "cidade'; --", 'valor': 'x'}]},
+    {'campos': [{'campo': 'cidade', 'op': 'like', 'valor': 'x'}]},
+    {'campos': [{'campo': 'cidades', 'op': 'in', 'valor': 'Curitiba'}]},
+    {'campos': [{'campo': 'total_compras', 'op': 'gte', 'valor': '3'}]},
+    {'campos': [{'campo': 'total_compras', 'op': 'gte', 'valor': True}]},
+    {'criado_de': 'ontem'},
+    {'respondeu_em_dias': 0},
+    {'sem_resposta_em_dias': True}
+])
+def test_validar_rejeita_definicoes_invalidas(definicao):
+    with pytest.raises(SegmentoInvalido):
+        validar_segmento(definicao)
+
+
+def test_chave_independe_da_ordem():
+    a = validar_segmento({'status': 'ativo', 'tags': {'any': ['b', 'a']}})
+    b = validar_segmento({'tags': {'any': ['a', 'b']}, 'status': 'ativo'})
+    assert chave_segmento(a) == chave_segmento(b)
+    assert chave_segmento(a) != chave_segmento(validar_segmento({'status': 'inativo'}))
+
+
+def test_compila_status_tags_e_datas():
+    assert _compilar({
+        'status': 'ativo',
+        'tags': {'any': ['vip'], 'all': ['2024'], 'none': ['bloqueado']},
+        'criado_de': '2024-01-01',
+        'criado_ate': '2024-06-30'
+    }) == [
+        ('eq', 'status', 'ativo'),
+        ('overlaps', 'tags', ['vip']),
+        ('contains', 'tags', ['2024']),
+        ('not.overlaps', 'tags', ['bloqueado']),
+        ('gte', 'created_at', '2024-01-01T00:00:00'),
+        ('lte', 'created_at', '2024-06-30T00:00:00')
+    ]
+
+
+def test_compila_campos_customizados():
+    assert _compilar({'campos': [
+        {'campo': 'cidade', 'valor': 'Curitiba'},
+        {'campo': 'total_compras', 'op': 'gte', 'valor': 3},
+        {'campo': 'bairro', 'op': 'in', 'valor': ['Centro', 1]},
+        {'campo': 'obra', 'op': 'ilike', 'valor': 'telhado'},
+        {'campo': 'vendedor', 'op': 'neq', 'valor': 7}
+    ]}) == [
+        # eq usa @> (índice GIN); comparações numéricas usam -> (jsonb)
+        ('contains', 'campos_customizados', {'cidade': 'Curitiba'}),
+        ('gte', 'campos_customizados->total_compras', 3),
+        ('in_', 'campos_customizados->>bairro', ['Centro', '1']),
+        ('ilike', 'campos_customizados->>obra', '%telhado%'),
+        ('neq', 'campos_customizados->>vendedor', '7')
+    ]
+
+
+def test_compila_recencia_de_resposta():
+    filtros = _compilar({'respondeu_em_dias': 30, 'sem_resposta_em_dias': 90})
+    assert [f[:2] for f in filtros] == [('gte', 'ultima_resposta_em'), ('or_', filtros[1][1])]
+    assert filtros[1][1].startswith('ultima_resposta_em.is.null,ultima_resposta_em.lt.')
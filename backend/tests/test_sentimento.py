@@ -0,0 +1,44 @@
+import numpy as np
+
+from src.sentimento import ClassificadorSentimento
+
+
+classificador = ClassificadorSentimento()
+
+
+def _rotulos(*textos):
+    return classificador.classificar(list(textos))[0]
+
+
+def test_classifica_polaridade_com_acentos_e_emojis():
+    assert _rotulos('Ótimo atendimento, recomendo!', 'A madeira veio empenada e com cupim', 'Chegou hoje') == \
+        ['positivo', 'negativo', 'neutro']
+    assert _rotulos('👍', '😡') == ['positivo', 'negativo']
+
+
+def test_negacao_inverte_os_proximos_tokens():
+    assert _rotulos('não gostei', 'nem um pouco satisfeito', 'não, gostei muito') == \
+        ['negativo', 'negativo', 'negativo']
+    # Fora da janela de negação a polaridade original volta
+    assert _rotulos('não tive nenhum tipo de atraso, gostei') == ['positivo']
+
+
+def test_intensificador_aumenta_o_score():
+    simples, intenso = classificador.pontuar(['bom', 'muito bom'])
+    assert intenso > simples > 0
+
+
+def test_negacao_e_intensificador_nao_cruzam_textos():
+    # "não" e "muito" no fim de um texto não afetam o primeiro token do seguinte
+    isolado = classificador.pontuar(['bom'])[0]
+    scores = classificador.pontuar(['eu não', 'bom', 'muito', 'bom'])
+    assert scores[1] == isolado
+    assert scores[3] == isolado
+
+
+def test_scores_limitados_e_textos_vazios():
+    scores = classificador.pontuar(['excelente ' * 50, 'péssimo ' * 50, '', None, 'xyz'])
+    assert 0.99 < scores[0] <= 1
+    assert -1 <= scores[1] < -0.99
+    assert np.array_equal(scores[2:], np.zeros(3))
+    assert classificador.pontuar([]).shape == (0,)
@@ -0,0 +1,80 @@
+import pytest
+
+from src import database
+from src.database import SupabaseClient
+
+
+class Resposta:
+    def __init__(self, data):
+        self.data = data
+
+
+class ClienteFalso:
+    """Responde a consultas de usuarios com `linhas` e registra as chamadas RPC"""
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.consultas = 0
+        self.rpcs = []
+
+    def table(self, nome):
+        return self
+
+    def select(self, *args):
+        return self
+
+    def eq(self, coluna, valor):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def rpc(self, funcao, parametros):
+        self.rpcs.append((funcao, parametros))
+        return self
+
+    def execute(self):
+        self.consultas += 1
+        return Resposta([dict(linha) for linha in self.linhas])
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    cliente = ClienteFalso([{'id': 'u1', 'email': 'ana@exemplo.com', 'senha_hash': 'hash-antigo', 'ativo': True}])
+    monkeypatch.setattr(database, 'create_client', lambda url, key: cliente)
+    return cliente
+
+
+@pytest.fixture
+def db(cliente):
+    db = SupabaseClient('http://supabase.local', 'chave')
+    yield db
+    db.ultimos_logins.parar()
+
+
+def test_cache_de_usuarios_nao_guarda_senha_hash(db, cliente):
+    assert 'senha_hash' not in db.get_user_by_email('ana@exemplo.com')
+    assert 'senha_hash' not in db.get_user_by_id('u1')
+    assert cliente.consultas == 1
+
+
+def test_credenciais_sempre_lidas_do_banco(db, cliente):
+    assert db.get_credenciais_by_email('ana@exemplo.com')['senha_hash'] == 'hash-antigo'
+
+    # Senha trocada por outro worker: o cache deste processo não tem o hash antigo
+    cliente.linhas[0]['senha_hash'] = 'hash-novo'
+    assert db.get_credenciais_by_email('ana@exemplo.com')['senha_hash'] == 'hash-novo'
+    assert cliente.consultas == 2
+
+
+def test_ultimos_logins_gravados_por_usuario(db, cliente):
+    db._gravar_ultimos_logins([
+        ('u1', '2026-01-01T10:00:05+00:00'),
+        ('u2', '2026-01-01T10:00:01+00:00'),
+        ('u1', '2026-01-01T10:00:02+00:00')
+    ])
+
+    assert cliente.rpcs == [('registrar_ultimos_logins', {'payload': [
+        {'id': 'u1', 'ultimo_login': '2026-01-01T10:00:05+00:00'},
+        {'id': 'u2', 'ultimo_login': '2026-01-01T10:00:01+00:00'}
+    ]})]
@@ -0,0 +1,29 @@
+from src.cache import JanelaDeduplicacao
+from src.webhook import AtualizadorStatus, IngestaoWebhook
+
+
+class EvolutionFalsa:
+    def process_webhook_message(self, data):
+        return data
+
+
+def test_lote_perdido_libera_ids_para_o_reenvio(monkeypatch):
+    deduplicacao = JanelaDeduplicacao(maxsize=100, janela=600)
+    ingestao = IngestaoWebhook(EvolutionFalsa(), AtualizadorStatus(), deduplicacao, tentativas=2)
+    ingestao.processador.espera_base = 0
+
+    def falhar(eventos):
+        raise RuntimeError('Supabase indisponível')
+
+    monkeypatch.setattr(ingestao.processador, 'flush_fn', falhar)
+    monkeypatch.setattr(ingestao.processador, '_garantir_thread', lambda: None)
+
+    evento = {'tipo': 'mensagem_recebida', 'de': '5511999990000', 'mensagem': 'ok', 'id_mensagem': 'ABC'}
+    assert ingestao.enfileirar(evento) == 'enfileirado'
+    assert ingestao.enfileirar(evento) == 'duplicado'
+
+    ingestao.processador.flush()
+
+    # O reenvio da Evolution API volta a ser aceito
+    assert ingestao.enfileirar(evento) == 'enfileirado'
+    ingestao.processador.flush()
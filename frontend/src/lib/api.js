@@ -99,9 +99,10 @@ export const contatosAPI = {
   delete: (id) => 
     api.delete(`/contatos/${id}`),
   
-  import: (file) => {
+  import: (file, modo = 'ignorar') => {
     const formData = new FormData();
     formData.append('file', file);
+    formData.append('modo', modo);
     return api.post('/contatos/import', formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
@@ -114,6 +115,9 @@ export const contatosAPI = {
   
   getStats: () => 
     api.get('/contatos/stats'),
+  
+  getTags: () => 
+    api.get('/contatos/tags'),
 };
 
 // Funções para campanhas
@@ -146,13 +150,69 @@ export const campanhasAPI = {
     api.get('/campanhas/templates'),
 };
 
+// Funções para segmentos
+export const segmentosAPI = {
+  getAll: () => 
+    api.get('/segmentos'),
+  
+  create: (data) => 
+    api.post('/segmentos', data),
+  
+  update: (id, data) => 
+    api.put(`/segmentos/${id}`, data),
+  
+  delete: (id) => 
+    api.delete(`/segmentos/${id}`),
+  
+  getContagem: (id) => 
+    api.get(`/segmentos/${id}/contagem`),
+  
+  preview: (definicao) => 
+    api.post('/segmentos/preview', { definicao }),
+};
+
+// Funções para importações em segundo plano
+export const importacoesAPI = {
+  getAll: () => 
+    api.get('/importacoes'),
+  
+  get: (id) => 
+    api.get(`/importacoes/${id}`),
+  
+  create: (nomeArquivo, tamanhoBytes, modo = 'ignorar') => 
+    api.post('/importacoes', { nome_arquivo: nomeArquivo, tamanho_bytes: tamanhoBytes, modo }),
+  
+  uploadBloco: (id, offset, bloco) => 
+    api.put(`/importacoes/${id}/arquivo`, bloco, {
+      params: { offset },
+      headers: {
+        'Content-Type': 'application/octet-stream',
+      },
+    }),
+  
+  processar: (id) => 
+    api.post(`/importacoes/${id}/processar`),
+  
+  retomar: (id) => 
+    api.post(`/importacoes/${id}/retomar`),
+};
+
+// Funções para exportações (entidade: contatos, disparos ou respostas)
+export const exportacoesAPI = {
+  exportar: (entidade, { formato = 'csv', colunas, de, ate } = {}) => 
+    api.get(`/exportacoes/${entidade}`, {
+      params: { formato, colunas: colunas ? colunas.join(',') : undefined, de, ate },
+      responseType: 'blob',
+    }),
+};
+
 // Funções para dashboard
 export const dashboardAPI = {
   getMetrics: () => 
     api.get('/dashboard/metrics'),
   
-  getRecentActivity: () => 
-    api.get('/dashboard/recent-activity'),
+  getRecentActivity: (cursor, limit = 20) => 
+    api.get('/dashboard/recent-activity', { params: { cursor, limit } }),
   
   getDisparosPorDia: (days = 30) => 
     api.get('/dashboard/charts/disparos-por-dia', { params: { days } }),
@@ -163,8 +223,17 @@ export const dashboardAPI = {
   getCampanhasPerformance: () => 
     api.get('/dashboard/charts/campanhas-performance'),
   
-  exportReport: () => 
-    api.get('/dashboard/export/report'),
+  exportReport: ({ de, ate } = {}) => 
+    api.get('/dashboard/export/report', { params: { de, ate } }),
+  
+  solicitarRelatorio: ({ de, ate, formato = 'json' } = {}) => 
+    api.post('/dashboard/export/report', { de, ate, formato }),
+  
+  getRelatorio: (id) => 
+    api.get(`/dashboard/export/report/${id}`),
+  
+  downloadRelatorio: (id) => 
+    api.get(`/dashboard/export/report/${id}/download`, { responseType: 'blob' }),
 };
 
 // Health check